@@ -0,0 +1,82 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from .compiler import Compiler
+from .cache import CompileCache
+
+
+# Outcome of compiling one file. error is None on success,
+# otherwise a one line description of the exception. cached tells
+# whether the output came from the compile cache.
+BatchResult = namedtuple('BatchResult',
+                         ['source', 'output', 'time', 'error', 'cached'])
+
+# Output kinds and the extension of the files they produce
+EMIT_KINDS = {'ll': '.ll', 'obj': '.o', 'so': '.so'}
+
+# Compiler and output kind of a worker process, see _init_worker
+_compiler = None
+_emit = 'll'
+
+
+def find_sources(src_dir, out_dir):
+  ''' List the C files of a directory
+      Returns:
+        Sorted list of (source path, output .ll path)
+  '''
+  return [(os.path.join(src_dir, file),
+           os.path.join(out_dir, f'{file[:-2]}.ll'))
+          for file in sorted(os.listdir(src_dir))
+          if file.endswith('.c')]
+
+
+def _init_worker(opt_level, emit, cache_dir, fold):
+  # Built once per worker, so the parser tables are loaded once and
+  # every file compiled by this worker reuses them
+  global _compiler, _emit
+  cache = CompileCache(cache_dir) if cache_dir else None
+  _compiler = Compiler(opt_level=opt_level, cache=cache, fold=fold)
+  _emit = emit
+
+
+def _compile_one(job):
+  source, output = job
+  output = os.path.splitext(output)[0] + EMIT_KINDS[_emit]
+  misses = _compiler.cache.misses if _compiler.cache else 0
+  start = time.perf_counter()
+  try:
+    _compiler.compile_file(source, output, _emit)
+    error = None
+  except Exception as e:
+    error = f'{e.__class__.__name__}: {e}'
+  cached = bool(_compiler.cache) and _compiler.cache.misses == misses
+  return BatchResult(source, output, time.perf_counter() - start, error,
+                     cached and error is None)
+
+
+def compile_batch(jobs, workers=None, opt_level=0, emit='ll', cache_dir=None,
+                  fold=True):
+  ''' Compile many files to LLVM IR in a pool of worker processes
+      Args:
+        jobs: List of (source path, output .ll path)
+        workers: Number of processes, defaults to the number of CPUs
+        opt_level: Optimization level passed to every Compiler
+        emit: Output kind, one of EMIT_KINDS. The extension of the
+              output paths is replaced accordingly.
+        cache_dir: Directory of a CompileCache shared by the workers,
+                   None to disable caching
+        fold: Fold constant expressions before generating the code
+      Returns:
+        Iterator of BatchResult in the order of jobs. A failing file
+        only affects its own result.
+  '''
+  workers = workers or os.cpu_count() or 1
+  # Hand out files in chunks to keep the inter-process traffic low,
+  # but small enough that all workers stay busy until the end
+  chunksize = max(1, len(jobs) // (workers * 8))
+
+  with ProcessPoolExecutor(max_workers=workers,
+                           initializer=_init_worker,
+                           initargs=(opt_level, emit, cache_dir, fold)) as pool:
+    yield from pool.map(_compile_one, jobs, chunksize=chunksize)
@@ -0,0 +1,18 @@
+import time
+import statistics
+
+
+def measure(func, repeat=5):
+  ''' Call func repeatedly and time every call
+      Args:
+        func: Callable without arguments.
+        repeat: Number of calls.
+      Returns:
+        (best, median) wall time in seconds
+  '''
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    times.append(time.perf_counter() - start)
+  return min(times), statistics.median(times)
@@ -0,0 +1,37 @@
+import gc
+import argparse
+import tracemalloc
+from .synth import SynthProgram, count_nodes
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('AST memory benchmark')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of generated functions')
+parser.add_argument('--seed', type=int, default=0)
+
+
+def ast_size(c_parser, src_code):
+  ''' Returns:
+        (AST, bytes allocated by the parse that are still alive)
+  '''
+  gc.collect()
+  tracemalloc.start()
+  try:
+    before = tracemalloc.get_traced_memory()[0]
+    ast = c_parser.parse(src_code)
+    gc.collect()
+    return ast, tracemalloc.get_traced_memory()[0] - before
+  finally:
+    tracemalloc.stop()
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, seed=args.seed).generate()
+  c_parser = Parser()
+  c_parser.parse(src_code)   # warm up the parser state
+
+  ast, size = ast_size(c_parser, src_code)
+  nodes = count_nodes(ast)
+  print(f'{src_code.count(chr(10)) + 1} lines, {nodes} AST nodes')
+  print(f'AST memory {size / 2**20:.2f} MiB, {size / nodes:.1f} bytes/node')
@@ -0,0 +1,61 @@
+import argparse
+from llvmlite import ir
+from . import measure
+from ..components.parser import Parser
+from ..components.gen_llvm import LLVMGenerator
+from ..components import libc
+
+parser = argparse.ArgumentParser('C library call generation benchmark')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of generated functions')
+parser.add_argument('--calls', type=int, default=50,
+                    help='Number of C library calls per function')
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measurements')
+
+CALLS = [
+    'printf("%d %s\\n", n, buf);',
+    'n = strlen(buf);',
+    'putchar(n);',
+    'n = isdigit(buf[0]);',
+    'n = atoi(buf);',
+    'memset(buf, 0, 16);',
+    'memcpy(copy, buf, 16);',
+    'n = strcmp(buf, copy);',
+    'puts(copy);',
+    'heap = malloc(n);',
+    'free(heap);',
+]
+
+
+class PerCallGenerator(LLVMGenerator):
+  # Builds the prototype and looks it up in the module at every call,
+  # like the generator did before the registry
+  def builtin_call(self, node):
+    symbol, func_type, _ = libc.PROTOTYPES[node.name.name]
+    func_type = ir.FunctionType(func_type.return_type, list(func_type.args),
+                                var_arg=func_type.var_arg)
+    self.builtin_func[node.name.name] = self.llvm_module.declare_intrinsic(
+        symbol, (), func_type)
+    return super().builtin_call(node)
+
+
+def program(functions, calls):
+  funcs = []
+  for i in range(functions):
+    body = ''.join(f'  {CALLS[(i + k) % len(CALLS)]}\n' for k in range(calls))
+    funcs.append(f'int f{i}(int n)\n{{\n  char buf[16];\n  char copy[16];\n'
+                 f'  char *heap;\n{body}  return n;\n}}\n')
+  return '\n'.join(funcs) + '\nint main()\n{\n  return f0(1);\n}\n'
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  tree = Parser().parse(program(args.functions, args.calls))
+  calls = args.functions * args.calls
+
+  print(f'{calls} C library calls (best of {args.repeat})')
+  print(f'{"":<12}{"codegen (ms)":>14}{"calls/sec":>12}')
+  for name, generator in (('per call', PerCallGenerator), ('registry', LLVMGenerator)):
+    best, _ = measure(lambda: generator().generate(tree), args.repeat)
+    print(f'{name:<12}{best * 1e3:>14.1f}{calls / best:>12,.0f}')
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import argparse
+from . import measure
+from ..batch import find_sources
+from ..cache import CompileCache
+from ..compiler import Compiler
+
+parser = argparse.ArgumentParser('Compile cache benchmark')
+parser.add_argument('--test_dir', default='./coursework/tests',
+                    help='Directory containing test code')
+parser.add_argument('--opt_level', type=int, default=2, choices=[0, 1, 2, 3])
+parser.add_argument('--emit', default='ll', choices=['ll', 'obj'])
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measurements')
+
+
+def compile_all(compiler, jobs, emit):
+  for source, output in jobs:
+    try:
+      compiler.compile_file(source, output, emit)
+    except Exception:
+      pass   # files the compiler rejects cost the same in every mode
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmpdir:
+    jobs = find_sources(args.test_dir, tmpdir)
+    ext = '.ll' if args.emit == 'll' else '.o'
+    jobs = [(source, os.path.splitext(output)[0] + ext) for source, output in jobs]
+
+    uncached = Compiler(opt_level=args.opt_level)
+    cache = CompileCache(os.path.join(tmpdir, 'cache'))
+    cached = Compiler(opt_level=args.opt_level, cache=cache)
+    compile_all(cached, jobs, args.emit)   # populate the cache
+
+    results = [
+      ('no cache', measure(lambda: compile_all(uncached, jobs, args.emit),
+                           args.repeat)),
+      ('warm cache', measure(lambda: compile_all(cached, jobs, args.emit),
+                             args.repeat)),
+    ]
+
+  print(f'{len(jobs)} files of {args.test_dir}, -O{args.opt_level}, emit {args.emit}')
+  print(f'{"":<12}{"best (ms)":>12}{"median (ms)":>14}')
+  for name, (best, median) in results:
+    print(f'{name:<12}{best * 1e3:>12.2f}{median * 1e3:>14.2f}')
+  print(f'cache: {cache.stats()}')
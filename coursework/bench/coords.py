@@ -0,0 +1,50 @@
+import argparse
+from . import measure
+from .synth import SynthProgram
+from ..components.coord import LineIndex
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('Coordinate resolution benchmark')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of generated functions')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of measurements')
+
+
+def coords(node):
+  ''' Returns:
+        List of the coords of all nodes below node that have one
+  '''
+  result = []
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    if node.coord is not None:
+      result.append(node.coord)
+    stack.extend(node)
+  return result
+
+
+def resolve_all(src_code, positions):
+  # What printing every coordinate costs: one index, one search each
+  index = LineIndex(src_code)
+  for lexpos in positions:
+    index.locate(lexpos)
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, seed=args.seed).generate()
+  c_parser = Parser()
+  ast = c_parser.parse(src_code)
+  positions = [coord.lexpos for coord in coords(ast)]
+
+  parse_time, _ = measure(lambda: c_parser.parse(src_code), args.repeat)
+  index_time, _ = measure(lambda: LineIndex(src_code).starts(), args.repeat)
+  resolve_time, _ = measure(lambda: resolve_all(src_code, positions), args.repeat)
+  print(f'{src_code.count(chr(10)) + 1} lines, {len(positions)} coords '
+        f'(best of {args.repeat})')
+  print(f'{"parse":<24}{parse_time * 1e3:>10.1f} ms')
+  print(f'{"build line index":<24}{index_time * 1e3:>10.1f} ms')
+  print(f'{"resolve every coord":<24}{resolve_time * 1e3:>10.1f} ms')
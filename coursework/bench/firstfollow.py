@@ -0,0 +1,124 @@
+import time
+import argparse
+from ..ply import yacc
+from .lalr import c_rules, synth_grammar
+
+parser = argparse.ArgumentParser('FIRST/FOLLOW computation benchmark')
+parser.add_argument('--copies', type=int, nargs='+', default=[1, 4, 8, 16],
+                    help='Numbers of copies of the C grammar to analyse')
+parser.add_argument('--levels', type=int, nargs='+', default=[125, 250, 500],
+                    help='Numbers of operator levels of the expression grammars')
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of measurements')
+
+
+# FIRST and FOLLOW as lists of names, iterated to a fixed point over the
+# productions, like Grammar did before the bitsets
+
+def list_first_seq(first, beta):
+  result = []
+  for x in beta:
+    for f in first[x]:
+      if f != '<empty>' and f not in result:
+        result.append(f)
+    if '<empty>' not in first[x]:
+      break
+  else:
+    result.append('<empty>')
+  return result
+
+
+def list_first_follow(grammar):
+  first = {t: [t] for t in grammar.Terminals}
+  first['$end'] = ['$end']
+  for n in grammar.Nonterminals:
+    first[n] = []
+  changed = True
+  while changed:
+    changed = False
+    for n in grammar.Nonterminals:
+      for p in grammar.Prodnames.get(n, []):
+        for f in list_first_seq(first, p.prod):
+          if f not in first[n]:
+            first[n].append(f)
+            changed = True
+
+  follow = {n: [] for n in grammar.Nonterminals}
+  follow[grammar.Start] = ['$end']
+  changed = True
+  while changed:
+    changed = False
+    for p in grammar.Productions[1:]:
+      for i, b in enumerate(p.prod):
+        if b not in grammar.Nonterminals:
+          continue
+        rest = list_first_seq(first, p.prod[i + 1:])
+        for f in rest:
+          if f != '<empty>' and f not in follow[b]:
+            follow[b].append(f)
+            changed = True
+        if '<empty>' in rest:
+          for f in follow[p.name]:
+            if f not in follow[b]:
+              follow[b].append(f)
+              changed = True
+  return first, follow
+
+
+def chain_grammar(levels):
+  ''' Expression grammar with an operator per precedence level:
+        e0 : e0 OP0 e1 | e1
+        ...
+        eN : NUM | LPAREN e0 RPAREN
+      FIRST sets reach e0 from eN through all the levels
+  '''
+  ops = [f'OP{i}' for i in range(levels)]
+  grammar = yacc.Grammar(ops + ['NUM', 'LPAREN', 'RPAREN'])
+  for i, op in enumerate(ops):
+    grammar.add_production(f'e{i}', [f'e{i}', op, f'e{i + 1}'])
+    grammar.add_production(f'e{i}', [f'e{i + 1}'])
+  grammar.add_production(f'e{levels}', ['NUM'])
+  grammar.add_production(f'e{levels}', ['LPAREN', 'e0', 'RPAREN'])
+  grammar.set_start('e0')
+  return grammar
+
+
+def best_time(func, grammar, repeat):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = func(grammar)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, result
+
+
+def same_sets(analysis, first, follow):
+  ''' Check the bitsets against the lists '''
+  for n in analysis.nonterminals:
+    names = set(analysis.terminals_of(analysis.first[n]))
+    if n in analysis.nullable:
+      names.add('<empty>')
+    if names != set(first[n]) or set(analysis.terminals_of(analysis.follow[n])) != set(follow[n]):
+      return False
+  return True
+
+
+def compare(name, grammar, repeat):
+  lists, (first, follow) = best_time(list_first_follow, grammar, repeat)
+  bitsets, analysis = best_time(yacc.GrammarAnalysis, grammar, repeat)
+  if not same_sets(analysis, first, follow):
+    raise SystemExit(f'Different sets for {name}')
+  print(f'{name:<18}{len(grammar.Productions):>13,}{lists * 1e3:>12.1f}'
+        f'{bitsets * 1e3:>14.2f}{lists / bitsets:>8.0f}x')
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  rules = c_rules()
+  print(f'FIRST and FOLLOW of all nonterminals (best of {args.repeat})')
+  print(f'{"grammar":<18}{"productions":>13}{"lists (ms)":>12}{"bitsets (ms)":>14}{"speedup":>9}')
+  for copies in args.copies:
+    compare(f'C x {copies}', synth_grammar(copies, rules), args.repeat)
+  for levels in args.levels:
+    compare(f'{levels} levels', chain_grammar(levels), args.repeat)
@@ -0,0 +1,55 @@
+import time
+import argparse
+from . import measure
+from .synth import SynthProgram, count_nodes
+from ..components.parser import Parser
+from ..components.folder import ConstantFolder
+from ..components.gen_llvm import LLVMGenerator
+
+parser = argparse.ArgumentParser('Constant folding benchmark')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of generated functions')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measurements')
+
+
+def instructions(module):
+  return sum(len(block.instructions) for func in module.functions
+             for block in func.blocks)
+
+
+def fold_time(c_parser, src_code, repeat):
+  ''' Folding changes the tree, every measurement gets a fresh one '''
+  times = []
+  for _ in range(repeat):
+    head = c_parser.parse(src_code)
+    start = time.perf_counter()
+    ConstantFolder().fold(head)
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, seed=args.seed).generate()
+  c_parser = Parser()
+  tree = c_parser.parse(src_code)
+  folded = c_parser.parse(src_code)
+  folder = ConstantFolder()
+  folder.fold(folded)
+
+  print(f'{count_nodes(tree)} AST nodes, {count_nodes(folded)} after folding '
+        f'(best of {args.repeat})')
+  print(f'{folder.stats()}')
+  print(f'{"fold pass":<12}{fold_time(c_parser, src_code, args.repeat) * 1e3:>12.1f} ms\n')
+
+  # Alternating keeps drifts of the machine out of the comparison
+  times = {'unfolded': [], 'folded': []}
+  for _ in range(args.repeat):
+    for name, head in (('unfolded', tree), ('folded', folded)):
+      times[name].append(measure(lambda: LLVMGenerator().generate(head), 1)[0])
+  print(f'{"":<12}{"codegen (ms)":>14}{"instructions":>14}')
+  for name, head in (('unfolded', tree), ('folded', folded)):
+    print(f'{name:<12}{min(times[name]) * 1e3:>14.1f}'
+          f'{instructions(LLVMGenerator().generate(head)):>14,}')
@@ -0,0 +1,94 @@
+import io
+import re
+import time
+import random
+import argparse
+import statistics
+from .synth import SynthProgram
+from ..components.incremental import IncrementalParser
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('Incremental reparse latency benchmark')
+parser.add_argument('--functions', type=int, default=490,
+                    help='Number of generated functions, 490 make about 50k lines')
+parser.add_argument('--edits', type=int, default=50,
+                    help='Number of edits of every kind')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--check', action='store_true',
+                    help='Compare the final AST with a full parse')
+
+
+def show(node):
+  buf = io.StringIO()
+  node.show(buf=buf, showcoord=True)
+  return re.sub(r'0x[0-9a-f]+', '', buf.getvalue())
+
+
+def timed_edit(inc, start, end, text):
+  ''' Returns:
+        (seconds, characters reparsed, whether the source parses)
+  '''
+  begin = time.perf_counter()
+  try:
+    inc.edit(start, end, text)
+    ok = True
+  except Exception:
+    ok = False
+  return time.perf_counter() - begin, inc.reparsed, ok
+
+
+def edits(inc, kind, rand):
+  ''' Single character edit of the given kind at a random place,
+      followed by the edit undoing it
+      Returns:
+        [(name, (start, end, text)), (name, (start, end, text))]
+  '''
+  src_code = inc.src_code
+  if kind == 'digit':
+    pos = rand.choice([m.start() for m in re.finditer(r'(?<=[ (])[1-9]', src_code)])
+    digit = rand.choice([d for d in '123456789' if d != src_code[pos]])
+    return [('change digit', (pos, pos + 1, digit)),
+            ('change digit', (pos, pos + 1, src_code[pos]))]
+  if kind == 'space':
+    pos = rand.choice([m.end() for m in re.finditer(';', src_code)])
+    return [('insert space', (pos, pos, ' ')), ('delete space', (pos, pos + 1, ''))]
+  # A missing ';' leaves the source broken until it is typed again
+  pos = rand.choice([m.start() for m in re.finditer(';', src_code)])
+  return [('delete ;', (pos, pos + 1, '')), ('retype ;', (pos, pos, ';'))]
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, seed=args.seed).generate()
+  rand = random.Random(args.seed)
+  c_parser = Parser()
+  inc = IncrementalParser(c_parser)
+
+  start = time.perf_counter()
+  c_parser.parse(src_code)
+  full_time = time.perf_counter() - start
+  start = time.perf_counter()
+  inc.parse(src_code)
+  build_time = time.perf_counter() - start
+  print(f'{src_code.count(chr(10)) + 1} lines, {len(src_code)} bytes, '
+        f'{len(inc.segments)} segments')
+  print(f'{"full parse":<24}{full_time * 1e3:>10.1f} ms')
+  print(f'{"incremental build":<24}{build_time * 1e3:>10.1f} ms\n')
+
+  times = {}
+  sizes = {}
+  for kind in ('digit', 'space', 'semicolon'):
+    for _ in range(args.edits):
+      for name, edit in edits(inc, kind, rand):
+        seconds, size, _ = timed_edit(inc, *edit)
+        times.setdefault(name, []).append(seconds)
+        sizes.setdefault(name, []).append(size)
+
+  print(f'{"edit":<16}{"median (ms)":>12}{"max (ms)":>10}{"reparsed (B)":>14}')
+  for name in times:
+    print(f'{name:<16}{statistics.median(times[name]) * 1e3:>12.2f}'
+          f'{max(times[name]) * 1e3:>10.2f}{statistics.median(sizes[name]):>14,.0f}')
+
+  if args.check:
+    same = show(inc.result()) == show(Parser().parse(inc.src_code))
+    print(f'\nAST equal to a full parse: {same}')
@@ -0,0 +1,79 @@
+import time
+import argparse
+from ..ply import yacc
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('LALR table construction benchmark')
+parser.add_argument('--copies', type=int, nargs='+', default=[1, 2, 4, 8],
+                    help='Numbers of copies of the C grammar to build tables for')
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of measurements')
+
+
+def c_rules():
+  ''' Tokens, precedence and productions of the coursework grammar
+      Returns:
+        (tokens, preclist, [(file, line, name, symbols)])
+  '''
+  c_parser = Parser(tabdir=None)
+  pinfo = yacc.ParserReflect({name: getattr(c_parser, name) for name in dir(c_parser)})
+  pinfo.get_all()
+  pinfo.validate_all()
+  return pinfo.tokens, pinfo.preclist, [rule for _, rule in pinfo.grammar]
+
+
+def synth_grammar(copies, rules=None):
+  ''' Grammar made of copies of the C grammar, the nonterminals of
+      copy k renamed with a _k suffix and its translation units
+      starting with the token COPY_k, so the tables grow linearly with
+      the copies
+      Args:
+        rules: Result of c_rules, computed if None
+      Returns:
+        yacc.Grammar, its start symbol set
+  '''
+  tokens, preclist, productions = rules or c_rules()
+  names = {name for _, _, name, _ in productions}
+  prefixes = [f'COPY_{k}' for k in range(1, copies)]
+  grammar = yacc.Grammar(list(tokens) + prefixes)
+  for term, assoc, level in preclist:
+    grammar.set_precedence(term, assoc, level)
+
+  grammar.add_production('program', ['translation_unit_or_empty'])
+  for k, prefix in enumerate(prefixes, 1):
+    grammar.add_production('program', [prefix, f'translation_unit_or_empty_{k}'])
+  for k in range(copies):
+    suffix = f'_{k}' if k else ''
+    for file, line, name, syms in productions:
+      # Rules of a later copy come later, for the reduce/reduce resolution
+      grammar.add_production(name + suffix,
+                             [sym + suffix if sym in names else sym for sym in syms],
+                             file=file, line=line + k * 100000)
+  grammar.set_start('program')
+  return grammar
+
+
+def build_time(copies, rules, repeat):
+  ''' Best LRTable construction time, on a fresh grammar every time
+      Returns:
+        (seconds, LRTable)
+  '''
+  best = None
+  for _ in range(repeat):
+    grammar = synth_grammar(copies, rules)
+    start = time.perf_counter()
+    lr = yacc.LRTable(grammar)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, lr
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  rules = c_rules()
+  print(f'LRTable construction (best of {args.repeat})')
+  print(f'{"copies":>8}{"productions":>13}{"states":>8}{"build (ms)":>12}{"states/s":>10}')
+  for copies in args.copies:
+    seconds, lr = build_time(copies, rules, args.repeat)
+    print(f'{copies:>8}{len(lr.lr_productions):>13,}{len(lr.lr_action):>8,}'
+          f'{seconds * 1e3:>12.1f}{len(lr.lr_action) / seconds:>10,.0f}')
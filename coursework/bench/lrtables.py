@@ -0,0 +1,81 @@
+import argparse
+from . import measure
+from .synth import SynthProgram
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('LR table lookup benchmark')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of generated functions')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measurements')
+
+
+def count_reductions(c_parser, src_code, arrays):
+  counter = [0]
+  productions = c_parser.parser.productions
+  actions = [prod.callable for prod in productions]
+
+  def counted(action):
+    def counted_action(p):
+      counter[0] += 1
+      action(p)
+    return counted_action
+
+  for prod in productions:
+    prod.callable = prod.callable and counted(prod.callable)
+  try:
+    c_parser.parse_tokens(src_code, arrays)
+  finally:
+    for prod, action in zip(productions, actions):
+      prod.callable = action
+  return counter[0]
+
+
+def no_actions(c_parser):
+  ''' Replace the semantic actions by one doing nothing, leaving the
+      table lookups and stack handling of the parse loop
+      Returns:
+        Function restoring the actions
+  '''
+  productions = c_parser.parser.productions
+  actions = [prod.callable for prod in productions]
+
+  def nothing(p):
+    pass
+
+  for prod in productions:
+    prod.callable = nothing
+
+  def restore():
+    for prod, action in zip(productions, actions):
+      prod.callable = action
+  return restore
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, seed=args.seed).generate()
+  c_parser = Parser()
+  lr_parser = c_parser.parser
+  # Lexed once, the measurements leave out the lexer
+  arrays = c_parser.lexer.tokenize_all(src_code)
+  reductions = count_reductions(c_parser, src_code, arrays)
+
+  print(f'{len(arrays[0])} tokens, {reductions} reductions (best of {args.repeat})')
+  print(f'{"":<24}{"dict (red/s)":>14}{"dense (red/s)":>15}{"speedup":>9}')
+  for name in ('parse', 'parse loop only'):
+    restore = no_actions(c_parser) if name == 'parse loop only' else (lambda: None)
+    times = {'dict': [], 'dense': []}
+    try:
+      # Alternating keeps drifts of the machine out of the comparison
+      for _ in range(args.repeat):
+        lr_parser.disable_dense_tables()
+        times['dict'].append(measure(lambda: c_parser.parse_tokens(src_code, arrays), 1)[0])
+        lr_parser.set_dense_tables()
+        times['dense'].append(measure(lambda: c_parser.parse_tokens(src_code, arrays), 1)[0])
+    finally:
+      restore()
+    dict_time, dense_time = min(times['dict']), min(times['dense'])
+    print(f'{name:<24}{reductions / dict_time:>14,.0f}{reductions / dense_time:>15,.0f}'
+          f'{dict_time / dense_time:>8.2f}x')
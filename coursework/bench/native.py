@@ -0,0 +1,51 @@
+import os
+import time
+import tempfile
+import argparse
+from . import measure
+from .optlevel import Silenced
+from ..compiler import Compiler
+from ..components.engine import ExecutionEngine
+from ..components import native
+
+parser = argparse.ArgumentParser('JIT vs shared library benchmark')
+parser.add_argument('--file', default='./coursework/tests/prog_sort.c',
+                    help='C program to benchmark')
+parser.add_argument('--opt_level', type=int, default=2, choices=[0, 1, 2, 3])
+parser.add_argument('--runs', type=int, default=50,
+                    help='Number of program runs per measurement')
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measurements')
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  compiler = Compiler(opt_level=args.opt_level)
+  code = compiler.gen_llvm_ir(None, compiler.parse_file(args.file))
+  ir_text = str(code)
+  engine = ExecutionEngine(args.opt_level)
+
+  with tempfile.TemporaryDirectory() as outdir:
+    sopath = os.path.join(outdir, 'prog.so')
+    start = time.perf_counter()
+    compiler.emit_shared(code, sopath)
+    build_time = time.perf_counter() - start
+
+    def jit():
+      for _ in range(args.runs):
+        engine.run(ir_text)
+
+    def shared():
+      for _ in range(args.runs):
+        native.run_shared(sopath)
+
+    with Silenced():
+      results = [('JIT', measure(jit, args.repeat)),
+                 ('cached .so', measure(shared, args.repeat))]
+
+  print(f'{args.file} at -O{args.opt_level}, one-time .so build '
+        f'{build_time * 1e3:.2f} ms')
+  print(f'{"per run":<12}{"best (ms)":>12}{"median (ms)":>14}')
+  for name, (best, median) in results:
+    print(f'{name:<12}{best / args.runs * 1e3:>12.3f}'
+          f'{median / args.runs * 1e3:>14.3f}')
@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import ctypes
+import argparse
+from . import measure
+from ..compiler import Compiler
+from ..components.engine import ExecutionEngine
+from ..components.optimizer import OPT_LEVELS
+
+parser = argparse.ArgumentParser('Optimization level benchmark')
+parser.add_argument('--file', default=None,
+                    help='C program to benchmark, WORKLOAD by default')
+parser.add_argument('--runs', type=int, default=2000,
+                    help='Number of calls of main per measurement')
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measurements')
+
+libc = ctypes.CDLL(None)
+
+# Loops over an array calling a small function, without printf: the
+# time goes to the generated code, which -O2 inlines, keeps in registers
+# and hoists the invariant address computations out of
+WORKLOAD = '''
+int square(int x)
+{
+  return x * x;
+}
+
+int main()
+{
+  int a[256];
+  int i = 0;
+  int n = 0;
+  int sum = 0;
+  while (i < 256) {
+    a[i] = i;
+    i = i + 1;
+  }
+  while (n < 100) {
+    i = 0;
+    while (i < 256) {
+      sum = sum + square(a[i]) % 7;
+      i = i + 1;
+    }
+    n = n + 1;
+  }
+  return sum;
+}
+'''
+
+
+class Silenced(object):
+  ''' Redirect the process-level stdout to /dev/null, so that printf
+      calls of the benchmarked program do not end up in the report
+  '''
+  def __enter__(self):
+    sys.stdout.flush()
+    self.saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+  def __exit__(self, *exc):
+    libc.fflush(None)
+    os.dup2(self.saved, 1)
+    os.close(self.saved)
+
+
+def run_level(src_code, opt_level, runs, repeat):
+  compiler = Compiler(opt_level=opt_level)
+  engine = ExecutionEngine(opt_level)
+
+  start = time.perf_counter()
+  ast = compiler.parser.parse(src_code)
+  mod = engine.load(compiler.gen_llvm_ir(None, ast))
+  engine.engine.add_module(mod)
+  engine.engine.finalize_object()
+  compile_time = time.perf_counter() - start
+
+  cfunc = ctypes.CFUNCTYPE(ctypes.c_int)(engine.engine.get_function_address('main'))
+
+  def call_main():
+    for _ in range(runs):
+      cfunc()
+
+  with Silenced():
+    best, median = measure(call_main, repeat)
+  engine.engine.remove_module(mod)
+  return compile_time, best / runs, median / runs
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  if args.file:
+    with open(args.file, 'r') as f:
+      src_code = f.read()
+  else:
+    src_code = WORKLOAD
+
+  print(f'{args.file or "WORKLOAD"}, {args.runs} calls of main per measurement')
+  print(f'{"level":<7}{"compile (ms)":>14}{"best (us)":>12}{"median (us)":>14}{"speedup":>10}')
+  baseline = None
+  for opt_level in OPT_LEVELS:
+    compile_time, best, median = run_level(
+      src_code, opt_level, args.runs, args.repeat)
+    baseline = baseline or median
+    print(f'-O{opt_level:<5}{compile_time * 1e3:>14.2f}{best * 1e6:>12.2f}'
+          f'{median * 1e6:>14.2f}{baseline / median:>9.2f}x')
@@ -0,0 +1,43 @@
+import os
+import time
+import argparse
+import llvmlite.binding as llvm
+from .synth import SynthProgram
+from ..components.parser import Parser
+from ..components.gen_llvm import LLVMGenerator
+from ..components.engine import initialize_llvm
+from ..components import gen_parallel
+
+parser = argparse.ArgumentParser('Parallel code generation benchmark')
+parser.add_argument('--functions', type=int, default=1000,
+                    help='Number of generated functions')
+parser.add_argument('--depth', type=int, default=4,
+                    help='Nesting depth of the loops and branches')
+parser.add_argument('--workers', type=int, nargs='+',
+                    default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                    help='Worker counts to measure')
+parser.add_argument('--seed', type=int, default=0)
+
+
+def timed(func):
+  start = time.perf_counter()
+  result = func()
+  return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, depth=args.depth,
+                          seed=args.seed).generate()
+  ast = Parser().parse(src_code)
+  initialize_llvm()
+  print(f'{args.functions} functions, {src_code.count(chr(10)) + 1} lines, '
+        f'{os.cpu_count()} CPUs')
+
+  gen_time, module = timed(lambda: LLVMGenerator().generate(ast))
+  parse_time, _ = timed(lambda: llvm.parse_assembly(str(module)))
+  print(f'{"sequential":<16}{gen_time:>8.2f} s  (+{parse_time:.2f} s to an llvm.ModuleRef)')
+  for workers in args.workers:
+    seconds, _ = timed(lambda: gen_parallel.generate(ast, workers))
+    print(f'{f"{workers} workers":<16}{seconds:>8.2f} s  '
+          f'speedup {(gen_time + parse_time) / seconds:.2f}x')
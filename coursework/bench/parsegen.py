@@ -0,0 +1,74 @@
+import os
+import argparse
+import tempfile
+from . import measure
+from .synth import SynthProgram
+from .lrtables import count_reductions, no_actions
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('Generated parser module benchmark')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of generated functions')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measurements')
+
+LOOPS = ('dict', 'dense', 'generated')
+
+
+def use_loop(lr_parser, name, generated):
+  lr_parser.disable_generated()
+  lr_parser.disable_dense_tables()
+  if name != 'dict':
+    lr_parser.set_dense_tables()
+  if name == 'generated':
+    lr_parser.set_generated(generated)
+
+
+def startup(repeat):
+  ''' Parser() construction with the tables and the module written by a
+      first construction, and the time of that first one
+  '''
+  with tempfile.TemporaryDirectory() as tabdir:
+    cold, _ = measure(lambda: Parser(tabdir=tabdir), 1)
+    os.remove(os.path.join(tabdir, 'c_parsegen.py'))
+    # Writes the module again from the cached tables
+    write, _ = measure(lambda: Parser(tabdir=tabdir), 1)
+    warm, _ = measure(lambda: Parser(tabdir=tabdir), repeat)
+  return cold, write, warm
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, seed=args.seed).generate()
+  c_parser = Parser()
+  lr_parser = c_parser.parser
+  generated = lr_parser.generated
+  if generated is None:
+    raise SystemExit('No generated parser module')
+  # Lexed once, the measurements leave out the lexer
+  arrays = c_parser.lexer.tokenize_all(src_code)
+  reductions = count_reductions(c_parser, src_code, arrays)
+
+  print(f'{len(arrays[0])} tokens, {reductions} reductions (best of {args.repeat})')
+  print(f'{"":<18}' + ''.join(f'{name + " (red/s)":>18}' for name in LOOPS) +
+        f'{"vs dense":>10}')
+  for name in ('parse', 'parse loop only'):
+    restore = no_actions(c_parser) if name == 'parse loop only' else (lambda: None)
+    times = {loop: [] for loop in LOOPS}
+    try:
+      # Alternating keeps drifts of the machine out of the comparison
+      for _ in range(args.repeat):
+        for loop in LOOPS:
+          use_loop(lr_parser, loop, generated)
+          times[loop].append(measure(lambda: c_parser.parse_tokens(src_code, arrays), 1)[0])
+    finally:
+      restore()
+      use_loop(lr_parser, 'generated', generated)
+    best = {loop: min(times[loop]) for loop in LOOPS}
+    print(f'{name:<18}' + ''.join(f'{reductions / best[loop]:>18,.0f}' for loop in LOOPS) +
+          f'{best["dense"] / best["generated"]:>9.2f}x')
+
+  cold, write, warm = startup(args.repeat)
+  print(f'\nParser() without cache {cold * 1e3:.1f} ms, writing the module '
+        f'{write * 1e3:.1f} ms, cached {warm * 1e3:.1f} ms')
@@ -0,0 +1,44 @@
+import argparse
+from . import measure
+from .synth import SynthProgram
+from ..components.parser import Parser
+from ..components.gen_llvm import LLVMGenerator
+from ..components.engine import initialize_llvm
+from ..components import native
+
+parser = argparse.ArgumentParser('String constant pool benchmark')
+parser.add_argument('--functions', type=int, default=500,
+                    help='Number of generated functions')
+parser.add_argument('--strings', type=int, default=20,
+                    help='Number of distinct string literals')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of measurements')
+
+
+class UnpooledGenerator(LLVMGenerator):
+  # A new global for every literal, like before the pool
+  def pooled_constant(self, constant, prefix='.str'):
+    self.constant_pool.clear()
+    return super().pooled_constant(constant, prefix)
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, strings=args.strings,
+                          seed=args.seed).generate()
+  tree = Parser().parse(src_code)
+  initialize_llvm()
+
+  print(f'{args.functions} functions, {args.strings} distinct strings '
+        f'(best of {args.repeat})')
+  print(f'{"":<10}{"globals":>9}{"IR bytes":>11}{"object bytes":>14}{"to object (ms)":>16}')
+  for name, generator in (('unpooled', UnpooledGenerator), ('pooled', LLVMGenerator)):
+    gen = generator()
+    module = gen.generate(tree)
+    ir_text = str(module)
+    obj_time, _ = measure(lambda: native.compile_object(ir_text), args.repeat)
+    obj = native.compile_object(ir_text)
+    print(f'{name:<10}{len(module.global_values):>9}{len(ir_text):>11,}'
+          f'{len(obj):>14,}{obj_time * 1e3:>16.1f}')
+  print(f'\nPool: {gen.pool_stats()}')
@@ -0,0 +1,43 @@
+import argparse
+from . import measure
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('Parse time scaling benchmark')
+parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                    help='Number of statements of the generated function')
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of measurements')
+
+
+def statements(n):
+  ''' A function with n assignments '''
+  body = ''.join(f'  x = x + {i % 100};\n' for i in range(n))
+  return f'int main()\n{{\n  int x = 0;\n{body}  return x;\n}}\n'
+
+
+def declarators(n):
+  ''' A function with one declaration of n variables '''
+  names = ', '.join(f'v{i}' for i in range(n))
+  return f'int main()\n{{\n  int {names};\n  return 0;\n}}\n'
+
+
+def declarations(n):
+  ''' A struct with n members '''
+  members = ''.join(f'  int m{i};\n' for i in range(n))
+  return f'struct S\n{{\n{members}}};\n'
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  c_parser = Parser()
+
+  print(f'{"input":<14}{"n":>8}{"best (s)":>11}{"us/item":>10}{"growth":>9}')
+  for generate in (statements, declarators, declarations):
+    previous = None
+    for n in args.sizes:
+      src_code = generate(n)
+      best, _ = measure(lambda: c_parser.parse(src_code), args.repeat)
+      # For linear behavior the time per item stays flat as n grows
+      growth = f'{best / previous[1] / (n / previous[0]):.2f}x' if previous else ''
+      print(f'{generate.__name__:<14}{n:>8}{best:>11.3f}{best / n * 1e6:>10.2f}{growth:>9}')
+      previous = (n, best)
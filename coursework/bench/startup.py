@@ -0,0 +1,51 @@
+import re
+import os
+import tempfile
+import argparse
+from . import measure
+from ..components.lexer import Lexer
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('Lexer/Parser startup benchmark')
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measured constructions')
+
+
+def cold_start():
+  # A fresh table directory every time, so the tables are always rebuilt
+  with tempfile.TemporaryDirectory() as tabdir:
+    Parser(tabdir=tabdir)
+
+
+def build_lexer(lextab):
+  # Compiled patterns are cached by the re module, forget them to get
+  # the cost a new process would pay
+  re.purge()
+  Lexer(None, None).build(lextab=lextab)
+
+
+def report(title, results):
+  print(f'{title:<12}{"best (ms)":>12}{"median (ms)":>14}')
+  for name, (best, median) in results:
+    print(f'{name:<12}{best * 1e3:>12.2f}{median * 1e3:>14.2f}')
+  print()
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tabdir:
+    lextab = os.path.join(tabdir, 'c_lextab.pickle')
+    build_lexer(lextab)   # populate the table cache
+    report('Lexer', [
+      ('no cache', measure(lambda: build_lexer(None), args.repeat)),
+      ('warm cache', measure(lambda: build_lexer(lextab), args.repeat)),
+    ])
+
+  with tempfile.TemporaryDirectory() as tabdir:
+    Parser(tabdir=tabdir)   # populate the table cache
+    report('Parser', [
+      ('no cache', measure(lambda: Parser(tabdir=None), args.repeat)),
+      ('cold cache', measure(cold_start, args.repeat)),
+      ('warm cache', measure(lambda: Parser(tabdir=tabdir), args.repeat)),
+    ])
@@ -0,0 +1,87 @@
+import os
+import sys
+import mmap
+import time
+import tempfile
+import argparse
+import subprocess
+from ..components.lexer import Lexer
+from ..components.parser import Parser
+from ..components.profiler import peak_rss_kb
+
+parser = argparse.ArgumentParser('Streaming input benchmark')
+parser.add_argument('--size_mb', type=float, default=50,
+                    help='Size of the generated source in MiB')
+parser.add_argument('--what', default='lex', choices=['lex', 'parse'],
+                    help='Lex only, or lex and parse into an AST')
+parser.add_argument('--chunksize', type=int, default=1 << 20)
+parser.add_argument('--child', default=None, choices=['string', 'stream', 'mmap'],
+                    help=argparse.SUPPRESS)
+parser.add_argument('file', nargs='?', help=argparse.SUPPRESS)
+
+
+def write_tables(filepath, size):
+  ''' Write a source made of global lookup tables, line by line '''
+  with open(filepath, mode='w', encoding='utf-8') as f:
+    k = 0
+    while f.tell() < size:
+      values = ', '.join(str((k * 7919 + i * 104729) % 100000) for i in range(64))
+      f.write(f'int table{k}[64] = {{{values}}};\n')
+      k += 1
+
+
+def run_child(args):
+  start = time.perf_counter()
+  if args.what == 'lex':
+    lexer = Lexer(lambda: None, lambda: None)
+    lexer.build()
+    tokens = 0
+  else:
+    c_parser = Parser()
+
+  with open(args.file, mode='rb') as f:
+    if args.child == 'string':
+      source = f.read().decode('utf-8')
+    elif args.child == 'mmap':
+      source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+      source = f
+
+    if args.what == 'lex':
+      if args.child == 'string':
+        lexer.input(source)
+      else:
+        lexer.input_stream(source, args.chunksize)
+      while lexer.token() is not None:
+        tokens += 1
+      result = f'{tokens} tokens'
+    else:
+      if args.child == 'string':
+        ast = c_parser.parse(source)
+      else:
+        ast = c_parser.parse_stream(source, chunksize=args.chunksize)
+      result = f'{len(ast.ext)} declarations'
+
+  print(f'{time.perf_counter() - start} {peak_rss_kb()} {result}')
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  if args.child:
+    run_child(args)
+    raise SystemExit(0)
+
+  with tempfile.TemporaryDirectory() as tmpdir:
+    filepath = os.path.join(tmpdir, 'tables.c')
+    write_tables(filepath, int(args.size_mb * 2**20))
+    size = os.path.getsize(filepath)
+    print(f'{size / 2**20:.1f} MiB of lookup tables, {args.what}')
+    print(f'{"input":<8}{"time (s)":>10}{"peak RSS (MiB)":>16}  result')
+    # Every mode runs in a fresh process, so peak RSS is its own
+    for mode in ('string', 'stream', 'mmap'):
+      out = subprocess.run(
+        [sys.executable, '-m', 'coursework.bench.stream', '--child', mode,
+         '--what', args.what, '--chunksize', str(args.chunksize), filepath],
+        capture_output=True, text=True, check=True).stdout.split(maxsplit=2)
+      elapsed, peak, result = float(out[0]), int(out[1]), out[2].strip()
+      print(f'{mode:<8}{elapsed:>10.1f}{peak / 1024:>16.1f}  {result}')
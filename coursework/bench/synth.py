@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import random
+import argparse
+from . import measure
+from ..components.lexer import Lexer
+from ..components.parser import Parser
+from ..components.gen_llvm import LLVMGenerator
+
+parser = argparse.ArgumentParser('Throughput benchmark on synthetic C programs')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of generated functions')
+parser.add_argument('--structs', type=int, default=100,
+                    help='Number of generated struct types')
+parser.add_argument('--strings', type=int, default=1000,
+                    help='Number of distinct string literals')
+parser.add_argument('--depth', type=int, default=6,
+                    help='Nesting depth of the loops and branches')
+parser.add_argument('--expr_length', type=int, default=24,
+                    help='Number of operands of the long expressions')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of measurements')
+parser.add_argument('--baseline', default=os.path.join(os.path.dirname(__file__),
+                                                      'baselines.json'),
+                    help='JSON file with the stored baselines')
+parser.add_argument('--save_baseline', action='store_true',
+                    help='Store the results as the new baseline')
+parser.add_argument('--threshold', type=float, default=0.2,
+                    help='Relative throughput loss reported as a regression')
+parser.add_argument('--dump', default=None,
+                    help='Write the generated program to this file and exit')
+
+
+class SynthProgram(object):
+  ''' Generator of random C translation units restricted to what the
+      coursework grammar and code generator accept: int and char
+      variables, arrays, pointers, structs, while, if/else, function
+      calls and string literals passed to printf.
+  '''
+
+  # Comparisons yield i1, which the generator does not widen to int,
+  # so they only appear as conditions
+  BINARY_OPS = ['+', '-', '*']
+  COMPARE_OPS = ['<', '>', '<=', '>=', '==', '!=']
+
+  def __init__(self, functions=200, structs=100, strings=1000, depth=6,
+               expr_length=24, seed=0):
+    self.functions = functions
+    self.structs = structs
+    self.strings = strings
+    self.depth = depth
+    self.expr_length = expr_length
+    self.rand = random.Random(seed)
+    self.next_string = 0
+
+  def generate(self):
+    ''' Returns:
+          Source text of the program
+    '''
+    out = []
+    for i in range(self.structs):
+      out.append(self.struct(i))
+    out.append(f'int table[{max(self.functions, 1)}];\n')
+    for i in range(self.functions):
+      out.append(self.function(i))
+    out.append(self.main())
+    return '\n'.join(out)
+
+  def struct(self, i):
+    # m0 is always an int, the functions assign to it
+    members = ''.join(f'  {"int" if k == 0 else self.rand.choice(["int", "char"])} m{k};\n'
+                      for k in range(self.rand.randint(2, 8)))
+    return f'struct S{i}\n{{\n{members}}};\n'
+
+  def string(self):
+    # Cycle through the string table, so every literal is used
+    k = self.next_string % max(self.strings, 1)
+    self.next_string += 1
+    return f'"s{k} %d\\n"'
+
+  def expr(self, names, length):
+    r = self.rand
+    operands = [r.choice(names) if r.random() < 0.7 else str(r.randint(1, 99))
+                for _ in range(length)]
+    text = operands[0]
+    for operand in operands[1:]:
+      if r.random() < 0.15:
+        text = f'({text})'
+      text = f'{text} {r.choice(self.BINARY_OPS)} {operand}'
+    return text
+
+  def condition(self, names):
+    r = self.rand
+    cond = f'({self.expr(names, 2)}) {r.choice(self.COMPARE_OPS)} ({self.expr(names, 2)})'
+    if r.random() < 0.3:
+      # The grammar has no operator precedence, hence the parentheses
+      cond = (f'({cond}) {r.choice(["&&", "||"])} '
+              f'({r.choice(names)} {r.choice(self.COMPARE_OPS)} {r.randint(0, 99)})')
+    return cond
+
+  def block(self, names, depth, indent):
+    r = self.rand
+    pad = '  ' * indent
+    lines = []
+    for _ in range(r.randint(1, 3)):
+      target = r.choice(names)
+      lines.append(f'{pad}{target} = {self.expr(names, r.randint(2, 6))};')
+    if depth > 0:
+      loop = r.random() < 0.5
+      if loop:
+        lines.append(f'{pad}while ({r.choice(names)} > {r.randint(100, 999)})')
+        lines.append(f'{pad}{{')
+        lines.append(f'{pad}  {names[0]} = {names[0]} - {r.randint(1, 9)};')
+      else:
+        lines.append(f'{pad}if ({self.condition(names)})')
+        lines.append(f'{pad}{{')
+      lines.extend(self.block(names, depth - 1, indent + 1))
+      lines.append(f'{pad}}}')
+      if not loop and r.random() < 0.5:
+        lines.append(f'{pad}else')
+        lines.append(f'{pad}{{')
+        lines.extend(self.block(names, depth - 1, indent + 1))
+        lines.append(f'{pad}}}')
+    return lines
+
+  def function(self, i):
+    r = self.rand
+    names = ['a', 'b', 'x', 'y', 'z']
+    body = [
+      f'  int x = {self.expr(["a", "b"], 3)};',
+      f'  int y = {r.randint(0, 9)};',
+      f'  int z = 0;',
+      f'  int buf[8];',
+      f'  int *p = &x;',
+      f'  char c = \'{chr(r.randint(97, 122))}\';',
+    ]
+    if self.structs:
+      body.append(f'  struct S{r.randrange(self.structs)} s;')
+      body.append(f'  s.m0 = x;')
+    body.append(f'  *p = {self.expr(names, 4)};')
+    body.append(f'  buf[{r.randint(0, 7)}] = {self.expr(names, 4)};')
+    body.append(f'  z = {self.expr(names, self.expr_length)};')
+    body.extend(self.block(names, self.depth, 1))
+    if i > 0:
+      body.append(f'  y = f{r.randrange(i)}(x, y);')
+    body.append(f'  table[{i}] = z;')
+    body.append(f'  printf({self.string()}, z);')
+    body.append(f'  return x + y;')
+    return f'int f{i}(int a, int b)\n{{\n' + '\n'.join(body) + '\n}\n'
+
+  def main(self):
+    body = ''.join(f'  printf({self.string()}, {k});\n'
+                   for k in range(max(0, self.strings - self.next_string)))
+    return f'int main()\n{{\n{body}  return 0;\n}}\n'
+
+
+def count_nodes(node):
+  count = 0
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    count += 1
+    stack.extend(node)
+  return count
+
+
+def lex_all(src_code):
+  lexer = Lexer(lambda: None, lambda: None)
+  lexer.build()
+  lexer.input(src_code)
+  count = 0
+  while lexer.token() is not None:
+    count += 1
+  return count
+
+
+def run(args):
+  src_code = SynthProgram(args.functions, args.structs, args.strings, args.depth,
+                          args.expr_length, args.seed).generate()
+  lines = src_code.count('\n') + 1
+  c_parser = Parser()
+  tokens = lex_all(src_code)
+  ast = c_parser.parse(src_code)
+  nodes = count_nodes(ast)
+
+  # The generator recurses once per nesting level of the AST
+  sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * args.depth + 1000))
+  lex_time, _ = measure(lambda: lex_all(src_code), args.repeat)
+  parse_time, _ = measure(lambda: c_parser.parse(src_code), args.repeat)
+  gen_time, _ = measure(lambda: LLVMGenerator().generate(ast), args.repeat)
+
+  return {
+    'size': {'lines': lines, 'bytes': len(src_code), 'tokens': tokens,
+             'nodes': nodes},
+    'lexer': {'lines_per_sec': lines / lex_time,
+              'tokens_per_sec': tokens / lex_time},
+    'parser': {'lines_per_sec': lines / parse_time,
+               'tokens_per_sec': tokens / parse_time,
+               'nodes_per_sec': nodes / parse_time},
+    'generator': {'nodes_per_sec': nodes / gen_time},
+  }
+
+
+def compare(results, baseline, threshold):
+  ''' Returns:
+          List of (stage, metric, baseline, current) whose throughput
+          fell by more than threshold
+  '''
+  regressions = []
+  for stage in ('lexer', 'parser', 'generator'):
+    for metric, value in results[stage].items():
+      base = baseline.get(stage, {}).get(metric)
+      if base and value < base * (1 - threshold):
+        regressions.append((stage, metric, base, value))
+  return regressions
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+
+  if args.dump:
+    with open(args.dump, mode='w', encoding='utf-8') as f:
+      f.write(SynthProgram(args.functions, args.structs, args.strings,
+                           args.depth, args.expr_length, args.seed).generate())
+    raise SystemExit(0)
+
+  results = run(args)
+  size = results['size']
+  print(f'{size["lines"]} lines, {size["bytes"]} bytes, {size["tokens"]} tokens, '
+        f'{size["nodes"]} AST nodes (best of {args.repeat})')
+  for stage in ('lexer', 'parser', 'generator'):
+    for metric, value in results[stage].items():
+      print(f'{stage:<10}{metric:<16}{value:>12,.0f}')
+
+  # Baselines only compare for the same program
+  key = (f'functions={args.functions},structs={args.structs},'
+         f'strings={args.strings},depth={args.depth},'
+         f'expr_length={args.expr_length},seed={args.seed}')
+  baselines = {}
+  if os.path.exists(args.baseline):
+    with open(args.baseline, mode='r', encoding='utf-8') as f:
+      baselines = json.load(f)
+
+  if args.save_baseline:
+    baselines[key] = results
+    with open(args.baseline, mode='w', encoding='utf-8') as f:
+      json.dump(baselines, f, indent=2, sort_keys=True)
+      f.write('\n')
+    print(f'\nBaseline stored in {args.baseline}')
+  elif key in baselines:
+    regressions = compare(results, baselines[key], args.threshold)
+    for stage, metric, base, value in regressions:
+      print(f'REGRESSION {stage} {metric}: {value:,.0f} < {base:,.0f} '
+            f'(-{(1 - value / base) * 100:.0f}%)')
+    if regressions:
+      raise SystemExit(1)
+    print(f'\nNo regression beyond {args.threshold * 100:.0f}% of the baseline')
+  else:
+    print('\nNo baseline for these parameters, run with --save_baseline')
@@ -0,0 +1,81 @@
+import io
+import os
+import re
+import time
+import argparse
+import tempfile
+from . import measure
+from .synth import SynthProgram
+from .lalr import c_rules, synth_grammar
+from ..ply import yacc
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('LR table construction methods benchmark')
+parser.add_argument('--methods', nargs='+', default=list(yacc.LR_METHODS),
+                    choices=yacc.LR_METHODS, help='Table construction methods')
+parser.add_argument('--copies', type=int, default=1,
+                    help='Number of copies of the C grammar to build tables for')
+parser.add_argument('--functions', type=int, default=50,
+                    help='Number of generated functions of the parsed program')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of measurements')
+
+
+def build(method, copies, rules, repeat):
+  ''' Best LRTable construction time with method, on a fresh grammar
+      every time
+      Returns:
+        (seconds, LRTable)
+  '''
+  best = None
+  for _ in range(repeat):
+    grammar = synth_grammar(copies, rules)
+    start = time.perf_counter()
+    lr = yacc.LRTable(grammar, method=method)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, lr
+
+
+def table_size(lr):
+  ''' Bytes of the pickled tables, as cached by yacc '''
+  with tempfile.TemporaryDirectory() as tmpdir:
+    filename = os.path.join(tmpdir, 'parsetab.pickle')
+    lr.pickle_table(filename)
+    return os.path.getsize(filename)
+
+
+def parse_program(method, src_code, repeat):
+  ''' Parse src_code with the tables of method
+      Returns:
+        (best seconds, text of the AST)
+  '''
+  c_parser = Parser(tabdir=None, method=method)
+  seconds, _ = measure(lambda: c_parser.parse(src_code), repeat)
+  buf = io.StringIO()
+  c_parser.parse(src_code).show(buf=buf, attrnames=True, showcoord=True)
+  # Without the addresses of the objects shown
+  return seconds, re.sub(r'0x[0-9a-f]+', '', buf.getvalue())
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  rules = c_rules()
+  src_code = SynthProgram(functions=args.functions, seed=args.seed).generate()
+
+  print(f'C grammar x {args.copies}, tables built and program parsed by every method '
+        f'(best of {args.repeat})')
+  print(f'{"method":<8}{"build (ms)":>12}{"states":>8}{"actions":>9}{"gotos":>8}'
+        f'{"pickle (KB)":>13}{"s/r":>5}{"r/r":>5}{"parse (ms)":>12}  AST')
+  reference = None
+  for method in args.methods:
+    seconds, lr = build(method, args.copies, rules, args.repeat)
+    actions = sum(len(row) for row in lr.lr_action.values())
+    gotos = sum(len(row) for row in lr.lr_goto.values())
+    parse_seconds, ast = parse_program(method, src_code, args.repeat)
+    if reference is None:
+      reference = ast
+    print(f'{method:<8}{seconds * 1e3:>12.1f}{len(lr.lr_action):>8,}{actions:>9,}{gotos:>8,}'
+          f'{table_size(lr) / 1024:>13.1f}{len(lr.sr_conflicts):>5}{len(lr.rr_conflicts):>5}'
+          f'{parse_seconds * 1e3:>12.1f}  {"same" if ast == reference else "DIFFERENT"}')
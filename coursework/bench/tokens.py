@@ -0,0 +1,47 @@
+import argparse
+from . import measure
+from .synth import SynthProgram
+from ..components.lexer import Lexer
+from ..components.parser import Parser
+
+parser = argparse.ArgumentParser('Tokenizer throughput benchmark')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of functions of the synthetic program')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of measurements')
+
+
+def per_token(lexer, src_code):
+  lexer.input(src_code)
+  while lexer.token() is not None:
+    pass
+
+
+def report(title, tokens, results):
+  print(f'{title:<22}{"best (s)":>10}{"tokens/s":>14}{"speedup":>9}')
+  baseline = results[0][1]
+  for name, best in results:
+    print(f'{name:<22}{best:>10.3f}{tokens / best:>14,.0f}{baseline / best:>8.2f}x')
+  print()
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  src_code = SynthProgram(functions=args.functions, seed=args.seed).generate()
+  lexer = Lexer(lambda: None, lambda: None)
+  lexer.build()
+  tokens = len(lexer.tokenize_all(src_code).types)
+  print(f'{src_code.count(chr(10)) + 1} lines, {tokens} tokens (best of {args.repeat})\n')
+
+  report('Lexing', tokens, [
+    ('Lexer.token', measure(lambda: per_token(lexer, src_code), args.repeat)[0]),
+    ('Lexer.tokenize_all', measure(lambda: lexer.tokenize_all(src_code), args.repeat)[0]),
+  ])
+
+  c_parser = Parser()
+  report('Parsing', tokens, [
+    ('Parser.parse', measure(lambda: c_parser.parse(src_code), args.repeat)[0]),
+    ('Parser.parse bulk', measure(lambda: c_parser.parse(src_code, bulk=True),
+                                  args.repeat)[0]),
+  ])
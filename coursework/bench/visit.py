@@ -0,0 +1,52 @@
+import io
+import argparse
+from . import measure
+from .synth import SynthProgram, count_nodes
+from ..components import ast
+from ..components.parser import Parser
+from ..components.gen_llvm import LLVMGenerator
+
+parser = argparse.ArgumentParser('AST visit dispatch benchmark')
+parser.add_argument('--functions', type=int, default=200,
+                    help='Number of generated functions')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of measurements')
+
+
+class CachedCounter(ast.NodeVisitor):
+  def __init__(self):
+    self.visits = 0
+
+  def generic_visit(self, node):
+    self.visits += 1
+    for child in node:
+      self.visit(child)
+
+
+class ReflectiveCounter(CachedCounter):
+  # The lookup every visit used to do
+  def visit(self, node):
+    return getattr(self, f'visit_{node.__class__.__name__}', self.generic_visit)(node)
+
+
+def walk(visitor, tree):
+  visitor.visit(tree)
+  return visitor.visits
+
+
+if __name__ == '__main__':
+  args = parser.parse_args()
+  tree = Parser().parse(SynthProgram(functions=args.functions, seed=args.seed).generate())
+  nodes = count_nodes(tree)
+  print(f'{nodes} AST nodes (best of {args.repeat})')
+
+  results = [
+    ('reflective visit', measure(lambda: walk(ReflectiveCounter(), tree), args.repeat)),
+    ('cached visit', measure(lambda: walk(CachedCounter(), tree), args.repeat)),
+    ('show', measure(lambda: tree.show(buf=io.StringIO()), args.repeat)),
+    ('LLVMGenerator', measure(lambda: LLVMGenerator().generate(tree), args.repeat)),
+  ]
+  print(f'{"":<20}{"visits/sec":>14}')
+  for name, (best, _) in results:
+    print(f'{name:<20}{nodes / best:>14,.0f}')
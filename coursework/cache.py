@@ -0,0 +1,138 @@
+import os
+import glob
+import hashlib
+import tempfile
+import llvmlite
+
+
+# Compiler sources whose content decides the generated code. Any edit
+# to them changes the fingerprint and thereby invalidates the cache.
+_FINGERPRINT_SOURCES = ['compiler.py', 'components/*.py', 'ply/*.py']
+
+_fingerprint = None
+
+
+def compiler_fingerprint():
+  ''' Hash identifying this version of the compiler, computed once per
+      process from its own sources and the llvmlite version
+  '''
+  global _fingerprint
+  if _fingerprint is None:
+    root = os.path.dirname(__file__)
+    h = hashlib.sha256(llvmlite.__version__.encode())
+    for pattern in _FINGERPRINT_SOURCES:
+      for path in sorted(glob.glob(os.path.join(root, pattern))):
+        with open(path, 'rb') as f:
+          h.update(f.read())
+    _fingerprint = h.hexdigest()
+  return _fingerprint
+
+
+class CompileCache(object):
+  ''' On-disk cache of compilation results, addressed by a hash of the
+      source text, the compiler fingerprint and the compile options.
+      Every entry is a file <root>/<key[:2]>/<key>.<kind>. Its mtime is
+      refreshed on every hit, and once the total size exceeds max_bytes
+      the least recently used entries are evicted.
+  '''
+
+  def __init__(self, root, max_bytes=64 * 1024 * 1024):
+    ''' Args:
+          root: Directory of the cache, created if missing
+          max_bytes: Size bound of all entries together
+    '''
+    self.root = root
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    os.makedirs(root, exist_ok=True)
+    self.size = sum(os.path.getsize(path) for path in self._entries())
+
+  def key(self, src_code, options):
+    ''' Args:
+          src_code: Source text
+          options: Dict of the options affecting the output
+        Returns:
+          Hex digest addressing the results of this compilation
+    '''
+    h = hashlib.sha256(compiler_fingerprint().encode())
+    h.update(repr(sorted(options.items())).encode())
+    h.update(src_code.encode('utf-8'))
+    return h.hexdigest()
+
+  def get(self, key, kind):
+    ''' Args:
+          key: Value returned by key()
+          kind: Kind of result, e.g. 'll' or 'o'
+        Returns:
+          The stored bytes, None when there are none
+    '''
+    path = self._path(key, kind)
+    try:
+      with open(path, 'rb') as f:
+        data = f.read()
+      os.utime(path)
+    except FileNotFoundError:
+      self.misses += 1
+      return None
+    self.hits += 1
+    return data
+
+  def put(self, key, kind, data):
+    ''' Store the bytes of a result, evicting old entries if needed '''
+    path = self._path(key, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so concurrent readers never see partial entries
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+      f.write(data)
+    # An entry written again, by this or another process, is replaced
+    try:
+      replaced = os.path.getsize(path)
+    except FileNotFoundError:
+      replaced = 0
+    os.replace(tmp, path)
+
+    self.size += len(data) - replaced
+    if self.size > self.max_bytes:
+      self.evict()
+
+  def evict(self):
+    ''' Remove least recently used entries until the cache fits
+        into max_bytes again
+    '''
+    entries = []
+    for path in self._entries():
+      try:
+        st = os.stat(path)
+      except FileNotFoundError:   # removed by another process
+        continue
+      entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()
+
+    # Other processes may share the directory, recount the real size
+    self.size = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+      if self.size <= self.max_bytes:
+        break
+      try:
+        os.remove(path)
+        self.evictions += 1
+      except FileNotFoundError:
+        pass
+      self.size -= size
+
+  def stats(self):
+    ''' Returns:
+          Dict of the hit, miss and eviction counters and the size
+    '''
+    return {'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'bytes': self.size}
+
+  def _path(self, key, kind):
+    return os.path.join(self.root, key[:2], f'{key}.{kind}')
+
+  def _entries(self):
+    return [path for path in glob.glob(os.path.join(self.root, '*', '*'))
+            if not path.endswith('.tmp')]
@@ -1,70 +1,217 @@
 import os
+import llvmlite.binding as llvm
 from .components.parser import Parser
 from .components.gen_llvm import LLVMGenerator
-import llvmlite.binding as llvm
-from ctypes import CFUNCTYPE, c_int
+from .components.folder import ConstantFolder
+from .components import gen_parallel
+from .components.engine import ExecutionEngine, initialize_llvm
+from .components import optimizer
+from .components import native
+from .components.profiler import NULL_PROFILER
 
 
 class Compiler():
-  def __init__(self):
+  def __init__(self, opt_level=0, cache=None, profiler=None, codegen_workers=1,
+               fold=True):
+    ''' Args:
+          opt_level: Optimization level (0-3) applied to the generated
+                     IR before it is written or executed
+          cache: CompileCache consulted by compile_file, None to
+                 always compile
+          profiler: Profiler collecting timings and counters of every
+                    phase, None to disable profiling
+          codegen_workers: Number of processes generating the function
+                           bodies, 1 generates them in this process
+          fold: Fold constant expressions of the AST before generating
+                its code
+    '''
+    if opt_level not in optimizer.OPT_LEVELS:
+      raise ValueError(f'Optimization level {opt_level} not supported')
+    self.opt_level = opt_level
     self.parser = Parser()
     self.generator = LLVMGenerator()
+    self.cache = cache
+    self.codegen_workers = codegen_workers
+    self.fold = fold
+    # Folder of the last translation unit, None if folding is off
+    self.folder = None
+    self.profiler = profiler or NULL_PROFILER
+    self.profiler.attach_parser(self.parser)
+    # JIT engine shared by all runs, created on first use
+    self.engine = None
 
-  def parse_file(self, filepath, verbose=0):
+  @property
+  def options(self):
+    ''' Options affecting the generated code, part of the cache key '''
+    # Parallel code generation names the string literals differently
+    return {'opt_level': self.opt_level,
+            'codegen_workers': self.codegen_workers,
+            'fold': self.fold}
+
+  def parse_file(self, filepath, verbose=0, stream=False):
     ''' Parse a C file
         Args:
           filepath: Path to the file containing source code.
+          stream: Read the file in chunks while parsing instead of
+                  reading it whole first, for very large sources
         Returns: When successful, an AST is returned.
                  ParseError can be thrown otherwise.
     '''
+    if stream:
+      with open(filepath, mode='rb') as f, self.profiler.phase('parse'):
+        return self.parser.parse_stream(f, filepath=filepath, verbose=verbose)
+
+    with self.profiler.phase('read'):
+      src_code = self.read_source(filepath)
+    with self.profiler.phase('parse'):
+      return self.parser.parse(src_code, filepath=filepath, verbose=verbose)
+
+  def read_source(self, filepath):
+    ''' Read a C file
+        Args:
+          filepath: Path to the file containing source code.
+        Returns: The source text
+    '''
     if os.path.exists(filepath):
       with open(filepath, mode='r', encoding='utf-8') as f:
-        src_code = f.read()
+        return f.read()
     else:
       raise FileNotFoundError(f'{filepath} does not exist.')
 
-    return self.parser.parse(src_code, filepath=filepath, verbose=verbose)
+  def compile_file(self, filepath, output, emit='ll'):
+    ''' Compile a C file, reusing the results of an earlier compilation
+        of the same source with the same options if the cache has them
+        Args:
+          filepath: Path to the file containing source code
+          output: Path of the file to write
+          emit: 'll' for LLVM IR, 'obj' for an object file, 'so' for
+                a shared library
+        Returns:
+          output
+    '''
+    src_code = self.read_source(filepath)
+    key = self.cache.key(src_code, self.options) if self.cache else None
+
+    def lookup(kind):
+      return self.cache.get(key, kind) if key else None
+
+    def store(kind, data):
+      if key:
+        self.cache.put(key, kind, data)
+      return data
+
+    def llvm_ir():
+      text = lookup('ll')
+      if text is None:
+        with self.profiler.phase('parse'):
+          ast = self.parser.parse(src_code, filepath=filepath)
+        text = store('ll', str(self.gen_llvm_ir(None, ast)).encode())
+      return text.decode()
+
+    if emit == 'll':
+      with open(output, mode='w', encoding='utf-8') as f:
+        print(llvm_ir(), file=f)
+      return output
+
+    obj = lookup('o')
+    if obj is None:
+      obj = store('o', native.compile_object(llvm_ir(), self.opt_level))
+    objpath = output if emit == 'obj' else os.path.splitext(output)[0] + '.o'
+    with open(objpath, 'wb') as f:
+      f.write(obj)
+    if emit == 'so':
+      native.link_shared(objpath, output)
+    return output
 
   def gen_llvm_ir(self, filepath, ast):
     ''' Generate LLVM IR from AST nodes based on llvmlite
         Args:
-          ast: AST structure
+          filepath: Path of the .ll file to write, None to skip writing.
+          ast: AST structure, constant folded in place if fold is set
         Returns:
-          ir
+          Verified llvm.ModuleRef, optimized at opt_level
     '''
-    gen_code = self.generator.generate(ast)
+    if self.fold:
+      self.folder = ConstantFolder()
+      self.profiler.attach_folder(self.folder)
+      with self.profiler.phase('fold'):
+        ast = self.folder.fold(ast)
+
+    if self.codegen_workers > 1:
+      with self.profiler.phase('codegen'):
+        gen_code = gen_parallel.generate(ast, self.codegen_workers)
+    else:
+      # Every translation unit gets a fresh module
+      self.generator = LLVMGenerator()
+      self.profiler.attach_generator(self.generator)
+      with self.profiler.phase('codegen'):
+        gen_code = self.generator.generate(ast)
+
+    # Every level hands the same kind of module to the backends, parsed
+    # from the text of the generated ir.Module. In a context of its own,
+    # like the ir.Module, or its struct types would be renamed after
+    # those of the modules parsed before
+    initialize_llvm()
+    with self.profiler.phase('verify'):
+      if not isinstance(gen_code, llvm.ModuleRef):
+        gen_code = llvm.parse_assembly(str(gen_code), context=llvm.create_context())
+      gen_code.verify()
+    if self.opt_level:
+      gen_code = self.optimize(gen_code)
 
-    with open(filepath, mode='w', encoding='utf-8') as f:
-      print(gen_code, file=f)
+    if filepath:
+      with open(filepath, mode='w', encoding='utf-8') as f:
+        print(gen_code, file=f)
 
     return gen_code
 
-  def run(self, filepath):
-    with open(filepath, 'r') as f:
-      llvm_ir = f.read()
-
-    llvm.initialize()
-    llvm.initialize_native_target()
-    llvm.initialize_native_asmprinter()
-
-    # Create a target machine representing the host
-    target = llvm.Target.from_default_triple()
-    target_machine = target.create_target_machine()
-    # And an execution engine with an empty backing module
-    backing_mod = llvm.parse_assembly('')
-    engine = llvm.create_mcjit_compiler(backing_mod, target_machine)
-
-    # Create a LLVM module object from the IR
-    mod = llvm.parse_assembly(llvm_ir)
-    mod.verify()
-    # Add the module and make sure it is ready for execution
-    engine.add_module(mod)
-    engine.finalize_object()
-    engine.run_static_constructors()
-
-    # Look up the function pointer (a Python int)
-    func_ptr = engine.get_function_address('main')
-
-    # Run the function via ctypes
-    cfunc = CFUNCTYPE(c_int)(func_ptr)
-    cfunc()
+  def optimize(self, code):
+    ''' Run the pass pipeline of the compiler's optimization level
+        Args:
+          code: Verified llvm.ModuleRef, optimized in place
+        Returns:
+          code
+    '''
+    with self.profiler.phase('optimize'):
+      return optimizer.optimize(code, self.opt_level)
+
+  def emit_object(self, code, filepath):
+    ''' Compile a module to a native object file
+        Args:
+          code: Module returned by gen_llvm_ir
+          filepath: Path of the .o file to write
+        Returns:
+          filepath
+    '''
+    return native.emit_object(code, filepath, self.opt_level)
+
+  def emit_shared(self, code, filepath):
+    ''' Compile a module to a shared library, which run() can execute
+        without JIT compiling the program again
+        Args:
+          code: Module returned by gen_llvm_ir
+          filepath: Path of the .so file to write
+        Returns:
+          filepath
+    '''
+    objpath = os.path.splitext(filepath)[0] + '.o'
+    self.emit_object(code, objpath)
+    return native.link_shared(objpath, filepath)
+
+  def run(self, code):
+    ''' Execute the main function of a program
+        Args:
+          code: Module returned by gen_llvm_ir, path to a .ll file or
+                path to a shared library built by emit_shared
+        Returns:
+          The value returned by main
+    '''
+    if not isinstance(code, llvm.ModuleRef):
+      if code.endswith('.so'):
+        return native.run_shared(code)
+      with open(code, 'r') as f:
+        code = f.read()
+
+    if self.engine is None:
+      self.engine = ExecutionEngine(self.opt_level, self.profiler)
+    return self.engine.run(code)
@@ -2,10 +2,30 @@ import sys
 
 
 class Node(object):
-  '''Abstract base class for AST nodes'''
+  '''Abstract base class for AST nodes. Nodes use __slots__ to keep
+     large trees small, every node has a coord (None if unknown)
+     and can be weakly referenced.
+  '''
+  __slots__ = ('coord', '__weakref__')
+
+  # The fields holding the children, in order. A field ending in []
+  # holds a list of nodes, the others a node or None
+  _child_fields = ()
+
+  def __init_subclass__(cls, **kwargs):
+    super().__init_subclass__(**kwargs)
+    if cls._child_fields:
+      cls.children, cls.__iter__ = _child_methods(cls)
+
   def children(self):
-    '''A sequence of all children that are Nodes'''
-    pass
+    '''Iterate over the (name, child) pairs of all children that are Nodes'''
+    return iter(())
+
+  def __iter__(self):
+    '''Iterate over the children that are Nodes, without building
+       the (name, child) pairs of children()
+    '''
+    return iter(())
 
   def show(self, buf=sys.stdout, offset=0, attrnames=False, nodenames=False, showcoord=False, _my_node_name=None):
     '''Print the Node and all of its attributes and children to a buffer'''
@@ -29,7 +49,9 @@ class Node(object):
 
     buf.write('\n')
 
-    for (child_name, child) in self.children():
+    # Only names need the (name, child) pairs of children()
+    children = self.children() if nodenames else ((None, child) for child in self)
+    for (child_name, child) in children:
       child.show(
         buf,
         offset=offset+2,
@@ -39,16 +61,72 @@ class Node(object):
         _my_node_name=child_name)
 
 
+def _child_methods(cls):
+  '''Generate the children() and __iter__ of a node class from its
+     _child_fields, unrolled like hand-written methods since visitors
+     iterate over every node
+  '''
+  children = ['def children(self):']
+  iterate = ['def __iter__(self):']
+  for field in cls._child_fields:
+    if field.endswith('[]'):
+      name = field[:-2]
+      children += [f'  for i, child in enumerate(self.{name} or []):',
+                   f"    yield f'{name}[{{i}}]', child"]
+      iterate += [f'  if self.{name}:',
+                  f'    yield from self.{name}']
+    else:
+      children += [f'  if self.{field} is not None:',
+                   f"    yield '{field}', self.{field}"]
+      iterate += [f'  if self.{field} is not None:',
+                  f'    yield self.{field}']
+  namespace = {}
+  exec('\n'.join(children + iterate), namespace)
+  methods = namespace['children'], namespace['__iter__']
+  for method, base in zip(methods, (Node.children, Node.__iter__)):
+    method.__qualname__ = f'{cls.__name__}.{method.__name__}'
+    method.__doc__ = base.__doc__
+  return methods
+
+
+class NodeVisitor(object):
+  '''Base class of tree walkers. visit() calls the method
+     visit_<ClassName> of the visited node, generic_visit if there is
+     none. The method of every node class is looked up once per
+     visitor class and then taken from a dict.
+  '''
+  _methods = {}
+  _fallback = 'generic_visit'
+
+  def __init_subclass__(cls, **kwargs):
+    super().__init_subclass__(**kwargs)
+    cls._methods = {}
+
+  @classmethod
+  def _method(cls, node_class):
+    method = getattr(cls, f'visit_{node_class.__name__}', None)
+    if method is None:
+      method = getattr(cls, cls._fallback)
+    cls._methods[node_class] = method
+    return method
+
+  def visit(self, node):
+    method = self._methods.get(node.__class__) or self._method(node.__class__)
+    return method(self, node)
+
+  def generic_visit(self, node):
+    for child in node:
+      self.visit(child)
+
+
 class FileAST(Node):
-  def __init__(self, ext):
-    self.ext = ext
+  __slots__ = ('ext',)
 
-  def children(self):
-    nodelist = []
-    for i, child in enumerate(self.ext or []):
-      nodelist.append(("ext[%d]" % i, child))
-    return tuple(nodelist)
+  def __init__(self, ext, coord=None):
+    self.ext = ext
+    self.coord = coord
 
+  _child_fields = ('ext[]',)
   attr_names = ()
 
 
@@ -56,116 +134,101 @@ class FileAST(Node):
 # Expression
 #
 class ExprList(Node):
-  def __init__(self, exprs):
-    self.exprs = exprs
+  __slots__ = ('exprs',)
 
-  def children(self):
-    nodelist = []
-    for i, child in enumerate(self.exprs or []):
-        nodelist.append(("exprs[%d]" % i, child))
-    return tuple(nodelist)
+  def __init__(self, exprs, coord=None):
+    self.exprs = exprs
+    self.coord = coord
 
+  _child_fields = ('exprs[]',)
   attr_names = ()
 
 
 class Assignment(Node):
-  def __init__(self, op, lvalue, rvalue):
+  __slots__ = ('op', 'lvalue', 'rvalue')
+
+  def __init__(self, op, lvalue, rvalue, coord=None):
     self.op = op
     self.lvalue = lvalue
     self.rvalue = rvalue
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.lvalue is not None: nodelist.append(("lvalue", self.lvalue))
-    if self.rvalue is not None: nodelist.append(("rvalue", self.rvalue))
-    return tuple(nodelist)
-
+  _child_fields = ('lvalue', 'rvalue')
   attr_names = ('op',)
 
 
 class BinaryOp(Node): # Tested
-  def __init__(self, op, left, right):
+  __slots__ = ('op', 'left', 'right')
+
+  def __init__(self, op, left, right, coord=None):
     self.op = op
     self.left = left
     self.right = right
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.left is not None: nodelist.append(("left", self.left))
-    if self.right is not None: nodelist.append(("right", self.right))
-    return tuple(nodelist)
-
+  _child_fields = ('left', 'right')
   attr_names = ('op',)
 
 
 class Cast(Node):
-  def __init__(self, to_type, expr):
+  __slots__ = ('to_type', 'expr')
+
+  def __init__(self, to_type, expr, coord=None):
     self.to_type = to_type
     self.expr = expr
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.to_type is not None: nodelist.append(("to_type", self.to_type))
-    if self.expr is not None: nodelist.append(("expr", self.expr))
-    return tuple(nodelist)
-
+  _child_fields = ('to_type', 'expr')
   attr_names = ()
 
 
 class UnaryOp(Node):  # Tested
-  def __init__(self, op, expr):
+  __slots__ = ('op', 'expr')
+
+  def __init__(self, op, expr, coord=None):
     self.op = op
     self.expr = expr
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.expr is not None: nodelist.append(("expr", self.expr))
-    return tuple(nodelist)
-
+  _child_fields = ('expr',)
   attr_names = ('op',)
 
 
 # ----------------- Postfix expression ------------------
 class ArrayRef(Node):
-  def __init__(self, name, subscript):
+  __slots__ = ('name', 'subscript')
+
+  def __init__(self, name, subscript, coord=None):
     self.name = name
     self.subscript = subscript
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.name is not None: nodelist.append(("name", self.name))
-    if self.subscript is not None: nodelist.append(("subscript", self.subscript))
-    return tuple(nodelist)
-
+  _child_fields = ('name', 'subscript')
   attr_names = ()
 
 
 class StructRef(Node):
-  def __init__(self, name, type, field):
+  __slots__ = ('name', 'type', 'field')
+
+  def __init__(self, name, type, field, coord=None):
     self.name = name
     self.type = type
     self.field = field
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.name is not None: nodelist.append(("name", self.name))
-    if self.field is not None: nodelist.append(("field", self.field))
-    return tuple(nodelist)
-
+  _child_fields = ('name', 'field')
   attr_names = ('type',)
 
 
 class FuncCall(Node):
-  def __init__(self, name, args):
+  __slots__ = ('name', 'args')
+
+  def __init__(self, name, args, coord=None):
     self.name = name
     self.args = args
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.name is not None: nodelist.append(("name", self.name))
-    if self.args is not None: nodelist.append(("args", self.args))
-    return tuple(nodelist)
-
+  _child_fields = ('name', 'args')
   attr_names = ()
 # --------------- End Postfix expression ----------------
 
@@ -174,130 +237,112 @@ class FuncCall(Node):
 # Declaration
 #
 class Decl(Node):
-  def __init__(self, name, quals, storage, spec, type, init):
+  __slots__ = ('name', 'quals', 'storage', 'spec', 'type', 'init')
+
+  def __init__(self, name, quals, storage, spec, type, init, coord=None):
     self.name = name
     self.quals = quals
     self.storage = storage
     self.spec = spec
     self.type = type
     self.init = init
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.type is not None: nodelist.append(("type", self.type))
-    if self.init is not None: nodelist.append(("init", self.init))
-    return tuple(nodelist)
-
+  _child_fields = ('type', 'init')
   attr_names = ('name', 'quals', 'storage', 'spec',)
 
 
 class ArrayDecl(Node):
-  def __init__(self, type, dim):
+  __slots__ = ('type', 'dim')
+
+  def __init__(self, type, dim, coord=None):
     self.type = type
     self.dim = dim
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.type is not None: nodelist.append(("type", self.type))
-    if self.dim is not None: nodelist.append(("dim", self.dim))
-    return tuple(nodelist)
-
+  _child_fields = ('type', 'dim')
   attr_names = ()
 
 
 class PtrDecl(Node):
-  def __init__(self, quals, type):
+  __slots__ = ('quals', 'type')
+
+  def __init__(self, quals, type, coord=None):
     self.quals = quals
     self.type = type
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.type is not None: nodelist.append(("type", self.type))
-    return tuple(nodelist)
-
+  _child_fields = ('type',)
   attr_names = ('quals',)
 
 
 class FuncDecl(Node):
-  def __init__(self, args, type):
+  __slots__ = ('args', 'type')
+
+  def __init__(self, args, type, coord=None):
     self.args = args
     self.type = type
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.args is not None: nodelist.append(("args", self.args))
-    if self.type is not None: nodelist.append(("type", self.type))
-    return tuple(nodelist)
-
+  _child_fields = ('args', 'type')
   attr_names = ()
 
 
 class IdentifierType(Node): # Tested
-  def __init__(self, name, spec):
+  __slots__ = ('name', 'spec')
+
+  def __init__(self, name, spec, coord=None):
     self.name = name
     self.spec = spec
-
-  def children(self):
-    nodelist = []
-    return tuple(nodelist)
+    self.coord = coord
 
   attr_names = ('name', 'spec')
 
 
 class Struct(Node):
-  def __init__(self, name, decls):
+  __slots__ = ('name', 'decls')
+
+  def __init__(self, name, decls, coord=None):
     self.name = name
     self.decls = decls
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    for i, child in enumerate(self.decls or []):
-      nodelist.append(("decls[%d]" % i, child))
-    return tuple(nodelist)
-
+  _child_fields = ('decls[]',)
   attr_names = ('name',)
 
 
 class FuncDef(Node):
-  def __init__(self, decl, param_decls, body):
+  __slots__ = ('decl', 'param_decls', 'body')
+
+  def __init__(self, decl, param_decls, body, coord=None):
     self.decl = decl
     self.param_decls = param_decls
     self.body = body
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.decl is not None: nodelist.append(("decl", self.decl))
-    if self.body is not None: nodelist.append(("body", self.body))
-    for i, child in enumerate(self.param_decls or []):
-        nodelist.append(("param_decls[%d]" % i, child))
-    return tuple(nodelist)
-
+  _child_fields = ('decl', 'body', 'param_decls[]')
   attr_names = ()
 
 
 class ParamList(Node):
-  def __init__(self, params):
-    self.params = params
+  __slots__ = ('params',)
 
-  def children(self):
-    nodelist = []
-    for i, child in enumerate(self.params or []):
-      nodelist.append(("params[%d]" % i, child))
-    return tuple(nodelist)
+  def __init__(self, params, coord=None):
+    self.params = params
+    self.coord = coord
 
+  _child_fields = ('params[]',)
   attr_names = ()
 
 
 class InitList(Node):
-  def __init__(self, exprs):
-    self.exprs = exprs
+  __slots__ = ('exprs',)
 
-  def children(self):
-    nodelist = []
-    for i, child in enumerate(self.exprs or []):
-      nodelist.append(("exprs[%d]" % i, child))
-    return tuple(nodelist)
+  def __init__(self, exprs, coord=None):
+    self.exprs = exprs
+    self.coord = coord
 
+  _child_fields = ('exprs[]',)
   attr_names = ()
 
 
@@ -305,155 +350,133 @@ class InitList(Node):
 # Statement
 #
 class Compound(Node):
-  def __init__(self, block_items):
-    self.block_items = block_items
+  __slots__ = ('block_items',)
 
-  def children(self):
-    nodelist = []
-    for i, child in enumerate(self.block_items or []):
-      nodelist.append(("block_items[%d]" % i, child))
-    return tuple(nodelist)
+  def __init__(self, block_items, coord=None):
+    self.block_items = block_items
+    self.coord = coord
 
+  _child_fields = ('block_items[]',)
   attr_names = ()
 
 
 class EmptyStatement(Node):
-  def __init__(self):
-    pass
+  __slots__ = ()
 
-  def children(self):
-    return ()
+  def __init__(self, coord=None):
+    self.coord = coord
 
   attr_names = ()
 
 
 # ----------------- Selection statement -----------------
 class If(Node):
-  def __init__(self, cond, iftrue, iffalse):
+  __slots__ = ('cond', 'iftrue', 'iffalse')
+
+  def __init__(self, cond, iftrue, iffalse, coord=None):
     self.cond = cond
     self.iftrue = iftrue
     self.iffalse = iffalse
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.cond is not None: nodelist.append(("cond", self.cond))
-    if self.iftrue is not None: nodelist.append(("iftrue", self.iftrue))
-    if self.iffalse is not None: nodelist.append(("iffalse", self.iffalse))
-    return tuple(nodelist)
-
+  _child_fields = ('cond', 'iftrue', 'iffalse')
   attr_names = ()
 
 
 class Switch(Node):
-  def __init__(self, cond, stmt):
+  __slots__ = ('cond', 'stmt')
+
+  def __init__(self, cond, stmt, coord=None):
     self.cond = cond
     self.stmt = stmt
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.cond is not None: nodelist.append(("cond", self.cond))
-    if self.stmt is not None: nodelist.append(("stmt", self.stmt))
-    return tuple(nodelist)
-
+  _child_fields = ('cond', 'stmt')
   attr_names = ()
 # --------------- End Selection statement ---------------
 
 
 # ------------------ Labeled statement ------------------
 class Case(Node):
-  def __init__(self, expr, stmts):
+  __slots__ = ('expr', 'stmts')
+
+  def __init__(self, expr, stmts, coord=None):
     self.expr = expr
     self.stmts = stmts
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.expr is not None: nodelist.append(("expr", self.expr))
-    for i, child in enumerate(self.stmts or []):
-        nodelist.append(("stmts[%d]" % i, child))
-    return tuple(nodelist)
-
+  _child_fields = ('expr', 'stmts[]')
   attr_names = ()
 
 
 class Default(Node):
-  def __init__(self, stmts):
-    self.stmts = stmts
+  __slots__ = ('stmts',)
 
-  def children(self):
-    nodelist = []
-    for i, child in enumerate(self.stmts or []):
-        nodelist.append(("stmts[%d]" % i, child))
-    return tuple(nodelist)
+  def __init__(self, stmts, coord=None):
+    self.stmts = stmts
+    self.coord = coord
 
+  _child_fields = ('stmts[]',)
   attr_names = ()
 # ---------------- End Labeled statement ----------------
 
 
 # ----------------- Iteration statement -----------------
 class While(Node):
-  def __init__(self, cond, stmt):
+  __slots__ = ('cond', 'stmt')
+
+  def __init__(self, cond, stmt, coord=None):
     self.cond = cond
     self.stmt = stmt
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.cond is not None: nodelist.append(("cond", self.cond))
-    if self.stmt is not None: nodelist.append(("stmt", self.stmt))
-    return tuple(nodelist)
-
+  _child_fields = ('cond', 'stmt')
   attr_names = ()
 
 
 # In future, WIP
 class For(Node):
-  def __init__(self, init, cond, next, stmt):
+  __slots__ = ('init', 'cond', 'next', 'stmt')
+
+  def __init__(self, init, cond, next, stmt, coord=None):
     self.init = init
     self.cond = cond
     self.next = next
     self.stmt = stmt
+    self.coord = coord
 
-  def children(self):
-    nodelist = []
-    if self.init is not None: nodelist.append(("init", self.init))
-    if self.cond is not None: nodelist.append(("cond", self.cond))
-    if self.next is not None: nodelist.append(("next", self.next))
-    if self.stmt is not None: nodelist.append(("stmt", self.stmt))
-    return tuple(nodelist)
-
+  _child_fields = ('init', 'cond', 'next', 'stmt')
   attr_names = ()
 # --------------- End Iteration statement ---------------
 
 
 # -------------------- Jump statement -------------------
 class Break(Node):
-  def __init__(self):
-    pass
+  __slots__ = ()
 
-  def children(self):
-    return ()
+  def __init__(self, coord=None):
+    self.coord = coord
 
   attr_names = ()
 
 
 class Continue(Node):
-  def __init__(self):
-    pass
+  __slots__ = ()
 
-  def children(self):
-    return ()
+  def __init__(self, coord=None):
+    self.coord = coord
 
   attr_names = ()
 
 
 class Return(Node):
-  def __init__(self, expr):
-    self.expr = expr
+  __slots__ = ('expr',)
 
-  def children(self):
-    nodelist = []
-    if self.expr is not None: nodelist.append(("expr", self.expr))
-    return tuple(nodelist)
+  def __init__(self, expr, coord=None):
+    self.expr = expr
+    self.coord = coord
 
+  _child_fields = ('expr',)
   attr_names = ()
 # ------------------- End Jump statement -----------------
 
@@ -462,24 +485,22 @@ class Return(Node):
 # Operation
 #
 class Constant(Node): # Tested
-  def __init__(self, type, value):
+  __slots__ = ('type', 'value')
+
+  def __init__(self, type, value, coord=None):
     self.type = type
     self.value = value
-
-  def children(self):
-    nodelist = []
-    return tuple(nodelist)
+    self.coord = coord
 
   attr_names = ('type', 'value',)
 
 
 class ID(Node): # Tested
-  def __init__(self, name):
-    self.name = name
+  __slots__ = ('name',)
 
-  def children(self):
-    nodelist = []
-    return tuple(nodelist)
+  def __init__(self, name, coord=None):
+    self.name = name
+    self.coord = coord
 
   attr_names = ('name',)
 
@@ -491,9 +512,5 @@ class ID(Node): # Tested
 #     self.quals = quals
 #     self.type = type
 
-#   def children(self):
-#     nodelist = []
-#     if self.type is not None: nodelist.append(("type", self.type))
-#     return tuple(nodelist)
-
+#   _child_fields = ('type',)
 #   attr_names = ('name', 'quals',)
\ No newline at end of file
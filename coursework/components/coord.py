@@ -1,18 +1,78 @@
+import re
+from array import array
+from bisect import bisect_right
+
+
+class LineIndex(object):
+  ''' Offsets at which the lines of a source text start. Built on the
+      first lookup only, so inputs whose coordinates are never printed
+      pay nothing besides keeping a reference to the text.
+  '''
+  __slots__ = ('text', '_starts')
+
+  def __init__(self, text):
+    self.text = text
+    self._starts = None
+
+  def starts(self):
+    ''' Returns:
+          array of the offsets of the first character of every line
+    '''
+    if self._starts is None:
+      self._starts = array('q', [0])
+      self._starts.extend(m.end() for m in re.finditer('\n', self.text))
+    return self._starts
+
+  def locate(self, lexpos):
+    ''' Args:
+          lexpos: Offset in the text
+        Returns:
+          (line, column), both counted from 1
+    '''
+    starts = self.starts()
+    line = bisect_right(starts, lexpos)
+    return line, lexpos - starts[line - 1] + 1
+
+
 class Coord(object):
   ''' Coordinates of a syntactic element. It contains:
       - File name
       - Line number
       - column number (optional)
+      A Coord made from a lexpos and a LineIndex resolves its line and
+      column by binary search whenever they are read. Nothing is cached,
+      so an index whose text moves (see components.incremental) keeps
+      its coords right.
   '''
-  __slots__ = ('file', 'line', 'column', '__weakref__')
+  __slots__ = ('file', '_line', '_column', 'lexpos', 'index', '__weakref__')
 
-  def __init__(self, file, line, column=None):
+  def __init__(self, file, line=None, column=None, lexpos=None, index=None):
     self.file = file
-    self.line = line
-    self.column = column
+    self._line = line
+    self._column = column
+    self.lexpos = lexpos
+    self.index = index
+
+  @property
+  def line(self):
+    if self.index is not None:
+      return self.index.locate(self.lexpos)[0]
+    return self._line
+
+  @property
+  def column(self):
+    if self.index is not None:
+      return self.index.locate(self.lexpos)[1]
+    return self._column
+
+  def __reduce__(self):
+    # Pickled resolved, the index would take the whole source along
+    return Coord, (self.file, self.line, self.column)
 
   def __str__(self):
-    info = f'{self.file}:{self.line}'
-    if self.column:
-      info += f':{self.column}'
-    return info
\ No newline at end of file
+    line, column = (self.index.locate(self.lexpos) if self.index is not None
+                    else (self._line, self._column))
+    info = f'{self.file}:{line}'
+    if column:
+      info += f':{column}'
+    return info
@@ -0,0 +1,93 @@
+from ctypes import CFUNCTYPE, c_int
+from llvmlite import ir
+import llvmlite.binding as llvm
+from .profiler import NULL_PROFILER
+
+
+_llvm_initialized = False
+
+
+def initialize_llvm():
+  ''' Initialize LLVM and the native target. Safe to call many times,
+      the work is only done once per process
+  '''
+  global _llvm_initialized
+  if not _llvm_initialized:
+    llvm.initialize()
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+    _llvm_initialized = True
+
+
+class ExecutionEngine(object):
+  ''' A long-lived MCJIT execution engine.
+      LLVM, the host target machine and the engine are created once.
+      Every run adds a module, calls its entry function and removes
+      the module again, so the same engine can execute any number of
+      programs.
+  '''
+
+  def __init__(self, opt_level=0, profiler=NULL_PROFILER):
+    ''' Args:
+          opt_level: Code generation optimization level (0-3)
+          profiler: Profiler timing the verify, finalize and execute
+                    phases of every run
+    '''
+    initialize_llvm()
+    self.profiler = profiler
+
+    # Create a target machine representing the host
+    target = llvm.Target.from_default_triple()
+    self.target_machine = target.create_target_machine(opt=opt_level)
+    # And an execution engine with an empty backing module
+    backing_mod = llvm.parse_assembly('')
+    self.engine = llvm.create_mcjit_compiler(backing_mod, self.target_machine)
+
+  def load(self, code):
+    ''' Create a verified LLVM module object
+        Args:
+          code: ir.Module, LLVM assembly text or an llvm.ModuleRef
+        Returns:
+          llvm.ModuleRef
+    '''
+    if isinstance(code, llvm.ModuleRef):
+      mod = code
+    elif isinstance(code, ir.Module):
+      mod = llvm.parse_assembly(str(code))
+    else:
+      mod = llvm.parse_assembly(code)
+    mod.verify()
+    return mod
+
+  def run(self, code, entry='main'):
+    ''' JIT compile a module and call its entry function
+        Args:
+          code: Anything accepted by load()
+          entry: Name of a function without arguments returning int
+        Returns:
+          The value returned by the entry function
+    '''
+    with self.profiler.phase('verify'):
+      mod = self.load(code)
+
+    # Add the module and make sure it is ready for execution
+    self.engine.add_module(mod)
+    try:
+      with self.profiler.phase('finalize'):
+        self.engine.finalize_object()
+        self.engine.run_static_constructors()
+
+      # Look up the function pointer (a Python int)
+      func_ptr = self.engine.get_function_address(entry)
+      if not func_ptr:
+        raise RuntimeError(f'Function {entry} not defined')
+
+      # Run the function via ctypes
+      cfunc = CFUNCTYPE(c_int)(func_ptr)
+      with self.profiler.phase('execute'):
+        result = cfunc()
+
+      self.engine.run_static_destructors()
+      return result
+    finally:
+      self.engine.remove_module(mod)
@@ -0,0 +1,307 @@
+from . import ast
+
+# Operators on the values of two constants, with the int semantics of
+# the target: 32 bit two's complement, division truncating towards 0
+_COMPARISONS = {
+  '<': lambda l, r: l < r,
+  '<=': lambda l, r: l <= r,
+  '>': lambda l, r: l > r,
+  '>=': lambda l, r: l >= r,
+  '==': lambda l, r: l == r,
+  '!=': lambda l, r: l != r,
+}
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0',
+            '\\': '\\', "'": "'", '"': '"'}
+
+# Operators changing their operand, which can then not be propagated
+_MODIFYING_OPS = ('&', '++', '--', 'p++', 'p--')
+
+
+class ConstantFolder(ast.NodeVisitor):
+  ''' Folds the integer and char expressions of constants into a
+      Constant, before the code generation. Local variables that are
+      initialized with a constant and never changed are replaced by it
+      in the expressions of their function, and If / While statements
+      with a constant condition lose the branch that can not run, as
+      do the statements of a block after a jump.
+      The tree is changed in place.
+  '''
+
+  def __init__(self):
+    self.folded = 0
+    self.propagated = 0
+    self.pruned = 0
+    # Names of the global variables, never propagated
+    self.globals = set()
+    # Constant of every propagated variable of the current function
+    self.constants = {}
+    # Decl of every local variable, None if declared more than once,
+    # the variables changed and the variables used by the last visit
+    # of the current function
+    self.decls = {}
+    self.changed = set()
+    self.used = set()
+
+  def fold(self, head):
+    ''' Args:
+          head: FileAST
+        Returns:
+          head, folded in place
+    '''
+    return self.visit(head)
+
+  def stats(self):
+    ''' Return a dict of the folded expressions, the variable uses
+        replaced by constants and the removed If / While statements
+        and statements after a jump
+    '''
+    return {'folded': self.folded, 'propagated': self.propagated,
+            'pruned': self.pruned}
+
+  def generic_visit(self, node):
+    ''' Visit the children, replacing each one by the node its visit
+        returns. A statement returning None is removed.
+    '''
+    for name in node.__slots__:
+      child = getattr(node, name)
+      if isinstance(child, ast.Node):
+        new = self.visit(child)
+        setattr(node, name, ast.Compound(None, child.coord) if new is None else new)
+      elif isinstance(child, list):
+        new = [self.visit(item) if isinstance(item, ast.Node) else item
+               for item in child]
+        child[:] = [item for item in new if item is not None]
+    return node
+
+  def visit_FileAST(self, node):
+    self.globals = {ext.name for ext in node.ext if isinstance(ext, ast.Decl)}
+    return self.generic_visit(node)
+
+  def visit_FuncDef(self, node):
+    # The first round folds, the next ones replace the variables found
+    # constant, which may fold the initializers of more variables, like
+    # b in: int a = 2; int b = a * 3;
+    while True:
+      self.decls, self.changed, self.used = {}, set(), set()
+      self.generic_visit(node)
+      constants = self.find_constants()
+      if not constants:
+        break
+      self.constants.update(constants)
+    self.constants = {}
+    return node
+
+  def visit_Decl(self, node):
+    self.generic_visit(node)
+    self.decls[node.name] = None if node.name in self.decls else node
+    return node
+
+  def visit_Assignment(self, node):
+    self.generic_visit(node)
+    self.changed.add(variable_name(node.lvalue))
+    return node
+
+  def visit_StructRef(self, node):
+    # The field is no variable
+    node.name = self.visit(node.name)
+    return node
+
+  def visit_FuncCall(self, node):
+    if node.args is not None:
+      node.args = self.visit(node.args)
+    return node
+
+  def visit_IdentifierType(self, node):
+    if node.spec is not None:
+      return node
+    constant = self.constants.get(node.name)
+    if constant is None:
+      self.used.add(node.name)
+      return node
+    self.propagated += 1
+    return ast.Constant(constant.type, constant.value, node.coord)
+
+  def visit_UnaryOp(self, node):
+    self.generic_visit(node)
+    if node.op in _MODIFYING_OPS:
+      self.changed.add(variable_name(node.expr))
+    value = constant_value(node.expr)
+    if value is None:
+      return node
+
+    match node.op:
+      case '-':
+        return self.constant(node, node.expr.type, -value)
+      case '!':
+        return self.constant(node, 'int', int(not value))
+      case _:
+        return node
+
+  def visit_BinaryOp(self, node):
+    self.generic_visit(node)
+    left = constant_value(node.left)
+    right = constant_value(node.right)
+
+    # The right operand of && and || is not evaluated then
+    if node.op == '&&' and left == 0 or node.op == '||' and left not in (0, None):
+      return self.constant(node, 'int', int(node.op == '||'))
+    if left is None or right is None:
+      return node
+
+    # char op char stays a char, like the i8 arithmetic of the
+    # generated code
+    type = 'char' if node.left.type == node.right.type == 'char' else 'int'
+    match node.op:
+      case '+':
+        value = left + right
+      case '-':
+        value = left - right
+      case '*':
+        value = left * right
+      case '/' | '%':
+        if right == 0:
+          return node   # Undefined, left for the program to crash
+        quotient = abs(left) // abs(right)
+        if (left < 0) != (right < 0):
+          quotient = -quotient
+        if wrap(quotient, type) != quotient:
+          return node   # INT_MIN / -1 overflows
+        value = quotient if node.op == '/' else left - right * quotient
+      case '&&':
+        return self.constant(node, 'int', int(bool(left and right)))
+      case '||':
+        return self.constant(node, 'int', int(bool(left or right)))
+      case op if op in _COMPARISONS:
+        return self.constant(node, 'int', int(_COMPARISONS[op](left, right)))
+      case _:
+        return node
+    return self.constant(node, type, value)
+
+  def visit_Compound(self, node):
+    # A branch kept by visit_If is spliced into the block, the statements
+    # after it are dead when it ends in a jump, and the code generator
+    # can not emit them after the terminator of the LLVM block
+    self.generic_visit(node)
+    items = node.block_items or []
+    for i, item in enumerate(items):
+      if always_jumps(item):
+        self.pruned += len(items) - i - 1
+        del items[i + 1:]
+        break
+    return node
+
+  def visit_If(self, node):
+    self.generic_visit(node)
+    value = constant_value(node.cond)
+    if value is None:
+      return node
+    self.pruned += 1
+    # None removes the statement
+    return node.iftrue if value else node.iffalse
+
+  def visit_While(self, node):
+    self.generic_visit(node)
+    if constant_value(node.cond) == 0:
+      self.pruned += 1
+      return None
+    return node
+
+  def constant(self, node, type, value):
+    ''' Return the Constant replacing node '''
+    self.folded += 1
+    value = wrap(value, type)
+    if type == 'char':
+      return ast.Constant('char', char_literal(value), node.coord)
+    return ast.Constant('int', str(value), node.coord)
+
+  def find_constants(self):
+    ''' Return the local variables of the visited function that can be
+        replaced by their constant initializer: declared once, not
+        global, of type int or char, used and never assigned,
+        incremented or addressed
+    '''
+    constants = {}
+    for name in self.used - self.changed - self.globals:
+      decl = self.decls.get(name)
+      if decl is not None and isinstance(decl.type, ast.IdentifierType) and \
+              isinstance(decl.init, ast.Constant) and \
+              decl.type.spec == [decl.init.type] and \
+              constant_value(decl.init) is not None:
+        constants[name] = decl.init
+    return constants
+
+
+def always_jumps(node):
+  ''' Whether a statement always ends in a return, break or continue '''
+  if isinstance(node, (ast.Return, ast.Break, ast.Continue)):
+    return True
+  if isinstance(node, ast.Compound):
+    return any(always_jumps(item) for item in node.block_items or [])
+  return False
+
+
+def variable_name(node):
+  ''' Name of the variable an lvalue changes, None if unknown '''
+  while isinstance(node, (ast.ArrayRef, ast.StructRef)):
+    node = node.name
+  return node.name if isinstance(node, ast.IdentifierType) else None
+
+
+def constant_value(node):
+  ''' Integer value of an int or char Constant, None for other nodes
+      and for the constants that are not folded, like 1u or 1L
+  '''
+  if not isinstance(node, ast.Constant):
+    return None
+  if node.type == 'int':
+    text = node.value.lower()
+    # Folded constants may be negative
+    sign, digits = (-1, text[1:]) if text.startswith('-') else (1, text)
+    if not digits.isalnum() or digits[-1] in 'ul':
+      return None
+    try:
+      return wrap(sign * int(digits, 16 if digits.startswith('0x') else
+                             8 if digits.startswith('0') else 10), 'int')
+    except ValueError:
+      return None
+  if node.type == 'char':
+    code = char_code(node.value)
+    return None if code is None else wrap(code, 'char')
+  return None
+
+
+def char_code(literal):
+  ''' Code of a char literal, quotes included: a single character, an
+      escape of _ESCAPES or an octal escape. None for the others, like
+      hexadecimal escapes
+  '''
+  text = literal[1:-1]
+  if len(text) == 1:
+    return ord(text)
+  if len(text) == 2 and text[0] == '\\' and text[1] in _ESCAPES:
+    return ord(_ESCAPES[text[1]])
+  if text[:1] == '\\' and 2 <= len(text) <= 4 and \
+          all(c in '01234567' for c in text[1:]):
+    return int(text[1:], 8) & 0xff
+  return None
+
+
+def char_literal(value):
+  ''' Char literal of a value, read back by char_code: printable
+      characters as such, the others escaped
+  '''
+  value &= 0xff
+  for escape, char in _ESCAPES.items():
+    if ord(char) == value and char != '"':
+      return f"'\\{escape}'"
+  if 32 <= value < 127:
+    return f"'{chr(value)}'"
+  return f"'\\{value:03o}'"
+
+
+def wrap(value, type):
+  ''' Two's complement value of the int or char type '''
+  bits = 8 if type == 'char' else 32
+  value &= (1 << bits) - 1
+  return value - (1 << bits) if value >> (bits - 1) else value
@@ -1,13 +1,18 @@
 # https://llvmlite.readthedocs.io/en/latest/user-guide/
 
 from llvmlite import ir
-from . import ast
+from . import ast, libc
+from .folder import char_code
 
 
-class LLVMGenerator(object):
+class LLVMGenerator(ast.NodeVisitor):
+  _fallback = 'error_visit'
+
   def __init__(self):
-    # LLVM Module, that holds all IR code
-    self.llvm_module = ir.Module('C Compiler')
+    # LLVM Module, that holds all IR code. Each module gets its own
+    # context, so identified struct types of one translation unit do
+    # not clash with those of the next one compiled by the process
+    self.llvm_module = ir.Module('C Compiler', context=ir.Context())
 
     # LLVM instruction builder. Created whenever
     # a new function is entered
@@ -19,11 +24,18 @@ class LLVMGenerator(object):
     self.named_arg = {}
     self.named_mem = {}
     self.named_func = {}
+    self.builtin_func = {}
     self.global_var = {}
     self.type_define = {}
 
     self.current_func = None
 
+    # Read-only globals holding literals, keyed by their initializer,
+    # so every distinct literal is emitted once per module
+    self.constant_pool = {}
+    self.pool_hits = 0
+    self.pool_saved = 0
+
     self.loop_block_start_stack = []
     self.loop_block_end_stack = []
 
@@ -33,8 +45,8 @@ class LLVMGenerator(object):
 
   # Visit methods
   def visit(self, node, status=0):
-    method = f'visit_{node.__class__.__name__}'
-    return getattr(self, method, self.error_visit)(node, status)
+    method = self._methods.get(node.__class__) or self._method(node.__class__)
+    return method(self, node, status)
 
   def error_visit(self, node, status=0):
     raise RuntimeError(f'Node {node.__class__.__name__} not implemented')
@@ -67,10 +79,9 @@ class LLVMGenerator(object):
     # Handle initializer if exist
     if node.init:
       if status == 0:
-        init = self.visit(node.init, 1)
-        self.llvm_builder.store(
-            init,
-            self.named_mem[node.name])
+        mem = self.named_mem[node.name]
+        init = self.implicit_cast(self.visit(node.init, 1), mem.type.pointee)
+        self.llvm_builder.store(init, mem)
       elif status == 1:
         self.global_var[node.name].initializer = self.visit(
             node.init, node.name)
@@ -116,8 +127,8 @@ class LLVMGenerator(object):
       # Generate body content (Compound)
       self.visit(node.body)
     else:
+      # Prototype only, a function without blocks is a declaration
       self.current_func = None
-      func.is_declaration = True
 
   #
   # Expression
@@ -168,9 +179,7 @@ class LLVMGenerator(object):
     if node.op == '=':
       left = self.visit(node.lvalue, 0)   # Get ptr of left operand
       right = self.visit(node.rvalue, 1)  # Load value to ptr of right operand
-
-      if right == 'NULL':
-        right = ir.Constant(ir.IntType(32), 0).bitcast(left.type)
+      right = self.implicit_cast(right, left.type.pointee)
 
       self.llvm_builder.store(right, left)  # Store loaded value to ptr
     else:  # WIP +=, -=, *=, /=
@@ -326,10 +335,10 @@ class LLVMGenerator(object):
   def visit_FuncCall(self, node, status=0):
     func_name = node.name.name
 
-    if func_name not in self.named_func:
-      func, args = self.extern_function(node)
+    func = self.named_func.get(func_name)
+    if func is None:
+      func, args = self.builtin_call(node)
     else:
-      func = self.named_func[func_name]
       args = [] if node.args is None else self.visit(node.args, 1)
       for i, (param, arg) in enumerate(zip(args, func.args)):
         if isinstance(arg.type, ir.IntType) and isinstance(param.type, ir.IntType):
@@ -397,7 +406,9 @@ class LLVMGenerator(object):
 
     self.visit(node.stmt)
 
-    self.llvm_builder.branch(while_cmp)
+    # A body ending in break, continue or return has its terminator
+    if not self.llvm_builder.block.is_terminated:
+      self.llvm_builder.branch(while_cmp)
     self.loop_block_start_stack.pop()
     self.loop_block_end_stack.pop()
     self.llvm_builder.position_at_end(while_end)
@@ -441,12 +452,7 @@ class LLVMGenerator(object):
         string += '\0'
 
         type = ir.ArrayType(ir.IntType(8), len(string))
-        name = '.str' + str(len(self.global_var))
-
-        tmp = ir.GlobalVariable(self.llvm_module, type, name=name)
-        tmp.initializer = ir.Constant(type, bytearray(string, 'utf8'))
-        tmp.global_constant = True
-        self.global_var[name] = tmp
+        tmp = self.pooled_constant(ir.Constant(type, bytearray(string, 'utf8')))
 
         zero = ir.Constant(ir.IntType(32), 0)
         c = self.llvm_builder.gep(tmp, [zero, zero], inbounds=True)
@@ -600,119 +606,145 @@ class LLVMGenerator(object):
       case ast.ArrayDecl | ast.FuncDecl | ast.PtrDecl | ast.Decl:
         return self.generate_declaration(node.type, status, modifiers+[node])
 
+  def pooled_constant(self, constant, prefix='.str'):
+    '''
+      Return the read-only global initialized with constant, created
+      on the first request for an equal constant
+    '''
+    key = str(constant)
+    if key in self.constant_pool:
+      self.pool_hits += 1
+      self.pool_saved += self.sizeof(constant.type)
+      return self.constant_pool[key]
+
+    name = prefix + str(len(self.global_var))
+    tmp = ir.GlobalVariable(self.llvm_module, constant.type, name=name)
+    tmp.initializer = constant
+    tmp.global_constant = True
+    # Nothing may compare the addresses of literals, so LLVM can also
+    # merge them with other constants
+    tmp.linkage = 'private'
+    tmp.unnamed_addr = True
+    self.global_var[name] = tmp
+    self.constant_pool[key] = tmp
+    return tmp
+
+  def pool_stats(self):
+    '''
+      Return a dict of the constant pool hits, the distinct constants
+      and the bytes of data the hits did not emit again
+    '''
+    return {'hits': self.pool_hits, 'constants': len(self.constant_pool),
+            'bytes_saved': self.pool_saved}
+
+  def sizeof(self, type):
+    '''
+      Size in bytes of integers and arrays of them, without padding
+    '''
+    if isinstance(type, ir.ArrayType):
+      return type.count * self.sizeof(type.element)
+    if isinstance(type, ir.IntType):
+      return (type.width + 7) // 8
+    return 0
+
   def remove_quotes(self, str):
     return str[1:-1]
 
   def char_to_int(self, str):
-    return ord(self.remove_quotes(str))
+    code = char_code(str)
+    if code is None:
+      raise RuntimeError(f'Char constant {str} not implemented')
+    return code
 
   #
   # Custom headers
   #
-  # Since we don't have pre-processing, we write some hard code for
-  # the following external functions: printf, gets, isdigit, atoi,
-  # memcpy, strlen
-
-  def extern_function(self, node):
-    match node.name.name:
-      case 'printf':
-        func_type = ir.FunctionType(
-            ir.IntType(32),
-            [ir.IntType(8).as_pointer()],
-            var_arg=True)
-        args = []
-
-        for idx, arg in enumerate(node.args.exprs):
-          if idx == 0:
-            args.append(self.visit(arg))
-          else:
-            args.append(self.visit(arg, status=1))
-
-        return self.llvm_module.declare_intrinsic(node.name.name, (), func_type), args
-
-      case 'gets':
-        func_type = ir.FunctionType(
-            ir.IntType(32),
-            [],
-            var_arg=True)
-        args = []
-
-        for arg in node.args.exprs:
-          zero = ir.Constant(ir.IntType(32), 0)
-          ptr = self.llvm_builder.gep(
-              self.visit(arg, status=0), [zero, zero], inbounds=True)
-          args.append(ptr)
-
-        return self.llvm_module.declare_intrinsic(node.name.name, (), func_type), args
-
-      case 'isdigit':
-        func_type = ir.FunctionType(
-            ir.IntType(32),
-            [ir.IntType(32)],
-            var_arg=False)
-        args = []
-
-        for arg in node.args.exprs:
-          ext = self.llvm_builder.sext(
-              self.visit(arg, status=1), ir.IntType(32))
-          args.append(ext)
-
-        return self.llvm_module.declare_intrinsic(node.name.name, (), func_type), args
-
-      case 'atoi':
-        func_type = ir.FunctionType(
-            ir.IntType(32),
-            [],
-            var_arg=True)
-        args = []
-
-        for arg in node.args.exprs:
-          zero = ir.Constant(ir.IntType(32), 0)
-          ptr = self.llvm_builder.gep(
-              self.visit(arg, status=0), [zero, zero], inbounds=True)
-          args.append(ptr)
-
-        return self.llvm_module.declare_intrinsic(node.name.name, (), func_type), args
-
-      case 'memcpy':
-        args = []
-        for idx, arg in enumerate(node.args.exprs):
-          if idx == 2:
-            args.append(self.visit(arg, status=1))
-          else:
-            array_addr = self.visit(arg, status=0)
-            if isinstance(array_addr.type, ir.PointerType) and \
-                    isinstance(array_addr.type.pointee, ir.ArrayType):
-              zero = ir.Constant(ir.IntType(32), 0)
-              array_addr = self.llvm_builder.gep(
-                  array_addr, [zero, zero], inbounds=True)
-            args.append(array_addr)
-
-        args.append(ir.Constant(ir.IntType(32), 1))
-        args.append(ir.Constant(ir.IntType(1), 0))
-
-        pint8 = ir.PointerType(ir.IntType(8))
-        k = self.llvm_module.declare_intrinsic(
-            'llvm.memcpy', [pint8, pint8, ir.IntType(32)]), args
-        return k
-
-      case 'strlen':  # only works with str[], *str doesn't work now
-        func_type = ir.FunctionType(
-            ir.IntType(32),
-            [ir.IntType(8).as_pointer()],
-            var_arg=False)
-        args = []
-
-        for arg in node.args.exprs:
-          zero = ir.Constant(ir.IntType(32), 0)
-          ptr = self.llvm_builder.gep(
-              self.visit(arg, status=0), [zero, zero], inbounds=True)
-          args.append(ptr)
-
-        return self.llvm_module.declare_intrinsic(node.name.name, (), func_type), args
+  # Since we don't have pre-processing, calls of undeclared functions
+  # resolve to the C library prototypes of libc.PROTOTYPES
 
-      case _:
-        pass
+  def builtin_call(self, node):
+    '''
+      Return the declaration of the called C library function, added to
+      the module on its first call, and the converted call arguments
+    '''
+    name = node.name.name
+    builtin = libc.PROTOTYPES.get(name)
+    if builtin is None:
+      raise RuntimeError(f'Function {name} undefined')
+
+    params = builtin.type.args
+    exprs = node.args.exprs if node.args else []
+    args = [self.builtin_arg(expr, params[idx] if idx < len(params) else None)
+            for idx, expr in enumerate(exprs)]
+
+    func = self.builtin_func.get(name)
+    if func is None:
+      func = self.builtin_func[name] = ir.Function(
+          self.llvm_module, builtin.type, builtin.symbol)
+    return func, args + list(builtin.defaults)
+
+  def builtin_arg(self, node, param):
+    '''
+      Convert an argument of a C library function to its parameter type
+      Args:
+        param: ir.Type, None for the variadic arguments, which get the
+               default argument promotions
+    '''
+    if param is None:
+      # Only a variable can name an array, and visiting it for its address
+      # emits no code
+      if isinstance(node, ast.IdentifierType) and self.is_array(self.visit(node, 0)):
+        return self.decay(self.visit(node, 0))
+      value = self.visit(node, 1)
+      if isinstance(value.type, ir.IntType) and value.type.width < 32:
+        # Comparisons give 0 or 1, chars are signed
+        if value.type.width == 1:
+          return self.llvm_builder.zext(value, ir.IntType(32))
+        return self.llvm_builder.sext(value, ir.IntType(32))
+      return value
+
+    if isinstance(param, ir.PointerType):
+      value = self.visit(node, 0)
+      if value == 'NULL':
+        return ir.Constant(param, None)
+      if self.is_array(value):
+        value = self.decay(value)
+      elif isinstance(value.type, ir.PointerType) and \
+              isinstance(value.type.pointee, ir.PointerType):
+        # Address of a pointer variable
+        value = self.llvm_builder.load(value)
+      return self.implicit_cast(value, param)
+
+    value = self.visit(node, 1)
+    if isinstance(value.type, ir.IntType) and isinstance(param, ir.IntType):
+      if value.type.width < param.width:
+        value = self.llvm_builder.sext(value, param)
+      elif value.type.width > param.width:
+        value = self.llvm_builder.trunc(value, param)
+    return value
+
+  def is_array(self, value):
+    return isinstance(value, ir.Value) and isinstance(value.type, ir.PointerType) \
+        and isinstance(value.type.pointee, ir.ArrayType)
+
+  def decay(self, array):
+    '''
+      Arrays decay to the address of their first element
+    '''
+    zero = ir.Constant(ir.IntType(32), 0)
+    return self.llvm_builder.gep(array, [zero, zero], inbounds=True)
+
+  def implicit_cast(self, value, type):
+    '''
+      Convert NULL and pointers to the pointer type, like the char *
+      malloc returns, for lack of the void * conversions
+    '''
+    if value == 'NULL':
+      return ir.Constant(type, None)
+    if isinstance(value.type, ir.PointerType) and isinstance(type, ir.PointerType) \
+            and value.type != type:
+      return self.llvm_builder.bitcast(value, type)
+    return value
 
 
 # # ---------- check & handle error ----------
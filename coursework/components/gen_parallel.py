@@ -0,0 +1,92 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from llvmlite import ir
+import llvmlite.binding as llvm
+from .gen_llvm import LLVMGenerator
+from .engine import initialize_llvm
+from . import ast
+
+
+# Translation unit of a worker process, see _init_worker
+_head = None
+
+
+def generate(head, workers=None):
+  ''' Generate the LLVM IR of a translation unit, spreading the
+      function bodies over a pool of worker processes. Every worker
+      builds a module of its own, with the global variables and the
+      prototypes of all functions but only its share of the bodies.
+      The modules are then linked into one.
+      Args:
+        head: FileAST
+        workers: Number of processes, defaults to the number of CPUs
+      Returns:
+        llvm.ModuleRef
+  '''
+  global _head
+  workers = workers or os.cpu_count() or 1
+  funcs = [i for i, ext in enumerate(head.ext)
+           if isinstance(ext, ast.FuncDef) and ext.body]
+  # More chunks than workers keeps them all busy when the function
+  # sizes differ, each chunk repeats the declarations though
+  count = max(1, min(len(funcs), workers * 4))
+  chunks = [funcs[k * len(funcs) // count:(k + 1) * len(funcs) // count]
+            for k in range(count)]
+
+  # Forked workers inherit the AST, pickling it costs about as much as
+  # generating its code
+  if 'fork' in multiprocessing.get_all_start_methods():
+    context, initargs = multiprocessing.get_context('fork'), ()
+    _head = head
+  else:
+    context, initargs = None, (head,)
+  try:
+    with ProcessPoolExecutor(max_workers=min(workers, count), mp_context=context,
+                             initializer=_init_worker, initargs=initargs) as pool:
+      bitcodes = pool.map(_generate_chunk, chunks, [k == 0 for k in range(count)])
+      initialize_llvm()
+      # A context for this translation unit, as in the sequential path
+      llvm_context = llvm.create_context()
+      mod = None
+      for bitcode in bitcodes:
+        if mod is None:
+          mod = llvm.parse_bitcode(bitcode, context=llvm_context)
+        else:
+          mod.link_in(llvm.parse_bitcode(bitcode, context=llvm_context))
+  finally:
+    _head = None
+  return mod
+
+
+def _init_worker(head=None):
+  global _head
+  if head is not None:
+    _head = head
+
+
+def _generate_chunk(chunk, define_globals):
+  ''' Runs in a worker
+      Args:
+        chunk: Indices in FileAST.ext of the FuncDefs of this worker,
+               the other ones are only declared
+        define_globals: Whether this module holds the definitions of
+                        the global variables, only one module may
+      Returns:
+        Bitcode of the module
+  '''
+  chunk = set(chunk)
+  exts = [ext if i in chunk or not isinstance(ext, ast.FuncDef)
+          else ast.FuncDef(ext.decl, None, None, ext.coord)
+          for i, ext in enumerate(_head.ext)]
+  declared = {ext.name for ext in exts if isinstance(ext, ast.Decl)}
+  module = LLVMGenerator().generate(ast.FileAST(exts))
+  if not define_globals:
+    # The literals of the constant pool are private, every module
+    # keeps its own
+    for gv in module.global_values:
+      if isinstance(gv, ir.GlobalVariable) and gv.name in declared:
+        gv.initializer = None
+        gv.linkage = ''
+  initialize_llvm()
+  return llvm.parse_assembly(str(module)).as_bitcode()
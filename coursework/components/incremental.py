@@ -0,0 +1,198 @@
+from array import array
+from bisect import bisect_right
+from operator import attrgetter
+from ..ply.lex import LexError
+from .coord import LineIndex
+from .lexer import TokenArrays
+from .parser import Parser
+from . import ast
+
+
+class _Segment(object):
+  ''' Span [start, end) of the source holding whole external
+      declarations: from the end of the previous declaration up to the
+      ';' or '}' ending its own. The tokens of a segment are lexed and
+      parsed relative to its start, so it also serves as the line index
+      of its coords and they stay right when earlier edits move it.
+  '''
+  __slots__ = ('owner', 'start', 'end', 'ext', 'error', '__weakref__')
+
+  def __init__(self, owner, start, end):
+    self.owner = owner
+    self.start = start
+    self.end = end
+    self.ext = []
+    self.error = None
+
+  def locate(self, lexpos):
+    return self.owner.line_index.locate(self.start + lexpos)
+
+
+class IncrementalParser(object):
+  ''' Keeps the FileAST of a source between edits. An edit re-lexes
+      and re-parses only the external declarations it touches, growing
+      the damaged span until it ends with a complete declaration, and
+      splices their nodes into FileAST.ext. Whole declarations parse
+      the same in any context, because the grammar has no typedef names.
+  '''
+
+  def __init__(self, parser=None, filepath=''):
+    ''' Args:
+          parser: components.parser.Parser used for the declarations,
+                  a new one if None
+          filepath: File name of the coords
+    '''
+    self.parser = parser or Parser()
+    self.filepath = filepath
+    self.src_code = ''
+    self.line_index = LineIndex('')
+    self.segments = []
+    self.ast = ast.FileAST([])
+    self.reparsed = 0
+    names = self.parser.lexer.tokens
+    self._lbrace = names.index('LBRACE')
+    self._rbrace = names.index('RBRACE')
+    self._rparen = names.index('RPAREN')
+    self._semi = names.index('SEMI')
+
+  def parse(self, src_code):
+    ''' Parse a whole source, forgetting the previous one
+        Returns:
+          FileAST
+    '''
+    self.src_code = src_code
+    self.line_index = LineIndex(src_code)
+    self.segments = []
+    self.ast = ast.FileAST([])
+    self._reparse(0, 0, 0, len(src_code))
+    return self.result()
+
+  def edit(self, start, end, text):
+    ''' Replace src_code[start:end] with text and bring the AST up to date
+        Returns:
+          FileAST of the new source
+    '''
+    if not 0 <= start <= end <= len(self.src_code):
+      raise ValueError(f'Edit [{start}, {end}) outside of the source')
+    self.src_code = self.src_code[:start] + text + self.src_code[end:]
+    self.line_index = LineIndex(self.src_code)
+
+    segments = self.segments
+    lo = max(bisect_right(segments, start, key=attrgetter('start')) - 1, 0)
+    hi = max(bisect_right(segments, end, key=attrgetter('start')), lo + 1)
+    delta = len(text) - (end - start)
+    for segment in segments[hi:]:
+      segment.start += delta
+      segment.end += delta
+    self._reparse(lo, hi, segments[lo].start, segments[hi - 1].end + delta)
+    return self.result()
+
+  def result(self):
+    ''' Returns:
+          FileAST of the current source
+        Raises:
+          The error of the first declaration that does not parse
+    '''
+    for segment in self.segments:
+      if segment.error is not None:
+        raise segment.error
+    return self.ast
+
+  def _reparse(self, lo, hi, start, end):
+    # Replace segments[lo:hi], spanning src_code[start:end], by newly
+    # parsed ones, taking in the following segments while the span
+    # does not end with a complete declaration
+    segments = self.segments
+    while True:
+      try:
+        spans = self._split(start, end)
+      except LexError:
+        spans = None
+      if spans is not None or hi == len(segments):
+        break
+      end = segments[hi].end
+      hi += 1
+    self.reparsed = end - start
+
+    if spans is None:
+      # Left unfinished at the end of the source, the parser tells why
+      spans = [(start, end, None)]
+    new = [self._parse_span(*span) for span in spans]
+    if len(new) > 1 and any(segment.error for segment in new):
+      # Declarations the split does not know about (K&R parameters)
+      # may still parse as a whole
+      whole = self._parse_span(start, end, None)
+      if whole.error is None:
+        new = [whole]
+
+    first = sum(len(segment.ext) for segment in segments[:lo])
+    count = sum(len(segment.ext) for segment in segments[lo:hi])
+    self.ast.ext[first:first + count] = [node for segment in new
+                                         for node in segment.ext]
+    segments[lo:hi] = new
+
+  def _parse_span(self, start, end, arrays):
+    segment = _Segment(self, start, end)
+    if arrays is not None and not arrays.types:
+      return segment
+    try:
+      file_ast = self.parser.parse_tokens(self.src_code[start:end], arrays,
+                                          filepath=self.filepath,
+                                          line_index=segment)
+      segment.ext = file_ast.ext
+    except Exception as e:
+      # Semantic actions may fail on broken input too. Whatever the
+      # error, the segments must stay consistent with src_code.
+      segment.error = e
+    return segment
+
+  def _split(self, start, end):
+    ''' Returns:
+          List of (start, end, TokenArrays) of the declarations in
+          src_code[start:end], the arrays relative to their own start.
+          None if the span stops inside a declaration before the end
+          of the source.
+    '''
+    text = self.src_code[start:end]
+    arrays = self.parser.lexer.tokenize_all(text)
+    types = arrays.types
+    spans = []
+    first = 0         # first token of the current declaration
+    offset = 0        # where the current declaration starts in text
+    depth = 0
+    body = False
+    for i, type_id in enumerate(types):
+      if type_id == self._lbrace:
+        if depth == 0:
+          body = i > 0 and types[i - 1] == self._rparen
+        depth += 1
+        continue
+      if type_id == self._rbrace:
+        depth -= 1
+        if depth or not body:
+          continue
+      elif type_id != self._semi or depth:
+        continue
+      close = arrays.ends[i]
+      spans.append((start + offset, start + close,
+                    _relative(arrays, first, i + 1, offset)))
+      first = i + 1
+      offset = close
+
+    if offset < len(text) or not spans:
+      if end < len(self.src_code):
+        return None
+      spans.append((start + offset, end,
+                    _relative(arrays, first, len(types), offset)))
+    return spans
+
+
+def _relative(arrays, lo, hi, offset):
+  ''' Tokens lo to hi of arrays as tokenize_all would have returned them
+      for the text from offset on, which is where token lo - 1 ends
+  '''
+  lines = arrays.lines[lo - 1] - 1 if lo else 0
+  return TokenArrays(arrays.types[lo:hi],
+                     array('q', [pos - offset for pos in arrays.starts[lo:hi]]),
+                     array('q', [pos - offset for pos in arrays.ends[lo:hi]]),
+                     array('i', [line - lines for line in arrays.lines[lo:hi]]))
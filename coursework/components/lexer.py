@@ -1,5 +1,74 @@
+import re
+from array import array
+try:
+  from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:   # Python < 3.11
+  import sre_parse, sre_constants
+from functools import partial
+from collections import namedtuple
 from ..ply import lex
-from ..ply.lex import TOKEN
+from ..ply.lex import TOKEN, LexError
+from .coord import LineIndex
+
+
+# Result of Lexer.tokenize_all. Parallel arrays with one entry per
+# token: the index of its type in Lexer.tokens, its start and end
+# offsets in the source and its line number.
+TokenArrays = namedtuple('TokenArrays', ['types', 'starts', 'ends', 'lines'])
+
+# Scanner actions of the matches that do not produce a token as is
+_IGNORE, _NEWLINE, _COMMENT, _ID, _ERROR = -1, -2, -3, -4, -5
+
+
+def _first_chars(regex, flags):
+  ''' Set of the characters a match of regex can start with, None if
+      that cannot be told from the pattern
+  '''
+  try:
+    items = sre_parse.parse(regex, flags)
+  except Exception:
+    return None
+  chars, nullable = _first_of(items)
+  return None if nullable else chars
+
+
+def _first_of(items):
+  # Returns (first characters or None, whether items can match empty)
+  chars = set()
+  for op, av in items:
+    if op is sre_constants.LITERAL:
+      chars.add(chr(av))
+      return chars, False
+    if op is sre_constants.IN:
+      for item_op, item_av in av:
+        if item_op is sre_constants.LITERAL:
+          chars.add(chr(item_av))
+        elif item_op is sre_constants.RANGE:
+          chars.update(map(chr, range(item_av[0], item_av[1] + 1)))
+        else:
+          return None, False
+      return chars, False
+    if op is sre_constants.SUBPATTERN:
+      first, nullable = _first_of(av[-1])
+    elif op is sre_constants.BRANCH:
+      first, nullable = set(), False
+      for branch in av[1]:
+        branch_first, branch_nullable = _first_of(branch)
+        if branch_first is None:
+          return None, False
+        first |= branch_first
+        nullable |= branch_nullable
+    elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+      first, nullable = _first_of(av[2])
+      nullable = nullable or av[0] == 0
+    else:
+      return None, False
+    if first is None:
+      return None, False
+    chars |= first
+    if not nullable:
+      return chars, False
+  return chars, True
 
 
 class Lexer(object):
@@ -10,15 +79,149 @@ class Lexer(object):
   def __init__(self, lbrace_func, rbrace_func):
     self.lbrace_func = lbrace_func
     self.rbrace_func = rbrace_func
+    self.line_index = None
 
   def build(self, **kwargs):
     self.lexer = lex.lex(object=self, **kwargs)
+    # Until an input is given, token() behaves like PLY's
+    self._next_token = self.lexer.token
 
   def input(self, src_code):
     self.lexer.input(src_code)
+    self.line_index = LineIndex(src_code)
+    self._next_token = self.lexer.token
+
+  def input_stream(self, stream, chunksize=1 << 20):
+    ''' Lex a file or mmap chunk by chunk instead of a string
+        Args:
+          stream: Object with a read(n) method returning str or bytes
+          chunksize: Number of characters (or bytes) read at a time
+    '''
+    self.lexer.input_stream(stream, chunksize)
+    # The text is never held as a whole, tokens only know their line
+    self.line_index = None
+    self._next_token = self.lexer.stream_token
+
+  def input_tokens(self, src_code, arrays=None, line_index=None):
+    ''' Serve the tokens of tokenize_all through token(). The brace
+        callbacks fire as the tokens are handed out, like when lexing
+        one token at a time.
+        Args:
+          src_code: Source text
+          arrays: Result of tokenize_all(src_code), computed if None
+          line_index: Object whose locate(lexpos) resolves the coords,
+                      a LineIndex of src_code if None
+    '''
+    arrays = arrays or self.tokenize_all(src_code)
+    self.line_index = line_index or LineIndex(src_code)
+    self._next_token = partial(next, self._array_tokens(src_code, arrays), None)
+
+  def _array_tokens(self, src_code, arrays):
+    names = self.tokens
+    lbrace = names.index('LBRACE')
+    rbrace = names.index('RBRACE')
+    lexer = self.lexer
+    for type_id, start, end, line in zip(*arrays):
+      tok = lex.LexToken()
+      tok.type = names[type_id]
+      tok.value = src_code[start:end]
+      tok.lineno = lexer.lineno = line
+      tok.lexpos = start
+      if type_id == lbrace:
+        self.lbrace_func()
+      elif type_id == rbrace:
+        self.rbrace_func()
+      yield tok
+
+  def tokenize_all(self, src_code):
+    ''' Lex a whole source at once. No token objects are created,
+        keywords are classified by a table lookup instead of the t_ID
+        callback, and every match only tries the rules that can start
+        with the character at hand.
+        Returns:
+          TokenArrays
+    '''
+    if not hasattr(self, '_dispatch'):
+      self._build_scanner()
+    dispatch = self._dispatch.get
+    fallback = self._fallback
+    actions = self._scanner_actions
+    keyword_ids = self._keyword_ids
+    id_type = self.tokens.index('ID')
+
+    types = array('i')
+    starts = array('q')
+    ends = array('q')
+    lines = array('i')
+    line = 1
+    pos = 0
+    end = len(src_code)
+    while pos < end:
+      m = dispatch(src_code[pos], fallback).match(src_code, pos)
+      action = actions[m.lastgroup]
+      if action >= 0:
+        types.append(action)
+      elif action == _ID:
+        types.append(keyword_ids.get(m.group(), id_type))
+      else:
+        if action == _NEWLINE:
+          line += m.end() - pos
+        elif action == _COMMENT:
+          value = m.group()
+          if not value.endswith('*/') or len(value) < 4:
+            raise LexError(f'Unterminated comment at line {line}', value)
+          line += value.count('\n')
+        elif action == _ERROR:
+          print(f"Illegal character '{m.group()}'")
+        pos = m.end()
+        continue
+      starts.append(pos)
+      pos = m.end()
+      ends.append(pos)
+      lines.append(line)
+    return TokenArrays(types, starts, ends, lines)
+
+  def _build_scanner(self):
+    flags = self.lexer.lexreflags
+    # Rules in the priority order of the master regex built by lex
+    master = re.compile(self.lexer.lexretext[0] if len(self.lexer.lexretext) == 1
+                        else '|'.join(self.lexer.lexretext), flags)
+    names = sorted((name for name in master.groupindex if name.startswith('t_')),
+                   key=master.groupindex.get)
+    rules = []
+    for name in names:
+      rule = getattr(self, name)
+      regex = lex._get_regex(rule) if callable(rule) else rule
+      rules.append((name, regex, _first_chars(regex, flags)))
+
+    error = r'(?P<_error>(?s:.))'
+
+    def scanner(alternatives):
+      return re.compile('|'.join([*(f'(?P<{name}>{regex})' for name, regex in alternatives),
+                                  error]), flags)
+
+    # One scanner per possible first character, holding only the rules
+    # able to start there. Rules whose first characters are unknown go
+    # everywhere, other characters get all rules.
+    self._fallback = scanner((name, regex) for name, regex, _ in rules)
+    self._dispatch = {}
+    for char in set().union(*(first for _, _, first in rules if first)):
+      self._dispatch[char] = scanner((name, regex) for name, regex, first in rules
+                                     if first is None or char in first)
+    ignore = re.compile(f'(?P<_ignore>[{re.escape(self.t_ignore)}]+)')
+    for char in self.t_ignore:
+      self._dispatch[char] = ignore
+
+    special = {'t_newline': _NEWLINE, 't_comment': _COMMENT, 't_ID': _ID}
+    self._scanner_actions = {'_ignore': _IGNORE, '_error': _ERROR}
+    for name in names:
+      # The other rule functions return their token unchanged
+      self._scanner_actions[name] = special.get(name) or self.tokens.index(name[2:])
+    self._keyword_ids = {word: self.tokens.index(type)
+                         for word, type in self.keywords.items()}
 
   def token(self):
-    return self.lexer.token()
+    return self._next_token()
 
   def reset_lineno(self):
     self.lexer.lineno = 1
@@ -173,7 +376,11 @@ class Lexer(object):
     t.lexer.lineno += len(t.value)
 
   def t_comment(self, t):
-    r'/\*(.|\n)*?\*/'
+    r'/\*(.|\n)*?(\*/|\Z)'
+    # Also matching up to the end of the input lets a streaming lexer
+    # see that the comment continues in the next chunk
+    if not t.value.endswith('*/') or len(t.value) < 4:
+      raise LexError(f'Unterminated comment at line {t.lexer.lineno}', t.value)
     t.lexer.lineno += t.value.count('\n')
 
   # A string containing ignored characters (spaces and tabs)
@@ -0,0 +1,46 @@
+from collections import namedtuple
+from llvmlite import ir
+
+# Since we don't have pre-processing, the prototypes of the C library
+# functions a program may call without declaring them are hard coded
+# here instead of coming from the headers.
+#
+# symbol   -> Name of the declared function in the module
+# type     -> ir.FunctionType
+# defaults -> Constant arguments appended to those of the call
+
+Builtin = namedtuple('Builtin', ['symbol', 'type', 'defaults'])
+
+_void = ir.VoidType()
+_bool = ir.IntType(1)
+_int = ir.IntType(32)
+_size = ir.IntType(64)
+_str = ir.IntType(8).as_pointer()
+
+
+def _libc(name, ret, params, var_arg=False):
+  return name, Builtin(name, ir.FunctionType(ret, params, var_arg=var_arg), ())
+
+
+PROTOTYPES = dict([
+    # stdio.h
+    _libc('printf', _int, [_str], var_arg=True),
+    _libc('puts', _int, [_str]),
+    _libc('putchar', _int, [_int]),
+    _libc('gets', _str, [_str]),
+    # ctype.h
+    _libc('isdigit', _int, [_int]),
+    # stdlib.h
+    _libc('atoi', _int, [_str]),
+    _libc('malloc', _str, [_size]),
+    _libc('free', _void, [_str]),
+    # string.h, strlen returns the int the programs store its size_t in
+    _libc('strlen', _int, [_str]),
+    _libc('strcmp', _int, [_str, _str]),
+    _libc('memset', _str, [_str, _int, _size]),
+    # The intrinsic lets LLVM inline small copies, the appended
+    # argument is isvolatile
+    ('memcpy', Builtin('llvm.memcpy.p0i8.p0i8.i32',
+                       ir.FunctionType(_void, [_str, _str, _int, _bool]),
+                       (ir.Constant(_bool, 0),))),
+])
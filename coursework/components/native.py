@@ -0,0 +1,92 @@
+import os
+import ctypes
+import _ctypes
+import subprocess
+from llvmlite import ir
+import llvmlite.binding as llvm
+from .engine import initialize_llvm
+
+
+# Command used to link object files into shared libraries
+LINKER = os.environ.get('CC', 'cc')
+
+
+def create_target_machine(opt_level=0):
+  ''' Target machine for the host producing position independent code,
+      which can go both into executables and shared libraries
+  '''
+  initialize_llvm()
+  target = llvm.Target.from_default_triple()
+  return target.create_target_machine(opt=opt_level, reloc='pic', codemodel='default')
+
+
+def compile_object(code, opt_level=0):
+  ''' Compile a module to native code
+      Args:
+        code: ir.Module, LLVM assembly text or llvm.ModuleRef
+        opt_level: Code generation optimization level (0-3)
+      Returns:
+        Bytes of the object file
+  '''
+  target_machine = create_target_machine(opt_level)
+  if isinstance(code, llvm.ModuleRef):
+    mod = code
+  else:
+    mod = llvm.parse_assembly(str(code) if isinstance(code, ir.Module) else code)
+  mod.triple = target_machine.triple
+  mod.data_layout = str(target_machine.target_data)
+  mod.verify()
+  return target_machine.emit_object(mod)
+
+
+def emit_object(code, filepath, opt_level=0):
+  ''' Compile a module to a native object file
+      Args:
+        code: ir.Module, LLVM assembly text or llvm.ModuleRef
+        filepath: Path of the object file to write
+        opt_level: Code generation optimization level (0-3)
+      Returns:
+        filepath
+  '''
+  with open(filepath, 'wb') as f:
+    f.write(compile_object(code, opt_level))
+  return filepath
+
+
+def link_shared(objpaths, filepath):
+  ''' Link object files into a shared library with the system linker
+      Args:
+        objpaths: Path or list of paths of object files
+        filepath: Path of the shared library to write
+      Returns:
+        filepath
+  '''
+  if isinstance(objpaths, str):
+    objpaths = [objpaths]
+  cmd = [LINKER, '-shared', '-o', filepath, *objpaths]
+  proc = subprocess.run(cmd, capture_output=True, text=True)
+  if proc.returncode != 0:
+    raise RuntimeError(f'Linking {filepath} failed: {proc.stderr.strip()}')
+  return filepath
+
+
+def run_shared(filepath, entry='main'):
+  ''' Load a shared library built by link_shared and call its entry
+      function. The library is unloaded afterwards on POSIX systems, so
+      every run starts with freshly initialized globals, like a JIT run.
+      Elsewhere it stays loaded until exit, and a library loaded again
+      from the same path keeps its globals.
+      Returns:
+        The value returned by the entry function
+  '''
+  lib = ctypes.CDLL(os.path.abspath(filepath))
+  try:
+    cfunc = getattr(lib, entry)
+    cfunc.restype = ctypes.c_int
+    cfunc.argtypes = []
+    return cfunc()
+  finally:
+    # dlclose is an internal of CPython's ctypes, only defined on POSIX
+    # systems, there is no public way to unload a CDLL
+    if hasattr(_ctypes, 'dlclose'):
+      _ctypes.dlclose(lib._handle)
@@ -0,0 +1,71 @@
+import llvmlite.binding as llvm
+
+
+OPT_LEVELS = (0, 1, 2, 3)
+
+
+def create_pass_manager(opt_level, target_machine=None):
+  ''' Build the module pass pipeline for an optimization level
+      Args:
+        opt_level:
+          0 -> no passes
+          1 -> promote allocas to registers (mem2reg), instcombine,
+               CFG simplification
+          2 -> 1 + inlining, GVN, SCCP and loop passes
+          3 -> 2 + aggressive instcombine, loop unrolling and a
+               higher inlining threshold
+        target_machine: Optional llvm.TargetMachine whose analysis
+                        passes are added to the pipeline
+      Returns:
+        llvm.ModulePassManager
+  '''
+  if opt_level not in OPT_LEVELS:
+    raise ValueError(f'Optimization level {opt_level} not supported')
+
+  pm = llvm.create_module_pass_manager()
+  if target_machine is not None:
+    target_machine.add_analysis_passes(pm)
+  if opt_level == 0:
+    return pm
+
+  # Every local variable and argument is spilled to an alloca by the
+  # generator, so SROA (a superset of mem2reg) comes first
+  pm.add_sroa_pass()
+  pm.add_instruction_combining_pass()
+  pm.add_cfg_simplification_pass()
+
+  if opt_level >= 2:
+    pm.add_function_inlining_pass(275 if opt_level >= 3 else 225)
+    pm.add_sroa_pass()
+    pm.add_reassociate_expressions_pass()
+    pm.add_gvn_pass()
+    pm.add_sccp_pass()
+    # Loop passes
+    pm.add_loop_simplification_pass()
+    pm.add_loop_rotate_pass()
+    pm.add_licm_pass()
+    pm.add_loop_deletion_pass()
+    if opt_level >= 3:
+      pm.add_aggressive_instruction_combining_pass()
+      pm.add_loop_unroll_pass()
+    pm.add_instruction_combining_pass()
+    pm.add_dead_store_elimination_pass()
+    pm.add_aggressive_dead_code_elimination_pass()
+    pm.add_cfg_simplification_pass()
+    pm.add_global_dce_pass()
+
+  pm.add_dead_code_elimination_pass()
+  return pm
+
+
+def optimize(mod, opt_level, target_machine=None):
+  ''' Run the pass pipeline of opt_level on a module in place
+      Args:
+        mod: llvm.ModuleRef
+      Returns:
+        mod
+  '''
+  if opt_level:
+    pm = create_pass_manager(opt_level, target_machine)
+    pm.run(mod)
+  return mod
@@ -1,41 +1,91 @@
+import os
 from ..ply import yacc
 from .lexer import Lexer
 from .coord import Coord
 from . import ast
 
 
+# Directory where the generated parsing tables are cached between runs
+TAB_DIR = os.path.join(os.path.dirname(__file__), '__pycache__')
+
+
 class Parser(object):
   ''' An object class that wraps yacc and provides
       needed information for yacc.yacc
   '''
 
-  def __init__(self):
+  def __init__(self, tabdir=TAB_DIR, method='LALR'):
+    ''' Args:
+          tabdir: Directory used to cache the lexer and parsing tables,
+                  and the parser module generated from the tables.
+                  They are rebuilt whenever the token rules or the
+                  grammar change. None disables the cache.
+          method: Table construction method, one of yacc.LR_METHODS.
+                  The tables of every method are cached apart
+    '''
     self.lexer = Lexer(self._lbrace_func, self._rbrace_func)
-    self.lexer.build()
+    self.lexer.build(
+      lextab=os.path.join(tabdir, 'c_lextab.pickle') if tabdir else None)
     self.tokens = self.lexer.tokens
+    suffix = '' if method == 'LALR' else '_' + method.lower()
     self.parser = yacc.yacc(
       module=self,
       start='translation_unit_or_empty',
-      debug=False)
+      debug=False,
+      method=method,
+      picklefile=os.path.join(tabdir, f'c_parsetab{suffix}.pickle') if tabdir else None,
+      parsermodule=os.path.join(tabdir, f'c_parsegen{suffix}.py') if tabdir else None)
     self._scope_stack = [dict()]
 
 
-  def parse(self, src_code, filepath='', verbose=0):
+  def parse(self, src_code, filepath='', verbose=0, bulk=False):
+    ''' Args:
+          bulk: Lex the whole source with Lexer.tokenize_all before
+                parsing, instead of one token at a time
+    '''
+    if bulk:
+      return self.parse_tokens(src_code, filepath=filepath, verbose=verbose)
+    return self._parse(src_code, filepath, verbose)
+
+
+  def parse_tokens(self, src_code, arrays=None, filepath='', verbose=0,
+                   line_index=None):
+    ''' Parse tokens already lexed by Lexer.tokenize_all
+        Args:
+          arrays: TokenArrays of src_code, computed if None
+          line_index: See Lexer.input_tokens
+    '''
+    self.lexer.input_tokens(src_code, arrays, line_index)
+    return self._parse(None, filepath, verbose)
+
+
+  def _parse(self, src_code, filepath, verbose):
     self.lexer.filepath = filepath
     self.lexer.reset_lineno()
+    # A previous parse may have stopped inside a block
+    self._scope_stack = [dict()]
     return self.parser.parse(
       input=src_code,
       lexer=self.lexer,
       debug=verbose)
 
 
+  def parse_stream(self, stream, filepath='', verbose=0, chunksize=1 << 20):
+    ''' Like parse, but the lexer reads the source from a file or
+        mmap in chunks, so it is never held as one string
+    '''
+    self.lexer.input_stream(stream, chunksize)
+    return self._parse(None, filepath, verbose)
+
+
   def _lbrace_func(self):
     self._scope_stack.append(dict())
 
 
   def _rbrace_func(self):
-    assert len(self._scope_stack) > 1
-    self._scope_stack.pop()
+    # An unmatched brace is left to p_error
+    if len(self._scope_stack) > 1:
+      self._scope_stack.pop()
 
 
   def _coord(self, lineno, column=None):
@@ -45,6 +95,18 @@ class Parser(object):
       column=column)
 
 
+  def _token_coord(self, p, i):
+    ''' Coord of the i-th symbol of a production, which must be a
+        token. Line and column are only looked up in the line index of
+        the lexer when first read.
+    '''
+    tok = p.slice[i]
+    index = self.lexer.line_index
+    if index is None:
+      return Coord(self.lexer.filepath, tok.lineno)
+    return Coord(self.lexer.filepath, None, None, tok.lexpos, index)
+
+
   # A C type consists of a basic type declaration, with a list
   # of modifiers. For example:
   #
@@ -163,7 +225,7 @@ class Parser(object):
     if len(p) == 2:
       p[0] = p[1]
     else:
-      p[0] = ast.Assignment(p[2], p[1], p[3])
+      p[0] = ast.Assignment(p[2], p[1], p[3], p[1].coord)
 
 
   def p_assignment_operator(self, p):
@@ -216,7 +278,7 @@ class Parser(object):
     if len(p) == 2:
       p[0] = p[1]
     else:
-      p[0] = ast.BinaryOp(p[2], p[1], p[3])
+      p[0] = ast.BinaryOp(p[2], p[1], p[3], self._token_coord(p, 2))
 
 
   def p_cast_expression(self, p): # Tested
@@ -239,7 +301,7 @@ class Parser(object):
                       | MINUSMINUS unary_expression
                       | unary_operator cast_expression
     '''
-    p[0] = ast.UnaryOp(p[1], p[2])
+    p[0] = ast.UnaryOp(p[1], p[2], p[2].coord)
 
 
   def p_unary_operator(self, p):
@@ -265,7 +327,7 @@ class Parser(object):
     '''
     postfix_expression  : postfix_expression LBRACKET expression RBRACKET
     '''
-    p[0] = ast.ArrayRef(p[1], p[3])
+    p[0] = ast.ArrayRef(p[1], p[3], p[1].coord)
 
 
   def p_postfix_expression_3(self, p):
@@ -273,7 +335,7 @@ class Parser(object):
     postfix_expression  : postfix_expression LPAREN argument_expression_list RPAREN
                         | postfix_expression LPAREN RPAREN
     '''
-    p[0] = ast.FuncCall(p[1], p[3] if len(p) == 5 else None)
+    p[0] = ast.FuncCall(p[1], p[3] if len(p) == 5 else None, p[1].coord)
 
 
   def p_postfix_expression_4(self, p):
@@ -282,7 +344,7 @@ class Parser(object):
                         | postfix_expression ARROW identifier
     '''
     field = ast.IdentifierType(name=p[3], spec=None)
-    p[0] = ast.StructRef(p[1], p[2], field)
+    p[0] = ast.StructRef(p[1], p[2], field, p[1].coord)
 
 
   def p_postfix_expression_5(self, p):
@@ -290,7 +352,7 @@ class Parser(object):
     postfix_expression  : postfix_expression PLUSPLUS
                         | postfix_expression MINUSMINUS
     '''
-    p[0] = ast.UnaryOp('p' + p[2], p[1])
+    p[0] = ast.UnaryOp('p' + p[2], p[1], p[1].coord)
 
 
   def p_primary_expression_1(self, p):
@@ -328,7 +390,7 @@ class Parser(object):
     '''
     if len(p) == 2:  # single literal
       p[0] = ast.Constant(
-        'string', p[1])
+        'string', p[1], self._token_coord(p, 1))
     else:
       p[1].value = p[1].value[:-1] + p[2][1:]
       p[0] = p[1]
@@ -370,7 +432,7 @@ class Parser(object):
           spec=decl_spec['spec'],
           type=struct,
           init=None)
-        p[0].insert(0, decl)
+        p[0].append(decl)
       else:
         for init_decl in init_decl_list:
           type = init_decl['type']
@@ -381,11 +443,13 @@ class Parser(object):
               storage=decl_spec['storage'],
               spec=decl_spec['spec'],
               type=struct,
-              init=init_decl['init'])
+              init=init_decl['init'],
+              coord=type.coord)
           else:
             while not isinstance(type.type, ast.IdentifierType):
               type = type.type
             declname = type.type.name
+            coord = type.type.coord
             type.type = struct
             decl = ast.Decl(
               name=declname,
@@ -393,8 +457,9 @@ class Parser(object):
               storage=decl_spec['storage'],
               spec=decl_spec['spec'],
               type=init_decl['type'],
-              init=None)
-          p[0].insert(0, decl)
+              init=None,
+              coord=coord)
+          p[0].append(decl)
     else:   # Normal declaration
       for init_decl in init_decl_list:
         type = init_decl['type']
@@ -407,8 +472,14 @@ class Parser(object):
           storage=decl_spec['storage'],
           spec=decl_spec['spec'],
           type=init_decl['type'],
-          init=init_decl['init'])
-        p[0].insert(0, decl)
+          init=init_decl['init'],
+          coord=type.coord)
+        p[0].append(decl)
+
+    # Declarators have always been listed last to first. Appending
+    # and reversing once keeps that order without the quadratic
+    # cost of inserting at the front
+    p[0].reverse()
 
     # for init_decl in init_decl_list:
     #   type = init_decl['type']
@@ -501,7 +572,11 @@ class Parser(object):
     init_declarator_list  : init_declarator
                           | init_declarator_list COMMA init_declarator
     '''
-    p[0] = p[1] + [p[3]] if len(p) == 4 else [p[1]]
+    if len(p) == 4:
+      p[1].append(p[3])
+      p[0] = p[1]
+    else:
+      p[0] = [p[1]]
 
 
   def p_init_declarator(self, p): # Tested
@@ -560,7 +635,8 @@ class Parser(object):
     if len(p) == 2:
       p[0] = p[1] or []
     else:
-      p[0] = p[1] + (p[2] or [])
+      p[1].extend(p[2] or [])
+      p[0] = p[1]
 
 
   def p_struct_declaration(self, p):
@@ -584,12 +660,14 @@ class Parser(object):
             spec=spec_qual['spec'],
             storage=[],
             type=struct,
-            init=None)
+            init=None,
+            coord=struct_decl.coord)
         else:
           type = struct_decl
           while not isinstance(type.type, ast.IdentifierType):
             type = type.type
           declname = type.type.name
+          coord = type.type.coord
           type.type = struct
           decl = ast.Decl(
             name=declname,
@@ -597,7 +675,8 @@ class Parser(object):
             spec=spec_qual['spec'],
             storage=[],
             type=struct_decl,
-            init=None)
+            init=None,
+            coord=coord)
       else:
         type = struct_decl
         while not isinstance(type, ast.IdentifierType):
@@ -609,8 +688,12 @@ class Parser(object):
           spec=spec_qual['spec'],
           storage=[],
           type=struct_decl,
-          init=None)
-      p[0].insert(0, decl)
+          init=None,
+          coord=type.coord)
+      p[0].append(decl)
+
+    # Same last to first order as in p_declaration
+    p[0].reverse()
 
 
   def p_specifier_qualifier_list_opt(self, p):
@@ -648,7 +731,11 @@ class Parser(object):
     struct_declarator_list  : declarator
                             | struct_declarator_list COMMA declarator
     '''
-    p[0] = p[1] + [p[3]] if len(p) == 4 else [p[1]]
+    if len(p) == 4:
+      p[1].append(p[3])
+      p[0] = p[1]
+    else:
+      p[0] = [p[1]]
 
 
   def p_storage_class_specifier(self, p):
@@ -717,7 +804,11 @@ class Parser(object):
     type_qualifier_list : type_qualifier
                         | type_qualifier_list type_qualifier
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[2]]
+    if len(p) == 2:
+      p[0] = [p[1]]
+    else:
+      p[1].append(p[2])
+      p[0] = p[1]
 
 
   def p_direct_declarator_1(self, p):
@@ -776,11 +867,13 @@ class Parser(object):
           storage=decl_spec['storage'],
           spec=decl_spec['spec'],
           type=struct,
-          init=None)
+          init=None,
+          coord=type.coord)
       else:
         while not isinstance(type.type, ast.IdentifierType):
           type = type.type
         declname = type.type.name
+        coord = type.type.coord
         type.type = struct
         declaration = ast.Decl(
           name=declname,
@@ -788,7 +881,8 @@ class Parser(object):
           storage=decl_spec['storage'],
           spec=decl_spec['spec'],
           type=p[2],
-          init=None)
+          init=None,
+          coord=coord)
     else:
       while not isinstance(type, ast.IdentifierType):
         type = type.type
@@ -799,7 +893,8 @@ class Parser(object):
         storage=decl_spec['storage'],
         spec=decl_spec['spec'],
         type=p[2],
-        init=None)
+        init=None,
+        coord=type.coord)
 
     p[0] = declaration
 
@@ -915,8 +1010,11 @@ class Parser(object):
     ''' block_item_list : block_item
                         | block_item_list block_item
     '''
-    # Empty block items (plain ';') produce [None], so ignore them
-    p[0] = p[1] if (len(p) == 2 or p[2] == [None]) else p[1] + p[2]
+    # Empty block items (plain ';') produce [None], so ignore them.
+    # Lists are extended in place, every block_item is a new list
+    if len(p) == 3 and p[2] != [None]:
+      p[1].extend(p[2])
+    p[0] = p[1]
 
 
   # declaration is a list, statement isn't. To make it consistent,
@@ -934,21 +1032,21 @@ class Parser(object):
     '''
     selection_statement : IF LPAREN expression RPAREN statement
     '''
-    p[0] = ast.If(p[3], p[5], None)
+    p[0] = ast.If(p[3], p[5], None, self._token_coord(p, 1))
 
 
   def p_selection_statement_2(self, p):
     '''
     selection_statement : IF LPAREN expression RPAREN statement ELSE statement
     '''
-    p[0] = ast.If(p[3], p[5], p[7])
+    p[0] = ast.If(p[3], p[5], p[7], self._token_coord(p, 1))
 
 
   def p_selection_statement_3(self, p):
     '''
     selection_statement : SWITCH LPAREN expression RPAREN statement
     '''
-    p[0] = ast.Switch(p[3], p[5])
+    p[0] = ast.Switch(p[3], p[5], self._token_coord(p, 1))
 
 
   def p_expression_statement(self, p):
@@ -965,21 +1063,21 @@ class Parser(object):
     '''
     iteration_statement : WHILE LPAREN expression RPAREN statement
     '''
-    p[0] = ast.While(p[3], p[5])
+    p[0] = ast.While(p[3], p[5], self._token_coord(p, 1))
 
 
   def p_jump_statement_1(self, p):
     '''
     jump_statement  : BREAK SEMI
     '''
-    p[0] = ast.Break()
+    p[0] = ast.Break(self._token_coord(p, 1))
 
 
   def p_jump_statement_2(self, p):
     '''
     jump_statement  : CONTINUE SEMI
     '''
-    p[0] = ast.Continue()
+    p[0] = ast.Continue(self._token_coord(p, 1))
 
 
   def p_jump_statement_3(self, p):
@@ -987,7 +1085,7 @@ class Parser(object):
     jump_statement  : RETURN expression SEMI
                     | RETURN SEMI
     '''
-    p[0] = ast.Return(p[2] if len(p) == 4 else None, )
+    p[0] = ast.Return(p[2] if len(p) == 4 else None, self._token_coord(p, 1))
 
 
   def p_translation_unit_or_empty(self, p):
@@ -1051,11 +1149,13 @@ class Parser(object):
           storage=decl_spec['storage'],
           spec=decl_spec['spec'],
           type=struct,
-          init=None)
+          init=None,
+          coord=type.coord)
       else:
         while not isinstance(type.type, ast.IdentifierType):
           type = type.type
         declname = type.type.name
+        coord = type.type.coord
         type.type = struct
         declaration = ast.Decl(
           name=declname,
@@ -1063,7 +1163,8 @@ class Parser(object):
           storage=decl_spec['storage'],
           spec=decl_spec['spec'],
           type=p[2],
-          init=None)
+          init=None,
+          coord=coord)
     else:
       while not isinstance(type, ast.IdentifierType):
         type = type.type
@@ -1074,12 +1175,14 @@ class Parser(object):
         storage=decl_spec['storage'],
         spec=decl_spec['spec'],
         type=p[2],
-        init=None)
+        init=None,
+        coord=type.coord)
 
     p[0] = ast.FuncDef(
       decl=declaration,
       param_decls=p[3],
-      body=p[4])
+      body=p[4],
+      coord=declaration.coord)
 
 
   def p_declaration_list_opt(self, p):  # Tested
@@ -1099,7 +1202,9 @@ class Parser(object):
     declaration_list  : declaration
                       | declaration_list declaration
     '''
-    p[0] = p[1] if len(p) == 2 else p[1] + p[2]
+    if len(p) == 3:
+      p[1].extend(p[2])
+    p[0] = p[1]
 
 
   #
@@ -1126,14 +1231,14 @@ class Parser(object):
     constant  : INT_CONST_DEC
               | INT_CONST_OCT
     '''
-    p[0] = ast.Constant('int', p[1], )
+    p[0] = ast.Constant('int', p[1], self._token_coord(p, 1))
 
 
   def p_constant_3(self, p):
     '''
     constant  : CHAR_CONST
     '''
-    p[0] = ast.Constant('char', p[1], )
+    p[0] = ast.Constant('char', p[1], self._token_coord(p, 1))
 
 
   def p_empty(self, p):
@@ -1145,12 +1250,14 @@ class Parser(object):
     '''
     identifier  : ID
     '''
-    p[0] = ast.IdentifierType(name=p[1], spec=None)
+    p[0] = ast.IdentifierType(name=p[1], spec=None, coord=self._token_coord(p, 1))
 
 
   def p_error(self, p):
     if p:
-      raise ParseError(f'before: {p.value}: {self.lexer.lexer.lineno}')
+      coord = Coord(self.lexer.filepath, p.lineno, lexpos=p.lexpos,
+                    index=self.lexer.line_index)
+      raise ParseError(f'before: {p.value}: {coord}')
     else:
       raise ParseError(f'at: {self.lexer.lexer.lineno}')
 
@@ -0,0 +1,131 @@
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+try:
+  import resource
+except ImportError:   # Windows
+  resource = None
+
+
+class Profiler(object):
+  ''' Collects where the time of a compilation goes.
+      Phases are timed with phase(). attach_parser and attach_generator
+      wrap the token function, the semantic actions and the visit
+      method of a Parser and LLVMGenerator to count tokens, reductions
+      and visited nodes. Nothing is wrapped unless a Profiler is used.
+      attach_folder reports the counts of a ConstantFolder.
+  '''
+
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    self.phases = Counter()
+    self.tokens = 0
+    self.reductions = 0
+    self.visits = Counter()
+    self.generator = None
+    self.folder = None
+
+  @contextmanager
+  def phase(self, name):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.phases[name] += time.perf_counter() - start
+
+  def attach_parser(self, parser):
+    ''' Time lexing and the p_* actions of a components.parser.Parser '''
+    token = parser.lexer.token
+
+    def timed_token():
+      start = time.perf_counter()
+      tok = token()
+      self.phases['lex'] += time.perf_counter() - start
+      if tok is not None:
+        self.tokens += 1
+      return tok
+
+    parser.lexer.token = timed_token
+    for prod in parser.parser.productions:
+      if prod.callable:
+        prod.callable = self._timed_action(prod.callable)
+
+  def attach_generator(self, generator):
+    ''' Count the nodes visited by an LLVMGenerator per class, and
+        report the statistics of its constant pool
+    '''
+    self.generator = generator
+    visit = generator.visit
+
+    def counted_visit(node, status=0):
+      self.visits[node.__class__.__name__] += 1
+      return visit(node, status)
+
+    generator.visit = counted_visit
+
+  def attach_folder(self, folder):
+    ''' Report the folded nodes of a ConstantFolder '''
+    self.folder = folder
+
+  def _timed_action(self, action):
+    def timed_action(p):
+      start = time.perf_counter()
+      action(p)
+      self.phases['actions'] += time.perf_counter() - start
+      self.reductions += 1
+    return timed_action
+
+  def report(self):
+    ''' Returns:
+          JSON serializable dict. Times are in seconds, 'parse' is the
+          time of the LR driver alone, without 'lex' and 'actions'.
+    '''
+    phases = dict(self.phases)
+    parse_total = phases.get('parse', 0.0)
+    if 'parse' in phases:
+      phases['parse'] -= phases.get('lex', 0.0) + phases.get('actions', 0.0)
+
+    return {
+      'phases': phases,
+      'total': sum(phases.values()),
+      'tokens': self.tokens,
+      'tokens_per_sec': self.tokens / phases['lex'] if phases.get('lex') else None,
+      'reductions': self.reductions,
+      'reductions_per_sec': self.reductions / parse_total if parse_total else None,
+      'visits': dict(self.visits.most_common()),
+      'constant_pool': self.generator.pool_stats() if self.generator else None,
+      'constant_folding': self.folder.stats() if self.folder else None,
+      'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+class NullProfiler(object):
+  ''' Stand-in used when profiling is off '''
+
+  def phase(self, name):
+    return nullcontext()
+
+  def attach_parser(self, parser):
+    pass
+
+  def attach_generator(self, generator):
+    pass
+
+  def attach_folder(self, folder):
+    pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def peak_rss_kb():
+  ''' Peak resident set size of the process in KiB, None if unknown '''
+  if resource is None:
+    return None
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # macOS reports bytes, Linux KiB
+  return peak // 1024 if sys.platform == 'darwin' else peak
@@ -2,8 +2,13 @@ from llvmlite import binding
 import os
 import logging
 import traceback
+import sys
+import json
+import time
 import argparse
 from .compiler import Compiler
+from .components.profiler import Profiler
+from .batch import EMIT_KINDS, find_sources, compile_batch
 
 parser = argparse.ArgumentParser('C Compiler')
 parser.add_argument('--verbose', default=0, help='Verbosity mode')
@@ -13,41 +18,120 @@ parser.add_argument('--test_dir', default='./coursework/tests',
                     help='Directory containing test code')
 parser.add_argument('--out_dir', default='./coursework/out',
                     help='Directory containing output')
+parser.add_argument('--opt_level', type=int, default=0, choices=[0, 1, 2, 3],
+                    help='Optimization level of the generated LLVM IR')
+parser.add_argument('--emit', default='ll', choices=list(EMIT_KINDS),
+                    help='Output written to out_dir: LLVM IR, object file or shared library')
+parser.add_argument('--cache_dir', default=None,
+                    help='Directory of the compile cache in batch mode, '
+                         'disabled if not given')
+parser.add_argument('--profile', nargs='?', const='-', default=None,
+                    help='Write per-phase timings and counters as JSON to the '
+                         'given file, or to stdout after the run, ignored '
+                         'in batch mode')
+parser.add_argument('--stream', action='store_true',
+                    help='Read sources in chunks while parsing, for very large '
+                         'files, ignored in batch mode')
+parser.add_argument('--batch', action='store_true',
+                    help='Compile every file of test_dir in parallel, without running')
+parser.add_argument('--jobs', type=int, default=None,
+                    help='Number of worker processes in batch mode')
+parser.add_argument('--codegen_jobs', type=int, default=1,
+                    help='Number of processes generating the function bodies '
+                         'of a file, ignored in batch mode')
+parser.add_argument('--no_fold', dest='fold', action='store_false',
+                    help='Generate code for constant expressions instead of '
+                         'folding them')
 
 args = parser.parse_args()
+# The files shown and run one by one are always compiled
+if args.cache_dir and not args.batch:
+  parser.error('--cache_dir requires --batch')
+
+
+def run_batch(files):
+  ''' Compile files in parallel and print the outcome of each
+      Returns:
+        Number of files that failed
+  '''
+  os.makedirs(args.out_dir, exist_ok=True)
+  print(f'Optimization level: -O{args.opt_level}')
+  start = time.perf_counter()
+  failed = 0
+  cached = 0
+  for result in compile_batch(files, args.jobs, args.opt_level, args.emit,
+                              args.cache_dir, args.fold):
+    if result.error:
+      failed += 1
+      print(f'FAIL {result.source} ({result.time * 1e3:.1f} ms): {result.error}')
+    else:
+      cached += result.cached
+      status = 'HIT ' if result.cached else 'OK  '
+      print(f'{status} {result.output} ({result.time * 1e3:.1f} ms)')
+  print(f'\n{len(files) - failed} compiled ({cached} from cache), {failed} failed '
+        f'in {time.perf_counter() - start:.2f} s')
+  return failed
 
 
 if __name__ == '__main__':
-  files = [(f'{args.test_dir}\{file}', f'{args.out_dir}\{file[:-2]}.ll')
-           for file in os.listdir(args.test_dir)
-           if file.endswith('.c')]
+  files = find_sources(args.test_dir, args.out_dir)
+
+  if args.batch:
+    failed = run_batch(files)
+    raise SystemExit(1 if failed else 0)
 
-  compiler = Compiler()
+  profiler = Profiler() if args.profile else None
+  profiles = []
+  compiler = Compiler(opt_level=args.opt_level, profiler=profiler,
+                      codegen_workers=args.codegen_jobs, fold=args.fold)
+  print(f'Optimization level: -O{compiler.opt_level}')
 
   # ERROR:
   # int: handle ull ul ll ...
   # ptr handle is still shit
   # Init string with [], [n] is shit
   # Global Struct default initializer not done
-  files = [(args.test_dir+'\prog_sort.c',
-            args.out_dir+'\prog_sort.ll')]
+  files = [(os.path.join(args.test_dir, 'prog_sort.c'),
+            os.path.join(args.out_dir, 'prog_sort.ll'))]
   for (fi, fo) in files:
     print(fi)
+    if profiler:
+      profiler.reset()
     try:
-      ast = compiler.parse_file(fi, verbose=args.verbose)
+      ast = compiler.parse_file(fi, verbose=args.verbose, stream=args.stream)
       if args.show_ast:
         print(f'\n----------------------AST----------------------\n')
         ast.show()
         print('--------------------END AST--------------------\n')
 
       gen_code = compiler.gen_llvm_ir(fo, ast)
+      if compiler.folder:
+        print(f'Constant folding: {compiler.folder.stats()}')
       if args.show_llvm:
         print(f'\n--------------------LLVM IR--------------------\n')
         print(gen_code)
         print('------------------END LLVM IR------------------\n')
 
+      if args.emit == 'obj':
+        compiler.emit_object(gen_code, os.path.splitext(fo)[0] + '.o')
+      elif args.emit == 'so':
+        gen_code = compiler.emit_shared(gen_code, os.path.splitext(fo)[0] + '.so')
+
       print(f'\nRESULT:')
-      compiler.run(fo)
+      compiler.run(gen_code)
 
     except Exception as e:
       logging.error(traceback.format_exc())
+
+    if profiler:
+      profiles.append({'file': fi, 'opt_level': args.opt_level,
+                       **profiler.report()})
+
+  if profiler:
+    if args.profile == '-':
+      print(f'\n--------------------PROFILE--------------------\n')
+      json.dump(profiles, sys.stdout, indent=2)
+      print()
+    else:
+      with open(args.profile, mode='w', encoding='utf-8') as f:
+        json.dump(profiles, f, indent=2)
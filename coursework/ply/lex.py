@@ -39,6 +39,11 @@ import types
 import copy
 import os
 import inspect
+import pickle
+import hashlib
+import codecs
+
+__tabversion__ = '2022.01.02-1'
 
 # This tuple contains acceptable string types
 StringTypes = (str, bytes)
@@ -118,6 +123,8 @@ class Lexer:
         self.lexliterals = ''         # Literal characters that can be passed through
         self.lexmodule = None         # Module
         self.lineno = 1               # Current line number
+        self.lexstream = None         # Stream read by stream_token()
+        self.lexoffset = 0            # Position of lexdata[0] in the stream
 
     def clone(self, object=None):
         c = copy.copy(self)
@@ -146,6 +153,95 @@ class Lexer:
             c.lexmodule = object
         return c
 
+    # ------------------------------------------------------------
+    # writetab() - Write lexer information to a table file
+    #
+    # Only names are stored for the rule functions.  They are looked
+    # up again on the object or module the lexer is built from when
+    # the table is read back.
+    # ------------------------------------------------------------
+    def writetab(self, filename, signature=''):
+        tabre = {}
+        for statename, lre in self.lexstatere.items():
+            titem = []
+            for (pat, func), retext, renames in zip(lre, self.lexstateretext[statename], self.lexstaterenames[statename]):
+                titem.append((retext, _funcs_to_names(func, renames), renames))
+            tabre[statename] = titem
+
+        taberr = {}
+        for statename, ef in self.lexstateerrorf.items():
+            taberr[statename] = ef.__name__ if ef else None
+
+        tabeof = {}
+        for statename, ef in self.lexstateeoff.items():
+            tabeof[statename] = ef.__name__ if ef else None
+
+        outdir = os.path.dirname(filename)
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+        tmpname = f'{filename}.{os.getpid()}.tmp'
+        with open(tmpname, 'wb') as tf:
+            pickle.dump({
+                'tabversion': __tabversion__,
+                'signature': signature,
+                'tokens': tuple(sorted(self.lextokens)),
+                'reflags': int(self.lexreflags),
+                'literals': self.lexliterals,
+                'stateinfo': self.lexstateinfo,
+                'statere': tabre,
+                'stateignore': self.lexstateignore,
+                'stateerrorf': taberr,
+                'stateeoff': tabeof,
+            }, tf, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, filename)
+
+    # ------------------------------------------------------------
+    # readtab() - Read lexer information from a table file
+    #
+    # Returns False if the table was built from a different rule
+    # set than the one described by signature.
+    # ------------------------------------------------------------
+    def readtab(self, filename, fdict, signature=''):
+        with open(filename, 'rb') as tf:
+            lextab = pickle.load(tf)
+
+        if lextab['tabversion'] != __tabversion__:
+            raise ImportError('Inconsistent PLY version')
+        if lextab['signature'] != signature:
+            return False
+
+        self.lextokens      = set(lextab['tokens'])
+        self.lexreflags     = lextab['reflags']
+        self.lexliterals    = lextab['literals']
+        self.lextokens_all  = self.lextokens | set(self.lexliterals)
+        self.lexstateinfo   = lextab['stateinfo']
+        self.lexstateignore = lextab['stateignore']
+        self.lexstatere     = {}
+        self.lexstateretext = {}
+        for statename, lre in lextab['statere'].items():
+            titem = []
+            txtitem = []
+            nameitem = []
+            for pat, func_name, renames in lre:
+                titem.append((re.compile(pat, self.lexreflags), _names_to_funcs(func_name, fdict)))
+                txtitem.append(pat)
+                nameitem.append(renames)
+
+            self.lexstatere[statename] = titem
+            self.lexstateretext[statename] = txtitem
+            self.lexstaterenames[statename] = nameitem
+
+        self.lexstateerrorf = {}
+        for statename, ef in lextab['stateerrorf'].items():
+            self.lexstateerrorf[statename] = fdict[ef] if ef else None
+
+        self.lexstateeoff = {}
+        for statename, ef in lextab['stateeoff'].items():
+            self.lexstateeoff[statename] = fdict[ef] if ef else None
+
+        self.begin('INITIAL')
+        return True
+
     # ------------------------------------------------------------
     # input() - Push a new string into the lexer
     # ------------------------------------------------------------
@@ -153,6 +249,64 @@ class Lexer:
         self.lexdata = s
         self.lexpos = 0
         self.lexlen = len(s)
+        self.lexstream = None
+        self.lexoffset = 0
+
+    # ------------------------------------------------------------
+    # input_stream() - Read the input incrementally from a stream
+    #
+    # stream is anything with a read(n) method returning str or
+    # UTF-8 encoded bytes, such as a file or an mmap.  Tokens must
+    # then be read with stream_token().  Only complete lines are
+    # added to the buffer, so a token can only reach the end of the
+    # buffer if its rule is able to match across lines.
+    # ------------------------------------------------------------
+    def input_stream(self, stream, chunksize=1 << 20):
+        self.lexstream = stream
+        self.lexchunksize = chunksize
+        self.lexdecoder = codecs.getincrementaldecoder('utf-8')()
+        self.lexpending = ''
+        self.lexeof = False
+        self.lexoffset = 0
+        self.lexdata = self._read_lines()
+        self.lexpos = 0
+        self.lexlen = len(self.lexdata)
+
+    # ------------------------------------------------------------
+    # _read_lines() - Read the next chunk of complete lines
+    # ------------------------------------------------------------
+    def _read_lines(self):
+        data = self.lexpending
+        while True:
+            chunk = self.lexstream.read(self.lexchunksize)
+            if not chunk:
+                self.lexeof = True
+                self.lexpending = ''
+                if isinstance(chunk, bytes):
+                    data += self.lexdecoder.decode(b'', final=True)
+                return data
+            if isinstance(chunk, bytes):
+                # Multi-byte characters may be split between chunks
+                chunk = self.lexdecoder.decode(chunk)
+            data += chunk
+            cut = data.rfind('\n') + 1
+            if cut:
+                self.lexpending = data[cut:]
+                return data[:cut]
+
+    # ------------------------------------------------------------
+    # _refill() - Drop the consumed input and append more lines.
+    # Returns False at the end of the stream
+    # ------------------------------------------------------------
+    def _refill(self, lexpos):
+        if self.lexeof:
+            return False
+        rest = self.lexdata[lexpos:]
+        self.lexoffset += lexpos
+        self.lexdata = rest + self._read_lines()
+        self.lexlen = len(self.lexdata)
+        self.lexpos = 0
+        return True
 
     # ------------------------------------------------------------
     # begin() - Changes the lexing state
@@ -303,6 +457,115 @@ class Lexer:
             raise RuntimeError('No input string given with input()')
         return None
 
+    # ------------------------------------------------------------
+    # stream_token() - token() for input given to input_stream()
+    #
+    # Positions of the tokens are relative to the start of the stream.
+    # ------------------------------------------------------------
+    def stream_token(self):
+        lexpos    = self.lexpos
+        lexignore = self.lexignore
+
+        while True:
+            lexdata = self.lexdata
+            lexlen  = self.lexlen
+            if lexpos >= lexlen:
+                if self._refill(lexpos):
+                    lexpos = 0
+                    continue
+                break
+
+            if lexdata[lexpos] in lexignore:
+                lexpos += 1
+                continue
+
+            for lexre, lexindexfunc in self.lexre:
+                m = lexre.match(lexdata, lexpos)
+                if not m:
+                    continue
+
+                # The match may continue in the next chunk, read more
+                # input and retry
+                if m.end() == lexlen and not self.lexeof:
+                    self._refill(lexpos)
+                    lexpos = 0
+                    break
+
+                tok = LexToken()
+                tok.value = m.group()
+                tok.lineno = self.lineno
+                tok.lexpos = self.lexoffset + lexpos
+
+                i = m.lastindex
+                func, tok.type = lexindexfunc[i]
+
+                if not func:
+                    if tok.type:
+                        self.lexpos = m.end()
+                        return tok
+                    else:
+                        lexpos = m.end()
+                        break
+
+                lexpos = m.end()
+
+                tok.lexer = self
+                self.lexmatch = m
+                self.lexpos = lexpos
+                newtok = func(tok)
+                del tok.lexer
+                del self.lexmatch
+
+                if not newtok:
+                    lexpos    = self.lexpos
+                    lexignore = self.lexignore
+                    break
+                return newtok
+            else:
+                if lexdata[lexpos] in self.lexliterals:
+                    tok = LexToken()
+                    tok.value = lexdata[lexpos]
+                    tok.lineno = self.lineno
+                    tok.type = tok.value
+                    tok.lexpos = self.lexoffset + lexpos
+                    self.lexpos = lexpos + 1
+                    return tok
+
+                if self.lexerrorf:
+                    tok = LexToken()
+                    tok.value = lexdata[lexpos:]
+                    tok.lineno = self.lineno
+                    tok.type = 'error'
+                    tok.lexer = self
+                    tok.lexpos = self.lexoffset + lexpos
+                    self.lexpos = lexpos
+                    newtok = self.lexerrorf(tok)
+                    if lexpos == self.lexpos:
+                        raise LexError(f"Scanning error. Illegal character {lexdata[lexpos]!r}",
+                                       lexdata[lexpos:])
+                    lexpos = self.lexpos
+                    if not newtok:
+                        continue
+                    return newtok
+
+                self.lexpos = lexpos
+                raise LexError(f"Illegal character {lexdata[lexpos]!r} at index "
+                               f"{self.lexoffset + lexpos}", lexdata[lexpos:])
+
+        if self.lexeoff:
+            tok = LexToken()
+            tok.type = 'eof'
+            tok.value = ''
+            tok.lineno = self.lineno
+            tok.lexpos = self.lexoffset + lexpos
+            tok.lexer = self
+            self.lexpos = lexpos
+            newtok = self.lexeoff(tok)
+            return newtok
+
+        self.lexpos = lexpos + 1
+        return None
+
     # Iterator interface
     def __iter__(self):
         return self
@@ -340,6 +603,36 @@ def get_caller_module_dict(levels):
     f = sys._getframe(levels)
     return { **f.f_globals, **f.f_locals }
 
+# -----------------------------------------------------------------------------
+# _funcs_to_names()
+#
+# Given a list of regular expression functions, this converts it to a list
+# suitable for output to a table file
+# -----------------------------------------------------------------------------
+def _funcs_to_names(funclist, namelist):
+    result = []
+    for f, name in zip(funclist, namelist):
+        if f and f[0]:
+            result.append((name, f[1]))
+        else:
+            result.append(f)
+    return result
+
+# -----------------------------------------------------------------------------
+# _names_to_funcs()
+#
+# Given a list of regular expression function names, this converts it back to
+# functions.
+# -----------------------------------------------------------------------------
+def _names_to_funcs(namelist, fdict):
+    result = []
+    for n in namelist:
+        if n and n[0]:
+            result.append((fdict[n[0]], n[1]))
+        else:
+            result.append(n)
+    return result
+
 # -----------------------------------------------------------------------------
 # _form_master_re()
 #
@@ -434,6 +727,25 @@ class LexerReflect(object):
         self.validate_rules()
         return self.error
 
+    # Compute a hash over the rule set.  Everything that ends up in the
+    # master regular expressions or in the lexer tables is part of it
+    def signature(self):
+        parts = [repr(self.reflags), repr(list(self.tokens)), repr(self.literals),
+                 repr(sorted(self.stateinfo.items()))]
+        try:
+            for state in sorted(self.stateinfo):
+                parts.append(state)
+                for fname, f in self.funcsym[state]:
+                    parts.append('%s=%s' % (fname, _get_regex(f)))
+                for name, r in self.strsym[state]:
+                    parts.append('%s=%s' % (name, r))
+                parts.append(repr(self.ignore.get(state)))
+                parts.append(repr(getattr(self.errorf.get(state), '__name__', None)))
+                parts.append(repr(getattr(self.eoff.get(state), '__name__', None)))
+        except (AttributeError, KeyError):
+            pass
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
     # Get the tokens map
     def get_tokens(self):
         tokens = self.ldict.get('tokens', None)
@@ -714,8 +1026,8 @@ class LexerReflect(object):
 #
 # Build all of the regular expression rules from definitions in the supplied module
 # -----------------------------------------------------------------------------
-def lex(*, module=None, object=None, debug=False, 
-        reflags=int(re.VERBOSE), debuglog=None, errorlog=None):
+def lex(*, module=None, object=None, debug=False,
+        reflags=int(re.VERBOSE), debuglog=None, errorlog=None, lextab=None):
 
     global lexer
 
@@ -748,6 +1060,23 @@ def lex(*, module=None, object=None, debug=False,
     # Collect parser information from the dictionary
     linfo = LexerReflect(ldict, log=errorlog, reflags=reflags)
     linfo.get_all()
+
+    # Reuse the table file if it was written for the very same rule set.
+    # This skips validation and only compiles the master regular expressions
+    signature = linfo.signature()
+    if lextab and not debug and not linfo.error:
+        try:
+            if lexobj.readtab(lextab, ldict, signature):
+                token = lexobj.token
+                input = lexobj.input
+                lexer = lexobj
+                return lexobj
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            errorlog.warning("There was a problem loading the table file: %r", e)
+        lexobj = Lexer()
+
     if linfo.validate_all():
         raise SyntaxError("Can't build lexer")
 
@@ -845,6 +1174,13 @@ def lex(*, module=None, object=None, debug=False,
             if s not in linfo.ignore:
                 linfo.ignore[s] = linfo.ignore.get('INITIAL', '')
 
+    # Write the table file for the next run
+    if lextab:
+        try:
+            lexobj.writetab(lextab, signature)
+        except IOError as e:
+            errorlog.warning("Couldn't write lextab %r. %s" % (lextab, e))
+
     # Create global versions of the token() and input() functions
     token = lexobj.token
     input = lexobj.input
@@ -64,7 +64,12 @@
 import re
 import types
 import sys
+import os
 import inspect
+import pickle
+import json
+
+__tabversion__ = '2022.01.02-1'
 
 #-----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -231,6 +236,8 @@ class LRParser:
         self.goto = lrtab.lr_goto
         self.errorfunc = errorf
         self.set_defaulted_states()
+        self.set_dense_tables()
+        self.generated = None
         self.errorok = True
 
     def errok(self):
@@ -258,9 +265,38 @@ class LRParser:
             rules = list(actions.values())
             if len(rules) == 1 and rules[0] < 0:
                 self.defaulted_states[state] = rules[0]
+        if getattr(self, 'dense', None):
+            self.dense.set_defaulted(self.defaulted_states)
 
     def disable_defaulted_states(self):
         self.defaulted_states = {}
+        if self.dense:
+            self.dense.set_defaulted(self.defaulted_states)
+
+    # Dense table support.
+    # parse() runs parsedense() on integer indexed copies of the action and goto
+    # tables unless debugging or tracking is requested.  disable_dense_tables()
+    # makes it always use the dictionaries, dropping the generated module that
+    # runs on the dense tables too.
+    def set_dense_tables(self):
+        self.dense = DenseTables(self.action, self.goto, self.productions,
+                                 self.defaulted_states)
+
+    def disable_dense_tables(self):
+        self.dense = None
+        self.generated = None
+
+    # Generated parser support.
+    # A module written by write_parser_module() for the tables of this parser
+    # replaces parsedense() once set with set_generated().  It uses the dense
+    # tables of the parser, built if missing.
+    def set_generated(self, module):
+        if not self.dense:
+            self.set_dense_tables()
+        self.generated = module
+
+    def disable_generated(self):
+        self.generated = None
 
     # parse().
     #
@@ -271,6 +307,12 @@ class LRParser:
     # character index.
 
     def parse(self, input=None, lexer=None, debug=False, tracking=False):
+        if not debug and not tracking:
+            if self.generated:
+                return self.generated.parse(self, input, lexer)
+            if self.dense:
+                return self.parsedense(input, lexer)
+
         # If debugging has been specified as a flag, turn it into a logging object
         if isinstance(debug, int) and debug:
             debug = PlyLogger(sys.stderr)
@@ -580,6 +622,509 @@ class LRParser:
             # If we'r here, something really bad happened
             raise RuntimeError('yacc: internal parser error!!!\n')
 
+    # parsedense().
+    #
+    # The parse() loop without debugging and tracking, on the tables of a
+    # DenseTables object.  Tokens and nonterminals are looked up as small
+    # integers in lists instead of by name in dictionaries.  Error recovery is
+    # the same as in parse().
+
+    def parsedense(self, input=None, lexer=None):
+        lookahead = None                         # Current lookahead symbol
+        lookaheadstack = []                      # Stack of lookahead symbols
+        dense = self.dense
+        actions = dense.action                   # Action rows indexed by terminal number
+        goto = dense.goto                        # Goto rows indexed by nonterminal number
+        lhs = dense.lhs                          # Nonterminal number of every production
+        defaulted = dense.defaulted              # Reduction of every defaulted state or None
+        terminal = dense.terminals.get           # Terminal number of a token type
+        unknown = dense.unknown                  # Column without actions
+        prod = self.productions                  # Local reference to production list (to avoid lookup on self.)
+        pslice = YaccProduction(None)            # Production object passed to grammar rules
+        errorcount = 0                           # Used during error recovery
+
+        # If no lexer was given, we will try to use the lex module
+        if not lexer:
+            from . import lex
+            lexer = lex.lexer
+
+        # Set up the lexer and parser objects on pslice
+        pslice.lexer = lexer
+        pslice.parser = self
+
+        # If input was supplied, pass to lexer
+        if input is not None:
+            lexer.input(input)
+
+        # Set the token function
+        get_token = self.token = lexer.token
+
+        # Set up the state and symbol stacks
+        statestack = self.statestack = []   # Stack of parsing states
+        symstack = self.symstack = []       # Stack of grammar symbols
+        pslice.stack = symstack             # Put in the production
+        errtoken   = None                   # Err token
+
+        # The start state is assumed to be (0,$end)
+
+        statestack.append(0)
+        sym = YaccSymbol()
+        sym.type = '$end'
+        symstack.append(sym)
+        state = 0
+        while True:
+            t = defaulted[state]
+            if t is None:
+                if not lookahead:
+                    if not lookaheadstack:
+                        lookahead = get_token()     # Get the next token
+                    else:
+                        lookahead = lookaheadstack.pop()
+                    if not lookahead:
+                        lookahead = YaccSymbol()
+                        lookahead.type = '$end'
+
+                # Check the action table
+                t = actions[state][terminal(lookahead.type, unknown)]
+
+            if t is not None:
+                if t > 0:
+                    # shift a symbol on the stack
+                    statestack.append(t)
+                    state = t
+                    symstack.append(lookahead)
+                    lookahead = None
+
+                    # Decrease error count on successful shift
+                    if errorcount:
+                        errorcount -= 1
+                    continue
+
+                if t < 0:
+                    # reduce a symbol on the stack, emit a production
+                    p = prod[-t]
+                    plen = p.len
+
+                    # Get production function
+                    sym = YaccSymbol()
+                    sym.type = p.name      # Production name
+                    sym.value = None
+
+                    if plen:
+                        targ = symstack[-plen-1:]
+                        targ[0] = sym
+                    else:
+                        targ = [sym]
+                    pslice.slice = targ
+
+                    try:
+                        # Call the grammar rule with our special slice object
+                        if plen:
+                            del symstack[-plen:]
+                        self.state = state
+                        p.callable(pslice)
+                        if plen:
+                            del statestack[-plen:]
+                        symstack.append(sym)
+                        state = goto[statestack[-1]][lhs[-t]]
+                        statestack.append(state)
+                    except SyntaxError:
+                        # If an error was set. Enter error recovery state
+                        lookaheadstack.append(lookahead)    # Save the current lookahead token
+                        symstack.extend(targ[1:-1])         # Put the production slice back on the stack
+                        statestack.pop()                    # Pop back one state (before the reduce)
+                        state = statestack[-1]
+                        sym.type = 'error'
+                        sym.value = 'error'
+                        lookahead = sym
+                        errorcount = error_count
+                        self.errorok = False
+
+                    continue
+
+                if t == 0:
+                    n = symstack[-1]
+                    return getattr(n, 'value', None)
+
+            if t is None:
+                # We have some kind of parsing error here, see parse()
+                if errorcount == 0 or self.errorok:
+                    errorcount = error_count
+                    self.errorok = False
+                    errtoken = lookahead
+                    if errtoken.type == '$end':
+                        errtoken = None               # End of file!
+                    if self.errorfunc:
+                        if errtoken and not hasattr(errtoken, 'lexer'):
+                            errtoken.lexer = lexer
+                        self.state = state
+                        tok = self.errorfunc(errtoken)
+                        if self.errorok:
+                            # User must have done some kind of panic
+                            # mode recovery on their own.  The
+                            # returned token is the next lookahead
+                            lookahead = tok
+                            errtoken = None
+                            continue
+                    else:
+                        if errtoken:
+                            if hasattr(errtoken, 'lineno'):
+                                lineno = lookahead.lineno
+                            else:
+                                lineno = 0
+                            if lineno:
+                                sys.stderr.write('yacc: Syntax error at line %d, token=%s\n' % (lineno, errtoken.type))
+                            else:
+                                sys.stderr.write('yacc: Syntax error, token=%s' % errtoken.type)
+                        else:
+                            sys.stderr.write('yacc: Parse error in input. EOF\n')
+                            return
+
+                else:
+                    errorcount = error_count
+
+                # case 1:  the statestack only has 1 entry on it.  The token is
+                # discarded and we just keep going.
+
+                if len(statestack) <= 1 and lookahead.type != '$end':
+                    lookahead = None
+                    errtoken = None
+                    state = 0
+                    # Nuke the pushback stack
+                    del lookaheadstack[:]
+                    continue
+
+                # case 2: the statestack has a couple of entries on it, but we're
+                # at the end of the file. nuke the top entry and generate an error token
+
+                # Start nuking entries on the stack
+                if lookahead.type == '$end':
+                    # Whoa. We're really hosed here. Bail out
+                    return
+
+                if lookahead.type != 'error':
+                    sym = symstack[-1]
+                    if sym.type == 'error':
+                        # Hmmm. Error is on top of stack, we'll just nuke input
+                        # symbol and continue
+                        lookahead = None
+                        continue
+
+                    # Create the error symbol for the first time and make it the new lookahead symbol
+                    t = YaccSymbol()
+                    t.type = 'error'
+
+                    if hasattr(lookahead, 'lineno'):
+                        t.lineno = t.endlineno = lookahead.lineno
+                    if hasattr(lookahead, 'lexpos'):
+                        t.lexpos = t.endlexpos = lookahead.lexpos
+                    t.value = lookahead
+                    lookaheadstack.append(lookahead)
+                    lookahead = t
+                else:
+                    symstack.pop()
+                    statestack.pop()
+                    state = statestack[-1]
+
+                continue
+
+            # If we'r here, something really bad happened
+            raise RuntimeError('yacc: internal parser error!!!\n')
+
+# -----------------------------------------------------------------------------
+#                               == DenseTables ==
+#
+# The action and goto tables of an LRParser with the symbols numbered by small
+# integers: terminals in the order of their names, nonterminals likewise.
+# Every state has a list of actions indexed by terminal number and a list of
+# gotos indexed by nonterminal number, None where the dictionaries have no
+# entry.  The last action column belongs to no terminal, token types the
+# grammar does not use are looked up there.
+# -----------------------------------------------------------------------------
+
+class DenseTables:
+    def __init__(self, action, goto, productions, defaulted_states=None):
+        terminals = set(['$end', 'error'])
+        for row in action.values():
+            terminals.update(row)
+        nonterminals = set(p.name for p in productions)
+        for row in goto.values():
+            nonterminals.update(row)
+
+        self.terminals = dict((name, n) for n, name in enumerate(sorted(terminals)))
+        self.nonterminals = dict((name, n) for n, name in enumerate(sorted(nonterminals)))
+        self.unknown = len(self.terminals)
+        self.nstates = max(list(action) + list(goto)) + 1 if action or goto else 0
+
+        self.action = [[None] * (self.unknown + 1) for _ in range(self.nstates)]
+        for state, row in action.items():
+            dense = self.action[state]
+            for name, t in row.items():
+                dense[self.terminals[name]] = t
+
+        self.goto = [[None] * len(self.nonterminals) for _ in range(self.nstates)]
+        for state, row in goto.items():
+            dense = self.goto[state]
+            for name, g in row.items():
+                dense[self.nonterminals[name]] = g
+
+        # Nonterminal number of the left side of every production
+        self.lhs = [self.nonterminals[p.name] for p in productions]
+        self.set_defaulted(defaulted_states or {})
+
+    # Reduction of every state in defaulted_states, None for the other states
+    def set_defaulted(self, defaulted_states):
+        self.defaulted = [None] * self.nstates
+        for state, rule in defaulted_states.items():
+            self.defaulted[state] = rule
+
+# -----------------------------------------------------------------------------
+#                            == Parser modules ==
+#
+# write_parser_module() writes the tables of an LRParser as the literals of a
+# Python module, together with a parse() function specialized for them: the
+# productions are tuples, the semantic actions are taken from the parser once
+# per parse, symbols are objects with __slots__ and there is no debugging or
+# tracking code.  read_parser_module() imports such a module if it was written
+# for the same grammar.  LRParser.set_generated() makes parse() use it.
+# -----------------------------------------------------------------------------
+
+_parser_module_code = """
+class Symbol:
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'endlineno', 'endlexpos', 'lexer')
+
+    def __str__(self):
+        return self.type
+
+    def __repr__(self):
+        return str(self)
+
+
+def parse(parser, input=None, lexer=None):
+    lookahead = None                         # Current lookahead symbol
+    lookaheadstack = []                      # Stack of lookahead symbols
+    actions = action
+    terminal = terminals.get
+    # Read at every parse, set_defaulted_states() and disable_defaulted_states()
+    # change them
+    defaulted = parser.dense.defaulted
+    # (length, name, lhs, semantic action) of the production of every
+    # reduce action t, at reductions[t].  The actions are taken from the
+    # parser at every parse as they may be replaced after the module loaded
+    reductions = [(plen, name, lhs, p.callable)
+                  for (plen, name, lhs), p in zip(rules, parser.productions)][:0:-1]
+    pslice = YaccProduction(None)            # Production object passed to grammar rules
+    errorcount = 0                           # Used during error recovery
+
+    if not lexer:
+        from coursework.ply import lex
+        lexer = lex.lexer
+
+    pslice.lexer = lexer
+    pslice.parser = parser
+
+    if input is not None:
+        lexer.input(input)
+
+    get_token = parser.token = lexer.token
+
+    statestack = parser.statestack = []
+    symstack = parser.symstack = []
+    pslice.stack = symstack
+    errtoken = None
+
+    statestack.append(0)
+    sym = Symbol()
+    sym.type = '$end'
+    symstack.append(sym)
+    state = 0
+    while True:
+        t = defaulted[state]
+        if t is None:
+            if not lookahead:
+                if not lookaheadstack:
+                    lookahead = get_token()
+                else:
+                    lookahead = lookaheadstack.pop()
+                if not lookahead:
+                    lookahead = Symbol()
+                    lookahead.type = '$end'
+            t = actions[state][terminal(lookahead.type, unknown)]
+
+        if t is not None:
+            if t > 0:
+                statestack.append(t)
+                state = t
+                symstack.append(lookahead)
+                lookahead = None
+                if errorcount:
+                    errorcount -= 1
+                continue
+
+            if t < 0:
+                plen, name, lhs, func = reductions[t]
+                sym = Symbol()
+                sym.type = name
+                sym.value = None
+
+                if plen:
+                    targ = symstack[-plen-1:]
+                    targ[0] = sym
+                else:
+                    targ = [sym]
+                pslice.slice = targ
+
+                try:
+                    if plen:
+                        del symstack[-plen:]
+                    parser.state = state
+                    func(pslice)
+                    if plen:
+                        del statestack[-plen:]
+                    symstack.append(sym)
+                    state = goto[statestack[-1]][lhs]
+                    statestack.append(state)
+                except SyntaxError:
+                    lookaheadstack.append(lookahead)
+                    symstack.extend(targ[1:-1])
+                    statestack.pop()
+                    state = statestack[-1]
+                    sym.type = 'error'
+                    sym.value = 'error'
+                    lookahead = sym
+                    errorcount = error_count
+                    parser.errorok = False
+
+                continue
+
+            if t == 0:
+                return getattr(symstack[-1], 'value', None)
+
+        # Error recovery, like in LRParser.parse()
+        if errorcount == 0 or parser.errorok:
+            errorcount = error_count
+            parser.errorok = False
+            errtoken = lookahead
+            if errtoken.type == '$end':
+                errtoken = None
+            if parser.errorfunc:
+                if errtoken and not hasattr(errtoken, 'lexer'):
+                    errtoken.lexer = lexer
+                parser.state = state
+                tok = parser.errorfunc(errtoken)
+                if parser.errorok:
+                    lookahead = tok
+                    errtoken = None
+                    continue
+            else:
+                if errtoken:
+                    lineno = getattr(lookahead, 'lineno', 0)
+                    if lineno:
+                        sys.stderr.write('yacc: Syntax error at line %d, token=%s\\n' % (lineno, errtoken.type))
+                    else:
+                        sys.stderr.write('yacc: Syntax error, token=%s' % errtoken.type)
+                else:
+                    sys.stderr.write('yacc: Parse error in input. EOF\\n')
+                    return
+        else:
+            errorcount = error_count
+
+        if len(statestack) <= 1 and lookahead.type != '$end':
+            lookahead = None
+            errtoken = None
+            state = 0
+            del lookaheadstack[:]
+            continue
+
+        if lookahead.type == '$end':
+            return
+
+        if lookahead.type != 'error':
+            sym = symstack[-1]
+            if sym.type == 'error':
+                lookahead = None
+                continue
+
+            t = Symbol()
+            t.type = 'error'
+            if hasattr(lookahead, 'lineno'):
+                t.lineno = t.endlineno = lookahead.lineno
+            if hasattr(lookahead, 'lexpos'):
+                t.lexpos = t.endlexpos = lookahead.lexpos
+            t.value = lookahead
+            lookaheadstack.append(lookahead)
+            lookahead = t
+        else:
+            symstack.pop()
+            statestack.pop()
+            state = statestack[-1]
+"""
+
+# Version of the code of the generated parser modules, modules of another
+# version are rewritten
+_parser_module_version = 2
+
+def _literal_rows(rows):
+    return '[\n' + ''.join('    %r,\n' % (row,) for row in rows) + ']'
+
+# Write the tables of parser to filename as a module for read_parser_module().
+# The file is written to a temporary name first and then moved into place
+def write_parser_module(parser, filename, signature=''):
+    dense = parser.dense or DenseTables(parser.action, parser.goto, parser.productions,
+                                        parser.defaulted_states)
+    rules = [(p.len, p.name, lhs) for p, lhs in zip(parser.productions, dense.lhs)]
+
+    outdir = os.path.dirname(filename)
+    if outdir:
+        os.makedirs(outdir, exist_ok=True)
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmpname, 'w') as outf:
+        outf.write('# Generated by PLY from the LR tables of a grammar, rewritten whenever\n'
+                   '# the grammar changes.  Do not edit.\n')
+        outf.write('import sys\n')
+        outf.write('from %s import YaccProduction, error_count\n\n' % __name__)
+        outf.write('tabversion = %r\n' % __tabversion__)
+        outf.write('moduleversion = %d\n' % _parser_module_version)
+        outf.write('signature = %r\n\n' % signature)
+        outf.write('terminals = %r\n' % dense.terminals)
+        outf.write('unknown = %d\n' % dense.unknown)
+        outf.write('# (length, name, left side nonterminal number) of every production\n')
+        outf.write('rules = %s\n' % _literal_rows(rules))
+        outf.write('action = %s\n' % _literal_rows(dense.action))
+        outf.write('goto = %s\n' % _literal_rows(dense.goto))
+        outf.write(_parser_module_code.replace('from coursework.ply import lex',
+                                               'from %s import lex' % __package__))
+    os.replace(tmpname, filename)
+
+# Modules read by read_parser_module(), by file name, with the modification
+# time and size of the file they were read from
+_parser_modules = {}
+
+# Import the module written by write_parser_module() to filename.  Returns None
+# if there is no such file or it was written by a different version of this
+# module or of the module code, or for a different grammar signature
+def read_parser_module(filename, signature=''):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _parser_modules.get(filename)
+    if cached and cached[0] == stamp:
+        module = cached[1]
+    else:
+        import importlib.util
+        name = os.path.splitext(os.path.basename(filename))[0]
+        spec = importlib.util.spec_from_file_location(name, filename)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _parser_modules[filename] = (stamp, module)
+    if getattr(module, 'tabversion', None) != __tabversion__ or \
+       getattr(module, 'moduleversion', None) != _parser_module_version or \
+       getattr(module, 'signature', None) != signature:
+        return None
+    return module
+
 # -----------------------------------------------------------------------------
 #                          === Grammar Representation ===
 #
@@ -682,6 +1227,35 @@ class Production(object):
         if self.func:
             self.callable = pdict[self.func]
 
+# -----------------------------------------------------------------------------
+# class MiniProduction:
+#
+# This class is a stripped down version of the Production class that is only
+# used when reading tables from a cached file.   It contains only the
+# information needed to run the parser.
+# -----------------------------------------------------------------------------
+
+class MiniProduction(object):
+    def __init__(self, str, name, len, func, file, line):
+        self.name     = name
+        self.len      = len
+        self.func     = func
+        self.callable = None
+        self.file     = file
+        self.line     = line
+        self.str      = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return 'MiniProduction(%s)' % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = pdict[self.func]
+
 # -----------------------------------------------------------------------------
 # class LRItem
 #
@@ -788,6 +1362,8 @@ class Grammar(object):
 
         self.Start = None           # Starting symbol for the grammar
 
+        self.Analysis = None        # GrammarAnalysis of the grammar, see analysis()
+
 
     def __len__(self):
         return len(self.Productions)
@@ -1072,53 +1648,31 @@ class Grammar(object):
 
         return unused
 
-    # -------------------------------------------------------------------------
-    # _first()
-    #
-    # Compute the value of FIRST1(beta) where beta is a tuple of symbols.
+    # -----------------------------------------------------------------------------
+    # analysis()
     #
-    # During execution of compute_first1, the result may be incomplete.
-    # Afterward (e.g., when called from compute_follow()), it will be complete.
-    # -------------------------------------------------------------------------
-    def _first(self, beta):
-
-        # We are computing First(x1,x2,x3,...,xn)
-        result = []
-        for x in beta:
-            x_produces_empty = False
-
-            # Add all the non-<empty> symbols of First[x] to the result.
-            for f in self.First[x]:
-                if f == '<empty>':
-                    x_produces_empty = True
-                else:
-                    if f not in result:
-                        result.append(f)
-
-            if x_produces_empty:
-                # We have to consider the next x in beta,
-                # i.e. stay in the loop.
-                pass
-            else:
-                # We don't have to consider any further symbols in beta.
-                break
-        else:
-            # There was no 'break' from the loop,
-            # so x_produces_empty was true for all x in beta,
-            # so beta produces empty as well.
-            result.append('<empty>')
+    # Returns the GrammarAnalysis of the grammar, computed on first use.  All of
+    # the productions must have been added and the start symbol set.
+    # -----------------------------------------------------------------------------
 
-        return result
+    def analysis(self):
+        if not self.Analysis:
+            self.Analysis = GrammarAnalysis(self)
+        return self.Analysis
 
     # -------------------------------------------------------------------------
     # compute_first()
     #
-    # Compute the value of FIRST1(X) for all symbols
+    # Compute the value of FIRST1(X) for all symbols, as lists of names taken
+    # from the bitsets of the GrammarAnalysis.  The FIRST set of a nonterminal
+    # deriving the empty string contains '<empty>'.
     # -------------------------------------------------------------------------
     def compute_first(self):
         if self.First:
             return self.First
 
+        analysis = self.analysis()
+
         # Terminals:
         for t in self.Terminals:
             self.First[t] = [t]
@@ -1126,73 +1680,29 @@ class Grammar(object):
         self.First['$end'] = ['$end']
 
         # Nonterminals:
-
-        # Initialize to the empty set:
         for n in self.Nonterminals:
-            self.First[n] = []
-
-        # Then propagate symbols until no change:
-        while True:
-            some_change = False
-            for n in self.Nonterminals:
-                for p in self.Prodnames[n]:
-                    for f in self._first(p.prod):
-                        if f not in self.First[n]:
-                            self.First[n].append(f)
-                            some_change = True
-            if not some_change:
-                break
+            self.First[n] = list(analysis.terminals_of(analysis.first[n]))
+            if n in analysis.nullable:
+                self.First[n].append('<empty>')
 
         return self.First
 
     # ---------------------------------------------------------------------
     # compute_follow()
     #
-    # Computes all of the follow sets for every non-terminal symbol.  The
-    # follow set is the set of all symbols that might follow a given
-    # non-terminal.  See the Dragon book, 2nd Ed. p. 189.
+    # Computes all of the follow sets for every non-terminal symbol, as lists
+    # of names.  The follow set is the set of all symbols that might follow a
+    # given non-terminal.  See the Dragon book, 2nd Ed. p. 189.  '$end' follows
+    # start, by default the start symbol of the grammar.
     # ---------------------------------------------------------------------
     def compute_follow(self, start=None):
         # If already computed, return the result
         if self.Follow:
             return self.Follow
 
-        # If first sets not computed yet, do that first.
-        if not self.First:
-            self.compute_first()
-
-        # Add '$end' to the follow list of the start symbol
-        for k in self.Nonterminals:
-            self.Follow[k] = []
-
-        if not start:
-            start = self.Productions[1].name
-
-        self.Follow[start] = ['$end']
-
-        while True:
-            didadd = False
-            for p in self.Productions[1:]:
-                # Here is the production set
-                for i, B in enumerate(p.prod):
-                    if B in self.Nonterminals:
-                        # Okay. We got a non-terminal in a production
-                        fst = self._first(p.prod[i+1:])
-                        hasempty = False
-                        for f in fst:
-                            if f != '<empty>' and f not in self.Follow[B]:
-                                self.Follow[B].append(f)
-                                didadd = True
-                            if f == '<empty>':
-                                hasempty = True
-                        if hasempty or i == (len(p.prod)-1):
-                            # Add elements of follow(a) to follow(b)
-                            for f in self.Follow[p.name]:
-                                if f not in self.Follow[B]:
-                                    self.Follow[B].append(f)
-                                    didadd = True
-            if not didadd:
-                break
+        analysis = GrammarAnalysis(self, start) if start else self.analysis()
+        for n in self.Nonterminals:
+            self.Follow[n] = list(analysis.terminals_of(analysis.follow[n]))
         return self.Follow
 
 
@@ -1239,6 +1749,164 @@ class Grammar(object):
                 i += 1
             p.lr_items = lr_items
 
+# -----------------------------------------------------------------------------
+#                        === GRAMMAR ANALYSIS ===
+#
+# GrammarAnalysis computes the nullable nonterminals and the FIRST and FOLLOW
+# sets of a Grammar, without building any parsing table.  The terminals are
+# numbered in the order of grammar.Terminals, followed by '$end', and sets of
+# terminals are bitsets held in Python ints, bit i standing for terminal i.
+# LRTable uses the same numbering for its lookahead sets.
+#
+#       terminals     - Names of the terminals, by number
+#       terminal_bit  - Dictionary mapping terminal names to their bit
+#       nullable      - Set of the nonterminals deriving the empty string
+#       first         - Dictionary mapping every symbol to its FIRST bitset
+#       follow        - Dictionary mapping every nonterminal to its FOLLOW bitset
+#
+# For example, the names of the terminals that may follow expr are
+#
+#       analysis = grammar.analysis()
+#       list(analysis.terminals_of(analysis.follow['expr']))
+#
+# The FIRST and FOLLOW sets are computed with digraph(), as the sets are
+# unions over relations between nonterminals:
+#
+#       FIRST(A)  = { a | A -> N a ... } U U{ FIRST(B) | A -> N B ... }
+#       FOLLOW(B) = U{ FIRST(beta) | A -> ... B beta } U U{ FOLLOW(A) | A -> ... B N }
+#
+# where N is a sequence of nullable nonterminals.
+# -----------------------------------------------------------------------------
+
+class GrammarAnalysis(object):
+    def __init__(self, grammar, start=None):
+        self.grammar = grammar
+        self.start = start or grammar.Start or grammar.Productions[1].name
+
+        self.terminals = list(grammar.Terminals) + ['$end']
+        self.terminal_bit = {}
+        for i, t in enumerate(self.terminals):
+            self.terminal_bit[t] = 1 << i
+
+        # Nonterminals are numbered for digraph()
+        self.nonterminals = list(grammar.Nonterminals)
+        self.nonterminal_index = {}
+        for i, n in enumerate(self.nonterminals):
+            self.nonterminal_index[n] = i
+
+        self.nullable = self.compute_nullable()
+        self.first = self.compute_first()
+        self.follow = self.compute_follow()
+
+    # Names of the terminals in a bitset, in terminal number order
+    def terminals_of(self, bits):
+        names = self.terminals
+        while bits:
+            low = bits & -bits
+            yield names[low.bit_length() - 1]
+            bits ^= low
+
+    # Bitset of FIRST(symbols lookahead), lookahead being a bitset of the
+    # terminals that may follow symbols
+    def first_of(self, symbols, lookahead=0):
+        first = self.first
+        nullable = self.nullable
+        bits = 0
+        for s in symbols:
+            bits |= first[s]
+            if s not in nullable:
+                return bits
+        return bits | lookahead
+
+    # -------------------------------------------------------------------------
+    # compute_nullable()
+    #
+    # Returns the set of the nonterminals deriving the empty string.  Every
+    # production counts its symbols not yet known to be nullable, and its
+    # nonterminal becomes nullable when the count drops to 0.
+    # -------------------------------------------------------------------------
+    def compute_nullable(self):
+        productions = self.grammar.Productions[1:]
+        pending = []                  # Count of every production
+        waiting = {}                  # Productions using every symbol
+        work = []                     # Nonterminals found nullable
+        for i, p in enumerate(productions):
+            pending.append(p.len)
+            for s in p.prod:
+                waiting.setdefault(s, []).append(i)
+            if not p.len:
+                work.append(p.name)
+
+        nullable = set()
+        while work:
+            n = work.pop()
+            if n in nullable:
+                continue
+            nullable.add(n)
+            for i in waiting.get(n, ()):
+                pending[i] -= 1
+                if not pending[i]:
+                    work.append(productions[i].name)
+        return nullable
+
+    # -------------------------------------------------------------------------
+    # compute_first()
+    #
+    # Returns the dictionary of the FIRST bitsets of all symbols.
+    # -------------------------------------------------------------------------
+    def compute_first(self):
+        terminal_bit = self.terminal_bit
+        index = self.nonterminal_index
+        nullable = self.nullable
+
+        direct = [0] * len(index)
+        R = [[] for _ in index]
+        for p in self.grammar.Productions[1:]:
+            x = index[p.name]
+            for s in p.prod:
+                bit = terminal_bit.get(s)
+                if bit is not None:
+                    direct[x] |= bit
+                    break
+                R[x].append(index[s])
+                if s not in nullable:
+                    break
+
+        first = dict(terminal_bit)
+        first.update(zip(self.nonterminals, digraph(len(index), R, direct)))
+        return first
+
+    # -------------------------------------------------------------------------
+    # compute_follow()
+    #
+    # Returns the dictionary of the FOLLOW bitsets of the nonterminals.
+    # -------------------------------------------------------------------------
+    def compute_follow(self):
+        index = self.nonterminal_index
+        first = self.first
+        nullable = self.nullable
+
+        direct = [0] * len(index)
+        R = [[] for _ in index]
+        direct[index[self.start]] = self.terminal_bit['$end']
+        for p in self.grammar.Productions[1:]:
+            lhs = index[p.name]
+            rest = 0                  # FIRST of the symbols after s
+            rest_nullable = True
+            for s in reversed(p.prod):
+                x = index.get(s)
+                if x is not None:
+                    direct[x] |= rest
+                    if rest_nullable:
+                        R[x].append(lhs)
+                if s in nullable:
+                    rest |= first[s]
+                else:
+                    rest = first[s]
+                    rest_nullable = False
+
+        return dict(zip(self.nonterminals, digraph(len(index), R, direct)))
+
 # -----------------------------------------------------------------------------
 #                           === LR Generator ===
 #
@@ -1248,54 +1916,78 @@ class Grammar(object):
 
 # -----------------------------------------------------------------------------
 # digraph()
-# traverse()
 #
-# The following two functions are used to compute set valued functions
-# of the form:
+# The following function is used to compute set valued functions of the form:
 #
 #     F(x) = F'(x) U U{F(y) | x R y}
 #
 # This is used to compute the values of Read() sets as well as FOLLOW sets
-# in LALR(1) generation.
+# in LALR(1) generation.  The elements x are the numbers 0 .. n-1 and the sets
+# are bitsets held in Python ints.  The traversal keeps its own stack instead
+# of recursing, so long chains of relations don't hit the recursion limit.
 #
-# Inputs:  X    - An input set
-#          R    - A relation
-#          FP   - Set-valued function
+# Inputs:  n    - Number of elements
+#          R    - Relation, R[x] is the list of the y with x R y
+#          FP   - Set-valued function, FP[x] is the bitset F'(x)
 # ------------------------------------------------------------------------------
 
-def digraph(X, R, FP):
-    N = {}
-    for x in X:
-        N[x] = 0
+def digraph(n, R, FP):
+    F = list(FP)
+    N = [0] * n
     stack = []
-    F = {}
-    for x in X:
-        if N[x] == 0:
-            traverse(x, N, stack, F, X, R, FP)
+    for x in range(n):
+        if N[x]:
+            continue
+        stack.append(x)
+        N[x] = len(stack)
+        path = [(x, N[x], iter(R[x]))]     # Elements being traversed
+        while path:
+            x, d, rel = path[-1]
+            for y in rel:
+                if N[y] == 0:
+                    stack.append(y)
+                    N[y] = len(stack)
+                    path.append((y, N[y], iter(R[y])))
+                    break
+                N[x] = min(N[x], N[y])
+                F[x] |= F[y]
+            else:
+                path.pop()
+                if N[x] == d:
+                    # x is the root of a strongly connected component, all
+                    # its elements share the same set
+                    while True:
+                        element = stack.pop()
+                        N[element] = MAXINT
+                        F[element] = F[x]
+                        if element == x:
+                            break
+                if path:
+                    y = path[-1][0]
+                    N[y] = min(N[y], N[x])
+                    F[y] |= F[x]
     return F
 
-def traverse(x, N, stack, F, X, R, FP):
-    stack.append(x)
-    d = len(stack)
-    N[x] = d
-    F[x] = FP(x)             # F(X) <- F'(x)
-
-    rel = R(x)               # Get y's related to x
-    for y in rel:
-        if N[y] == 0:
-            traverse(y, N, stack, F, X, R, FP)
-        N[x] = min(N[x], N[y])
-        for a in F.get(y, []):
-            if a not in F[x]:
-                F[x].append(a)
-    if N[x] == d:
-        N[stack[-1]] = MAXINT
-        F[stack[-1]] = F[x]
-        element = stack.pop()
-        while element != x:
-            N[stack[-1]] = MAXINT
-            F[stack[-1]] = F[x]
-            element = stack.pop()
+# -----------------------------------------------------------------------------
+# weakly_compatible()
+#
+# Pager's weak compatibility test of two LR(1) states with the same kernel.
+# a and b are the lookahead bitsets of the kernel items, in kernel order.  The
+# states may be merged if merging can't make a reduce/reduce conflict that
+# neither of them has: for any two items i and j, the lookaheads shared
+# across the states must already be shared within one of them.
+# -----------------------------------------------------------------------------
+
+def weakly_compatible(a, b):
+    if a == b:
+        return True
+    n = len(a)
+    for i in range(n):
+        for j in range(i + 1, n):
+            if (a[i] & b[j]) or (b[i] & a[j]):
+                if not ((a[i] & a[j]) or (b[i] & b[j])):
+                    return False
+    return True
 
 class LALRError(YaccError):
     pass
@@ -1306,11 +1998,29 @@ class LALRError(YaccError):
 #
 # This class implements the LR table generation algorithm.  There are no
 # public methods.
+#
+# The LR items of the grammar are numbered, the items of a production being
+# consecutive numbers, and handled as ints throughout: a state is the list
+# of the numbers of the items in its closure, and its transitions are a dict
+# mapping every grammar symbol to the number of the state it leads to.
+# Lookahead sets are bitsets indexed by terminal number.
+#
+# The table construction method is one of:
+#
+#     'LALR'   - LALR(1), the LR(0) states with DeRemer and Pennello lookaheads
+#     'LR1'    - Canonical LR(1), a state per kernel and kernel lookaheads
+#     'PAGER'  - Minimal LR(1), the canonical LR(1) states merged by Pager's
+#                weak compatibility
 # -----------------------------------------------------------------------------
 
+LR_METHODS = ('LALR', 'LR1', 'PAGER')
+
 class LRTable:
-    def __init__(self, grammar, log=None):
+    def __init__(self, grammar, log=None, method='LALR'):
+        if method not in LR_METHODS:
+            raise LALRError('Unsupported method %r' % method)
         self.grammar = grammar
+        self.lr_method = method
 
         # Set up the logger
         if not log:
@@ -1321,23 +2031,20 @@ class LRTable:
         self.lr_action     = {}        # Action table
         self.lr_goto       = {}        # Goto table
         self.lr_productions  = grammar.Productions    # Copy of grammar Production array
-        self.lr_goto_cache = {}        # Cache of computed gotos
-        self.lr0_cidhash   = {}        # Cache of closures
-
-        self._add_count    = 0         # Internal counter used to detect cycles
 
         # Diagnostic information filled in by the table generator
         self.sr_conflict   = 0
         self.rr_conflict   = 0
-        self.conflicts     = []        # List of conflicts
+        self.conflicts     = []        # Conflict records, see conflict_report()
+        self.conflict_states = {}      # Items of the states with conflicts
 
         self.sr_conflicts  = []
         self.rr_conflicts  = []
 
         # Build the tables
         self.grammar.build_lritems()
-        self.grammar.compute_first()
-        self.grammar.compute_follow()
+        self.analysis = grammar.analysis()
+        self.number_items()
         self.lr_parse_table()
 
     # Bind all production function names to callable objects in pdict
@@ -1345,96 +2052,99 @@ class LRTable:
         for p in self.lr_productions:
             p.bind(pdict)
 
-    # Compute the LR(0) closure operation on I, where I is a set of LR(0) items.
-
-    def lr0_closure(self, I):
-        self._add_count += 1
-
-        # Add everything in I to J
-        J = I[:]
-        didadd = True
-        while didadd:
-            didadd = False
-            for j in J:
-                for x in j.lr_after:
-                    if getattr(x, 'lr0_added', 0) == self._add_count:
-                        continue
-                    # Add B --> .G to J
-                    J.append(x.lr_next)
-                    x.lr0_added = self._add_count
-                    didadd = True
+    # -----------------------------------------------------------------------------
+    # number_items()
+    #
+    # Numbers the LR items built by Grammar.build_lritems().  Item i is described
+    # by the following lists:
+    #
+    #       lr_items[i]   - The LRItem, for printing
+    #       item_prod[i]  - Number of its production
+    #       item_sym[i]   - Grammar symbol right after the ".", None at the end
+    #
+    # Item i+1 is the item after i in the same production, unless item_sym[i]
+    # is None.  prod_items[n] lists the first items of the productions of the
+    # nonterminal n, in grammar order.
+    # -----------------------------------------------------------------------------
 
+    def number_items(self):
+        self.lr_items = []
+        self.item_prod = []
+        self.item_sym = []
+        self.prod_start = []          # Number of the first item of every production
+        for p in self.grammar.Productions:
+            self.prod_start.append(len(self.lr_items))
+            for item in p.lr_items:
+                self.lr_items.append(item)
+                self.item_prod.append(p.number)
+                self.item_sym.append(p.prod[item.lr_index] if item.lr_index < p.len else None)
+
+        self.prod_items = {}
+        for n, prods in self.grammar.Prodnames.items():
+            self.prod_items[n] = [self.prod_start[p.number] for p in prods]
+
+    # Compute the LR(0) closure of the list of items kernel.  The items added
+    # for a nonterminal are those of all of its productions, each nonterminal
+    # being expanded once, in the order it is met
+
+    def lr0_closure(self, kernel):
+        item_sym = self.item_sym
+        prod_items = self.prod_items
+        added = set()
+        J = list(kernel)
+        for i in J:                   # J grows while being walked
+            x = item_sym[i]
+            if x in prod_items and x not in added:
+                added.add(x)
+                J.extend(prod_items[x])
         return J
 
-    # Compute the LR(0) goto function goto(I,X) where I is a set
-    # of LR(0) items and X is a grammar symbol.   This function is written
-    # in a way that guarantees uniqueness of the generated goto sets
-    # (i.e. the same goto set will never be returned as two different Python
-    # objects).  With uniqueness, we can later do fast set comparisons using
-    # id(obj) instead of element-wise comparison.
-
-    def lr0_goto(self, I, x):
-        # First we look for a previously cached entry
-        g = self.lr_goto_cache.get((id(I), x))
-        if g:
-            return g
-
-        # Now we generate the goto set in a way that guarantees uniqueness
-        # of the result
-
-        s = self.lr_goto_cache.get(x)
-        if not s:
-            s = {}
-            self.lr_goto_cache[x] = s
-
-        gs = []
-        for p in I:
-            n = p.lr_next
-            if n and n.lr_before == x:
-                s1 = s.get(id(n))
-                if not s1:
-                    s1 = {}
-                    s[id(n)] = s1
-                gs.append(n)
-                s = s1
-        g = s.get('$end')
-        if not g:
-            if gs:
-                g = self.lr0_closure(gs)
-                s['$end'] = g
-            else:
-                s['$end'] = gs
-        self.lr_goto_cache[(id(I), x)] = g
-        return g
+    # Compute the LR(0) sets of items and their transitions.  Returns the list
+    # of states, each a list of item numbers, and the list of their transition
+    # dicts.  A state is identified by its kernel, the items reached by the
+    # transition in the order of the items they come from.  The states are
+    # numbered in order of discovery, the transitions of a state being visited
+    # in the order their symbols first appear in the productions of its items
 
-    # Compute the LR(0) sets of item function
     def lr0_items(self):
-        C = [self.lr0_closure([self.grammar.Productions[0].lr_next])]
-        i = 0
-        for I in C:
-            self.lr0_cidhash[id(I)] = i
-            i += 1
+        item_prod = self.item_prod
+        item_sym = self.item_sym
+        usyms = [p.usyms for p in self.grammar.Productions]
+
+        C = [self.lr0_closure([self.prod_start[0]])]
+        kernels = {(self.prod_start[0],): 0}
+        transitions = []
 
-        # Loop over the items in C and each grammar symbols
         i = 0
         while i < len(C):
             I = C[i]
             i += 1
 
-            # Collect all of the symbols that could possibly be in the goto(I,X) sets
-            asyms = {}
-            for ii in I:
-                for s in ii.usyms:
-                    asyms[s] = None
+            # Kernel of the goto set of every symbol following a "."
+            gotos = {}
+            for item in I:
+                x = item_sym[item]
+                if x is not None:
+                    kernel = gotos.get(x)
+                    if kernel is None:
+                        gotos[x] = [item + 1]
+                    else:
+                        kernel.append(item + 1)
 
-            for x in asyms:
-                g = self.lr0_goto(I, x)
-                if not g or id(g) in self.lr0_cidhash:
+            trans = {}
+            for x in dict.fromkeys([s for item in I for s in usyms[item_prod[item]]]):
+                kernel = gotos.get(x)
+                if kernel is None:
                     continue
-                self.lr0_cidhash[id(g)] = len(C)
-                C.append(g)
+                kernel = tuple(kernel)
+                j = kernels.get(kernel)
+                if j is None:
+                    j = kernels[kernel] = len(C)
+                    C.append(self.lr0_closure(kernel))
+                trans[x] = j
+            transitions.append(trans)
 
-        return C
+        return C, transitions
 
     # -----------------------------------------------------------------------------
     #                       ==== LALR(1) Parsing ====
@@ -1444,9 +2154,9 @@ class LRTable:
     # lookahead set that incorporates the state of the LR(0) machine is utilized.
     # Thus, we mainly just have to focus on calculating the lookahead sets.
     #
-    # The method used here is due to DeRemer and Pennelo (1982).
+    # The method used here is due to DeRemer and Pennello (1982).
     #
-    # DeRemer, F. L., and T. J. Pennelo: "Efficient Computation of LALR(1)
+    # DeRemer, F. L., and T. J. Pennello: "Efficient Computation of LALR(1)
     #     Lookahead Sets", ACM Transactions on Programming Languages and Systems,
     #     Vol. 4, No. 4, Oct. 1982, pp. 615-649
     #
@@ -1458,99 +2168,54 @@ class LRTable:
     # -----------------------------------------------------------------------------
 
     # -----------------------------------------------------------------------------
-    # compute_nullable_nonterminals()
-    #
-    # Creates a dictionary containing all of the non-terminals that might produce
-    # an empty production.
-    # -----------------------------------------------------------------------------
-
-    def compute_nullable_nonterminals(self):
-        nullable = set()
-        num_nullable = 0
-        while True:
-            for p in self.grammar.Productions[1:]:
-                if p.len == 0:
-                    nullable.add(p.name)
-                    continue
-                for t in p.prod:
-                    if t not in nullable:
-                        break
-                else:
-                    nullable.add(p.name)
-            if len(nullable) == num_nullable:
-                break
-            num_nullable = len(nullable)
-        return nullable
-
-    # -----------------------------------------------------------------------------
-    # find_nonterminal_trans(C)
+    # find_nonterminal_transitions()
     #
-    # Given a set of LR(0) items, this functions finds all of the non-terminal
-    # transitions.    These are transitions in which a dot appears immediately before
-    # a non-terminal.   Returns a list of tuples of the form (state,N) where state
-    # is the state number and N is the nonterminal symbol.
-    #
-    # The input C is the set of LR(0) items.
+    # Numbers the non-terminal transitions of the LR(0) machine.  These are
+    # transitions in which a dot appears immediately before a non-terminal.
+    # Returns a dict mapping the tuples (state,N), where state is the state
+    # number and N is the nonterminal symbol, to their number.
     # -----------------------------------------------------------------------------
 
-    def find_nonterminal_transitions(self, C):
-        trans = []
-        for stateno, state in enumerate(C):
-            for p in state:
-                if p.lr_index < p.len - 1:
-                    t = (stateno, p.prod[p.lr_index+1])
-                    if t[1] in self.grammar.Nonterminals:
-                        if t not in trans:
-                            trans.append(t)
-        return trans
+    def find_nonterminal_transitions(self, transitions):
+        Nonterminals = self.grammar.Nonterminals
+        ntrans = {}
+        for state, trans in enumerate(transitions):
+            for N in trans:
+                if N in Nonterminals:
+                    ntrans[(state, N)] = len(ntrans)
+        return ntrans
 
     # -----------------------------------------------------------------------------
-    # dr_relation()
-    #
-    # Computes the DR(p,A) relationships for non-terminal transitions.  The input
-    # is a tuple (state,N) where state is a number and N is a nonterminal symbol.
-    #
-    # Returns a list of terminals.
-    # -----------------------------------------------------------------------------
-
-    def dr_relation(self, C, trans, nullable):
-        state, N = trans
-        terms = []
-
-        g = self.lr0_goto(C[state], N)
-        for p in g:
-            if p.lr_index < p.len - 1:
-                a = p.prod[p.lr_index+1]
-                if a in self.grammar.Terminals:
-                    if a not in terms:
-                        terms.append(a)
-
-        # This extra bit is to handle the start state
-        if state == 0 and N == self.grammar.Productions[0].prod[0]:
-            terms.append('$end')
-
-        return terms
-
-    # -----------------------------------------------------------------------------
-    # reads_relation()
+    # compute_read_sets()
     #
-    # Computes the READS() relation (p,A) READS (t,C).
+    # Computes the DR(p,A) sets of the non-terminal transitions, the terminals
+    # shifted right after the transition, and the READS() relation
+    # (p,A) READS (t,C), C being a nullable non-terminal of state t, the state
+    # the transition leads to.  Returns the read sets, as bitsets in a list
+    # indexed by transition number.
     # -----------------------------------------------------------------------------
 
-    def reads_relation(self, C, trans, empty):
-        # Look for empty transitions
-        rel = []
-        state, N = trans
-
-        g = self.lr0_goto(C[state], N)
-        j = self.lr0_cidhash.get(id(g), -1)
-        for p in g:
-            if p.lr_index < p.len - 1:
-                a = p.prod[p.lr_index + 1]
-                if a in empty:
-                    rel.append((j, a))
-
-        return rel
+    def compute_read_sets(self, transitions, ntrans, nullable):
+        terminal_bit = self.analysis.terminal_bit
+        start = self.grammar.Productions[0].prod[0]
+        dr = [0] * len(ntrans)
+        reads = [[] for _ in ntrans]
+        for (state, N), x in ntrans.items():
+            j = transitions[state][N]
+            bits = 0
+            for a in transitions[j]:
+                bit = terminal_bit.get(a)
+                if bit is not None:
+                    bits |= bit
+                elif a in nullable:
+                    reads[x].append(ntrans[(j, a)])
+
+            # This extra bit is to handle the start state
+            if state == 0 and N == start:
+                bits |= terminal_bit['$end']
+            dr[x] = bits
+
+        return digraph(len(ntrans), reads, dr)
 
     # -----------------------------------------------------------------------------
     # compute_lookback_includes()
@@ -1562,8 +2227,9 @@ class LRTable:
     # This relation is determined by running the LR(0) state machine forward.
     # For example, starting with a production "N : . A B C", we run it forward
     # to obtain "N : A B C ."   We then build a relationship between this final
-    # state and the starting state.   These relationships are stored in a dictionary
-    # lookdict.
+    # state and the starting state.   The lookbacks of every transition are
+    # returned as a list of the (state, production number) pairs of the final
+    # states.
     #
     # INCLUDES:
     #
@@ -1578,211 +2244,347 @@ class LRTable:
     # L is essentially a prefix (which may be empty), T is a suffix that must be
     # able to derive an empty string.  State p' must lead to state p with the string L.
     #
+    # Both relations only come from the items of p' with the dot at the start,
+    # as in DeRemer and Pennello.  The original PLY implementation ran every
+    # item of p' for B forward and matched final items loosely, which added
+    # spurious lookaheads, mostly $end, for some grammars with nullable
+    # nonterminals.  The lookaheads are now exactly LALR(1), so the action
+    # tables and the reported conflicts of such grammars differ from those of
+    # the original PLY.  The relations are lists indexed by transition number.
     # -----------------------------------------------------------------------------
 
-    def compute_lookback_includes(self, C, trans, nullable):
-        lookdict = {}          # Dictionary of lookback relations
-        includedict = {}       # Dictionary of include relations
-
-        # Make a dictionary of non-terminal transitions
-        dtrans = {}
-        for t in trans:
-            dtrans[t] = 1
-
-        # Loop over all transitions and compute lookbacks and includes
-        for state, N in trans:
-            lookb = []
-            includes = []
-            for p in C[state]:
-                if p.name != N:
+    def compute_lookback_includes(self, C, transitions, ntrans, nullable):
+        Productions = self.grammar.Productions
+        item_prod = self.item_prod
+        prod_start = self.prod_start
+
+        # Position from which the right side of every production derives empty
+        nullable_from = []
+        for p in Productions:
+            k = p.len
+            while k > 0 and p.prod[k-1] in nullable:
+                k -= 1
+            nullable_from.append(k)
+
+        lookback = [[] for _ in ntrans]
+        includes = [[] for _ in ntrans]
+        for state, I in enumerate(C):
+            for item in I:
+                pnum = item_prod[item]
+                if item != prod_start[pnum]:
+                    continue
+                p = Productions[pnum]
+                x = ntrans.get((state, p.name))
+                if x is None:
                     continue
 
-                # Okay, we have a name match.  We now follow the production all the way
-                # through the state machine until we get the . on the right hand side
-
-                lr_index = p.lr_index
+                # Follow the production all the way through the state machine
+                # until we get the . on the right hand side
                 j = state
-                while lr_index < p.len - 1:
-                    lr_index = lr_index + 1
-                    t = p.prod[lr_index]
-
-                    # Check to see if this symbol and state are a non-terminal transition
-                    if (j, t) in dtrans:
-                        # Yes.  Okay, there is some chance that this is an includes relation
-                        # the only way to know for certain is whether the rest of the
-                        # production derives empty
-
-                        li = lr_index + 1
-                        while li < p.len:
-                            if p.prod[li] in self.grammar.Terminals:
-                                break      # No forget it
-                            if p.prod[li] not in nullable:
-                                break
-                            li = li + 1
-                        else:
-                            # Appears to be a relation between (j,t) and (state,N)
-                            includes.append((j, t))
-
-                    g = self.lr0_goto(C[j], t)               # Go to next set
-                    j = self.lr0_cidhash.get(id(g), -1)      # Go to next state
-
-                # When we get here, j is the final state, now we have to locate the production
-                for r in C[j]:
-                    if r.name != p.name:
-                        continue
-                    if r.len != p.len:
-                        continue
-                    i = 0
-                    # This look is comparing a production ". A B C" with "A B C ."
-                    while i < r.lr_index:
-                        if r.prod[i] != p.prod[i+1]:
-                            break
-                        i = i + 1
-                    else:
-                        lookb.append((j, r))
-            for i in includes:
-                if i not in includedict:
-                    includedict[i] = []
-                includedict[i].append((state, N))
-            lookdict[(state, N)] = lookb
-
-        return lookdict, includedict
-
-    # -----------------------------------------------------------------------------
-    # compute_read_sets()
-    #
-    # Given a set of LR(0) items, this function computes the read sets.
-    #
-    # Inputs:  C        =  Set of LR(0) items
-    #          ntrans   = Set of nonterminal transitions
-    #          nullable = Set of empty transitions
-    #
-    # Returns a set containing the read sets
-    # -----------------------------------------------------------------------------
-
-    def compute_read_sets(self, C, ntrans, nullable):
-        FP = lambda x: self.dr_relation(C, x, nullable)
-        R =  lambda x: self.reads_relation(C, x, nullable)
-        F = digraph(ntrans, R, FP)
-        return F
+                prod = p.prod
+                tail = nullable_from[pnum]
+                for k in range(p.len):
+                    t = prod[k]
+                    # A non-terminal transition followed by symbols deriving
+                    # empty is an includes relation
+                    if k + 1 >= tail:
+                        y = ntrans.get((j, t))
+                        if y is not None:
+                            includes[y].append(x)
+                    j = transitions[j][t]
+
+                lookback[x].append((j, pnum))
+
+        return lookback, includes
 
     # -----------------------------------------------------------------------------
     # compute_follow_sets()
     #
-    # Given a set of LR(0) items, a set of non-terminal transitions, a readset,
-    # and an include set, this function computes the follow sets
+    # Given the read sets and the includes relation of the non-terminal
+    # transitions, this function computes the follow sets
     #
     # Follow(p,A) = Read(p,A) U U {Follow(p',B) | (p,A) INCLUDES (p',B)}
-    #
-    # Inputs:
-    #            ntrans     = Set of nonterminal transitions
-    #            readsets   = Readset (previously computed)
-    #            inclsets   = Include sets (previously computed)
-    #
-    # Returns a set containing the follow sets
-    # -----------------------------------------------------------------------------
-
-    def compute_follow_sets(self, ntrans, readsets, inclsets):
-        FP = lambda x: readsets[x]
-        R  = lambda x: inclsets.get(x, [])
-        F = digraph(ntrans, R, FP)
-        return F
-
-    # -----------------------------------------------------------------------------
-    # add_lookaheads()
-    #
-    # Attaches the lookahead symbols to grammar rules.
-    #
-    # Inputs:    lookbacks         -  Set of lookback relations
-    #            followset         -  Computed follow set
-    #
-    # This function directly attaches the lookaheads to productions contained
-    # in the lookbacks set
     # -----------------------------------------------------------------------------
 
-    def add_lookaheads(self, lookbacks, followset):
-        for trans, lb in lookbacks.items():
-            # Loop over productions in lookback
-            for state, p in lb:
-                if state not in p.lookaheads:
-                    p.lookaheads[state] = []
-                f = followset.get(trans, [])
-                for a in f:
-                    if a not in p.lookaheads[state]:
-                        p.lookaheads[state].append(a)
+    def compute_follow_sets(self, ntrans, readsets, includes):
+        return digraph(len(ntrans), includes, readsets)
 
     # -----------------------------------------------------------------------------
     # add_lalr_lookaheads()
     #
-    # This function does all of the work of adding lookahead information for use
-    # with LALR parsing
+    # This function does all of the work of computing the lookahead information
+    # for use with LALR parsing.  Returns a dict mapping (state, production
+    # number) of every reduction to the bitset of its lookaheads.
     # -----------------------------------------------------------------------------
 
-    def add_lalr_lookaheads(self, C):
+    def add_lalr_lookaheads(self, C, transitions):
         # Determine all of the nullable nonterminals
-        nullable = self.compute_nullable_nonterminals()
+        nullable = self.analysis.nullable
 
         # Find all non-terminal transitions
-        trans = self.find_nonterminal_transitions(C)
+        ntrans = self.find_nonterminal_transitions(transitions)
 
         # Compute read sets
-        readsets = self.compute_read_sets(C, trans, nullable)
+        readsets = self.compute_read_sets(transitions, ntrans, nullable)
 
         # Compute lookback/includes relations
-        lookd, included = self.compute_lookback_includes(C, trans, nullable)
+        lookback, includes = self.compute_lookback_includes(C, transitions, ntrans, nullable)
 
         # Compute LALR FOLLOW sets
-        followsets = self.compute_follow_sets(trans, readsets, included)
+        followsets = self.compute_follow_sets(ntrans, readsets, includes)
 
         # Add all of the lookaheads
-        self.add_lookaheads(lookd, followsets)
+        lookaheads = {}
+        for x, lb in enumerate(lookback):
+            for key in lb:
+                lookaheads[key] = lookaheads.get(key, 0) | followsets[x]
+        return lookaheads
+
+    # -----------------------------------------------------------------------------
+    #                  ==== Canonical and minimal LR(1) ====
+    #
+    # The LR(1) states are built directly, a state being an LR(0) kernel with a
+    # lookahead bitset for each of its kernel items.  Canonical LR(1) keeps a
+    # state for every distinct kernel and lookaheads, which can be many times the
+    # LR(0) states.  With merge, a new state is merged into an existing state of
+    # the same kernel when the two are weakly compatible, as described in
+    #
+    # Pager, D.: "A Practical General Method for Constructing LR(k) Parsers",
+    #     Acta Informatica 7, 1977, pp. 249-268
+    #
+    # which gives as many states as LALR(1) unless splitting them avoids a
+    # reduce/reduce conflict.  A state whose lookaheads grow by a merge is
+    # processed again, which may leave states unreachable: the reachable states
+    # are renumbered at the end, breadth first from state 0 like lr0_items().
+    # -----------------------------------------------------------------------------
+
+    def lr1_items(self, merge=False):
+        Productions = self.grammar.Productions
+        analysis = self.analysis
+        lr_items = self.lr_items
+        item_prod = self.item_prod
+        item_sym = self.item_sym
+        prod_items = self.prod_items
+        names = [p.name for p in Productions]
+        usyms = [p.usyms for p in Productions]
+
+        # Lookaheads given to the productions of the nonterminal after the "."
+        # of an item: FIRST of the rest of the item, plus the lookaheads of the
+        # item when the rest is nullable
+        first_after = {}
+        nullable_after = {}
+        for i, x in enumerate(item_sym):
+            if x in prod_items:
+                rest = Productions[item_prod[i]].prod[lr_items[i].lr_index + 1:]
+                first_after[i] = analysis.first_of(rest)
+                nullable_after[i] = all(s in analysis.nullable for s in rest)
+
+        # LR(0) closure, reductions and goto kernels of every kernel.  The
+        # lookaheads of an item of the closure are FIRST bits given by the
+        # closure and the lookaheads of some kernel items, the same for all the
+        # items added for a nonterminal.  They are described as (bits, kernel
+        # positions), so that the lookaheads of a state are found without
+        # walking its closure.  Unlike lr0_items(), the items of a kernel are
+        # sorted, so that a state is found whatever the order of the items it
+        # is reached from
+        cores = {}
+
+        def core(kernel):
+            c = cores.get(kernel)
+            if c is not None:
+                return c
+            I = self.lr0_closure(kernel)
+            nk = len(kernel)
+
+            # Lookaheads of the nonterminals expanded by the closure, with
+            # digraph() over "n gets the lookaheads of m"
+            index = {}
+            for item in I[nk:]:
+                index.setdefault(names[item_prod[item]], len(index))
+            first = [0] * len(index)
+            reach = [0] * len(index)  # Bitset of kernel positions
+            R = [[] for _ in index]
+            for k, item in enumerate(I):
+                x = item_sym[item]
+                if x in prod_items:
+                    n = index[x]
+                    first[n] |= first_after[item]
+                    if nullable_after[item]:
+                        if k < nk:
+                            reach[n] |= 1 << k
+                        else:
+                            R[n].append(index[names[item_prod[item]]])
+            first = digraph(len(index), R, first)
+            reach = digraph(len(index), R, reach)
+
+            def lookahead(k, item):
+                if k < nk:
+                    return 0, (k,)
+                n = index[names[item_prod[item]]]
+                bits = reach[n]
+                positions = []
+                while bits:
+                    low = bits & -bits
+                    positions.append(low.bit_length() - 1)
+                    bits ^= low
+                return first[n], tuple(positions)
+
+            reduces = []
+            gotos = {}
+            for k, item in enumerate(I):
+                x = item_sym[item]
+                if x is None:
+                    reduces.append((item_prod[item],) + lookahead(k, item))
+                else:
+                    gotos.setdefault(x, []).append((item, k))
+            moves = []
+            for x in dict.fromkeys([s for item in I for s in usyms[item_prod[item]]]):
+                sources = gotos.get(x)
+                if sources is not None:
+                    sources.sort()
+                    moves.append((x, tuple([item + 1 for item, k in sources]),
+                                  [lookahead(k, item) for item, k in sources]))
+            c = cores[kernel] = (I, reduces, moves)
+            return c
+
+        start = (self.prod_start[0],)
+        kernels = [start]             # Kernel of every state
+        kernel_las = [[analysis.terminal_bit['$end']]]
+        states = {start if merge else (start, tuple(kernel_las[0])): [0]}
+        transitions = [None]
+        reductions = [None]           # Lookaheads of the reductions of every state
+        queued = [True]
+        work = [0]
+
+        w = 0
+        while w < len(work):
+            s = work[w]
+            w += 1
+            queued[s] = False
+            I, reduces, moves = core(kernels[s])
+            la = kernel_las[s]
+
+            red = {}
+            for pnum, bits, positions in reduces:
+                for k in positions:
+                    bits |= la[k]
+                red[pnum] = bits
+            reductions[s] = red
+
+            trans = {}
+            for x, tkernel, sources in moves:
+                tla = []
+                for bits, positions in sources:
+                    for k in positions:
+                        bits |= la[k]
+                    tla.append(bits)
+                key = tkernel if merge else (tkernel, tuple(tla))
+                candidates = states.setdefault(key, [])
+                for t in candidates:
+                    if not merge or weakly_compatible(kernel_las[t], tla):
+                        break
+                else:
+                    t = len(kernels)
+                    candidates.append(t)
+                    kernels.append(tkernel)
+                    kernel_las.append(tla)
+                    transitions.append(None)
+                    reductions.append(None)
+                    queued.append(True)
+                    work.append(t)
+                    trans[x] = t
+                    continue
+
+                las = kernel_las[t]
+                grown = False
+                for k, bits in enumerate(tla):
+                    if bits & ~las[k]:
+                        las[k] |= bits
+                        grown = True
+                if grown and not queued[t]:
+                    queued[t] = True
+                    work.append(t)
+                trans[x] = t
+            transitions[s] = trans
+
+        # Renumber the states reachable from state 0, breadth first
+        number = {0: 0}
+        order = [0]
+        for s in order:
+            for t in transitions[s].values():
+                if t not in number:
+                    number[t] = len(order)
+                    order.append(t)
+
+        C = [cores[kernels[s]][0] for s in order]
+        new_transitions = []
+        lookaheads = {}
+        for st, s in enumerate(order):
+            new_transitions.append({x: number[t] for x, t in transitions[s].items()})
+            for pnum, bits in reductions[s].items():
+                lookaheads[(st, pnum)] = bits
+        return C, new_transitions, lookaheads
 
     # -----------------------------------------------------------------------------
     # lr_parse_table()
     #
-    # This function constructs the parse tables for SLR or LALR
+    # This function constructs the parse tables with the method of the table
     # -----------------------------------------------------------------------------
     def lr_parse_table(self):
         Productions = self.grammar.Productions
         Precedence  = self.grammar.Precedence
+        Terminals   = self.grammar.Terminals
+        Nonterminals = self.grammar.Nonterminals
         goto   = self.lr_goto         # Goto array
         action = self.lr_action       # Action array
         log    = self.log             # Logger for output
+        logging = not isinstance(log, NullLogger)
+
+        lr_items  = self.lr_items
+        item_prod = self.item_prod
+        item_sym  = self.item_sym
 
         actionp = {}                  # Action production array (temporary)
 
         # Step 1: Construct C = { I0, I1, ... IN}, collection of LR(0) items
-        # This determines the number of states
+        # of the states, and the lookaheads of their reductions
 
-        C = self.lr0_items()
-        self.add_lalr_lookaheads(C)
+        log.info('Parsing method: %s', self.lr_method)
+        if self.lr_method == 'LALR':
+            C, transitions = self.lr0_items()
+            lookaheads = self.add_lalr_lookaheads(C, transitions)
+        else:
+            C, transitions, lookaheads = self.lr1_items(merge=self.lr_method == 'PAGER')
 
         # Build the parser table, state by state
-        st = 0
-        for I in C:
-            # Loop over each production in I
+        for st, I in enumerate(C):
+            # Loop over each item in I
             actlist = []              # List of actions
             st_action  = {}
-            st_actionp = {}
+            st_actionp = {}           # Item of every action
             st_goto    = {}
-            log.info('')
-            log.info('state %d', st)
-            log.info('')
-            for p in I:
-                log.info('    (%d) %s', p.number, p)
-            log.info('')
+            trans = transitions[st]
+            if logging:
+                log.info('')
+                log.info('state %d', st)
+                log.info('')
+                for p in I:
+                    log.info('    (%d) %s', item_prod[p], lr_items[p])
+                log.info('')
 
             for p in I:
-                    if p.len == p.lr_index + 1:
-                        if p.name == "S'":
+                    pnum = item_prod[p]
+                    a = item_sym[p]
+                    if a is None:
+                        if pnum == 0:
                             # Start symbol. Accept!
                             st_action['$end'] = 0
                             st_actionp['$end'] = p
                         else:
                             # We are at the end of a production.  Reduce!
-                            laheads = p.lookaheads[st]
-                            for a in laheads:
-                                actlist.append((a, p, 'reduce using rule %d (%s)' % (p.number, p)))
+                            for a in self.analysis.terminals_of(lookaheads[(st, pnum)]):
+                                if logging:
+                                    actlist.append((a, p, 'reduce using rule %d (%s)' % (pnum, lr_items[p])))
                                 r = st_action.get(a)
                                 if r is not None:
                                     # Whoa. Have a shift/reduce or reduce/reduce conflict
@@ -1795,132 +2597,265 @@ class LRTable:
                                         sprec, slevel = Precedence.get(a, ('right', 0))
 
                                         # Reduce precedence comes from rule being reduced (p)
-                                        rprec, rlevel = Productions[p.number].prec
+                                        rprec, rlevel = Productions[pnum].prec
 
                                         if (slevel < rlevel) or ((slevel == rlevel) and (rprec == 'left')):
                                             # We really need to reduce here.
-                                            st_action[a] = -p.number
+                                            st_action[a] = -pnum
                                             st_actionp[a] = p
                                             if not slevel and not rlevel:
                                                 log.info('  ! shift/reduce conflict for %s resolved as reduce', a)
-                                                self.sr_conflicts.append((st, a, 'reduce'))
-                                            Productions[p.number].reduced += 1
+                                                self.add_sr_conflict(st, I, a, 'reduce', r, pnum)
+                                            Productions[pnum].reduced += 1
                                         elif (slevel == rlevel) and (rprec == 'nonassoc'):
                                             st_action[a] = None
                                         else:
                                             # Hmmm. Guess we'll keep the shift
                                             if not rlevel:
                                                 log.info('  ! shift/reduce conflict for %s resolved as shift', a)
-                                                self.sr_conflicts.append((st, a, 'shift'))
+                                                self.add_sr_conflict(st, I, a, 'shift', r, pnum)
                                     elif r < 0:
                                         # Reduce/reduce conflict.   In this case, we favor the rule
                                         # that was defined first in the grammar file
                                         oldp = Productions[-r]
-                                        pp = Productions[p.number]
+                                        pp = Productions[pnum]
                                         if oldp.line > pp.line:
-                                            st_action[a] = -p.number
+                                            st_action[a] = -pnum
                                             st_actionp[a] = p
                                             chosenp, rejectp = pp, oldp
-                                            Productions[p.number].reduced += 1
+                                            Productions[pnum].reduced += 1
                                             Productions[oldp.number].reduced -= 1
                                         else:
                                             chosenp, rejectp = oldp, pp
-                                        self.rr_conflicts.append((st, chosenp, rejectp))
+                                        self.add_rr_conflict(st, I, a, chosenp, rejectp)
                                         log.info('  ! reduce/reduce conflict for %s resolved using rule %d (%s)',
-                                                 a, st_actionp[a].number, st_actionp[a])
+                                                 a, item_prod[st_actionp[a]], lr_items[st_actionp[a]])
                                     else:
                                         raise LALRError('Unknown conflict in state %d' % st)
                                 else:
-                                    st_action[a] = -p.number
+                                    st_action[a] = -pnum
                                     st_actionp[a] = p
-                                    Productions[p.number].reduced += 1
-                    else:
-                        i = p.lr_index
-                        a = p.prod[i+1]       # Get symbol right after the "."
-                        if a in self.grammar.Terminals:
-                            g = self.lr0_goto(I, a)
-                            j = self.lr0_cidhash.get(id(g), -1)
-                            if j >= 0:
-                                # We are in a shift state
-                                actlist.append((a, p, 'shift and go to state %d' % j))
-                                r = st_action.get(a)
-                                if r is not None:
-                                    # Whoa have a shift/reduce or shift/shift conflict
-                                    if r > 0:
-                                        if r != j:
-                                            raise LALRError('Shift/shift conflict in state %d' % st)
-                                    elif r < 0:
-                                        # Do a precedence check.
-                                        #   -  if precedence of reduce rule is higher, we reduce.
-                                        #   -  if precedence of reduce is same and left assoc, we reduce.
-                                        #   -  otherwise we shift
-
-                                        # Shift precedence comes from the token
-                                        sprec, slevel = Precedence.get(a, ('right', 0))
-
-                                        # Reduce precedence comes from the rule that could have been reduced
-                                        rprec, rlevel = Productions[st_actionp[a].number].prec
-
-                                        if (slevel > rlevel) or ((slevel == rlevel) and (rprec == 'right')):
-                                            # We decide to shift here... highest precedence to shift
-                                            Productions[st_actionp[a].number].reduced -= 1
-                                            st_action[a] = j
-                                            st_actionp[a] = p
-                                            if not rlevel:
-                                                log.info('  ! shift/reduce conflict for %s resolved as shift', a)
-                                                self.sr_conflicts.append((st, a, 'shift'))
-                                        elif (slevel == rlevel) and (rprec == 'nonassoc'):
-                                            st_action[a] = None
-                                        else:
-                                            # Hmmm. Guess we'll keep the reduce
-                                            if not slevel and not rlevel:
-                                                log.info('  ! shift/reduce conflict for %s resolved as reduce', a)
-                                                self.sr_conflicts.append((st, a, 'reduce'))
-
-                                    else:
-                                        raise LALRError('Unknown conflict in state %d' % st)
-                                else:
+                                    Productions[pnum].reduced += 1
+                    elif a in Terminals:
+                        j = trans[a]
+                        # We are in a shift state
+                        if logging:
+                            actlist.append((a, p, 'shift and go to state %d' % j))
+                        r = st_action.get(a)
+                        if r is not None:
+                            # Whoa have a shift/reduce or shift/shift conflict
+                            if r > 0:
+                                if r != j:
+                                    raise LALRError('Shift/shift conflict in state %d' % st)
+                            elif r < 0:
+                                # Do a precedence check.
+                                #   -  if precedence of reduce rule is higher, we reduce.
+                                #   -  if precedence of reduce is same and left assoc, we reduce.
+                                #   -  otherwise we shift
+
+                                # Shift precedence comes from the token
+                                sprec, slevel = Precedence.get(a, ('right', 0))
+
+                                # Reduce precedence comes from the rule that could have been reduced
+                                rnum = item_prod[st_actionp[a]]
+                                rprec, rlevel = Productions[rnum].prec
+
+                                if (slevel > rlevel) or ((slevel == rlevel) and (rprec == 'right')):
+                                    # We decide to shift here... highest precedence to shift
+                                    Productions[rnum].reduced -= 1
                                     st_action[a] = j
                                     st_actionp[a] = p
+                                    if not rlevel:
+                                        log.info('  ! shift/reduce conflict for %s resolved as shift', a)
+                                        self.add_sr_conflict(st, I, a, 'shift', j, rnum)
+                                elif (slevel == rlevel) and (rprec == 'nonassoc'):
+                                    st_action[a] = None
+                                else:
+                                    # Hmmm. Guess we'll keep the reduce
+                                    if not slevel and not rlevel:
+                                        log.info('  ! shift/reduce conflict for %s resolved as reduce', a)
+                                        self.add_sr_conflict(st, I, a, 'reduce', j, rnum)
 
-            # Print the actions associated with each terminal
-            _actprint = {}
-            for a, p, m in actlist:
-                if a in st_action:
-                    if p is st_actionp[a]:
-                        log.info('    %-15s %s', a, m)
-                        _actprint[(a, m)] = 1
-            log.info('')
-            # Print the actions that were not used. (debugging)
-            not_used = 0
-            for a, p, m in actlist:
-                if a in st_action:
-                    if p is not st_actionp[a]:
-                        if not (a, m) in _actprint:
-                            log.debug('  ! %-15s [ %s ]', a, m)
-                            not_used = 1
+                            else:
+                                raise LALRError('Unknown conflict in state %d' % st)
+                        else:
+                            st_action[a] = j
+                            st_actionp[a] = p
+
+            if logging:
+                # Print the actions associated with each terminal
+                _actprint = {}
+                for a, p, m in actlist:
+                    if a in st_action:
+                        if p == st_actionp[a]:
+                            log.info('    %-15s %s', a, m)
                             _actprint[(a, m)] = 1
-            if not_used:
-                log.debug('')
+                log.info('')
+                # Print the actions that were not used. (debugging)
+                not_used = 0
+                for a, p, m in actlist:
+                    if a in st_action:
+                        if p != st_actionp[a]:
+                            if not (a, m) in _actprint:
+                                log.debug('  ! %-15s [ %s ]', a, m)
+                                not_used = 1
+                                _actprint[(a, m)] = 1
+                if not_used:
+                    log.debug('')
 
             # Construct the goto table for this state
-
-            nkeys = {}
-            for ii in I:
-                for s in ii.usyms:
-                    if s in self.grammar.Nonterminals:
-                        nkeys[s] = None
-            for n in nkeys:
-                g = self.lr0_goto(I, n)
-                j = self.lr0_cidhash.get(id(g), -1)
-                if j >= 0:
+            for n, j in trans.items():
+                if n in Nonterminals:
                     st_goto[n] = j
                     log.info('    %-30s shift and go to state %d', n, j)
 
             action[st] = st_action
             actionp[st] = st_actionp
             goto[st] = st_goto
-            st += 1
+
+    # -----------------------------------------------------------------------------
+    # Conflict records
+    #
+    # Every unresolved conflict is kept in sr_conflicts or rr_conflicts for the
+    # debug log, and as a dict in conflicts for conflict_report().  The items of
+    # the state, but those added by the closure and not reduced, are kept for
+    # the report too.
+    # -----------------------------------------------------------------------------
+
+    def add_conflict_state(self, st, I):
+        if st not in self.conflict_states:
+            self.conflict_states[st] = [
+                '(%d) %s' % (self.item_prod[p], self.lr_items[p]) for p in I
+                if self.lr_items[p].lr_index or self.item_sym[p] is None or not self.item_prod[p]]
+
+    def add_sr_conflict(self, st, I, a, resolution, shift, pnum):
+        self.add_conflict_state(st, I)
+        self.sr_conflicts.append((st, a, resolution))
+        p = self.lr_productions[pnum]
+        self.conflicts.append({'type': 'shift/reduce', 'state': st, 'token': a,
+                               'resolution': resolution, 'shift': shift,
+                               'rule': pnum, 'production': str(p), 'line': p.line})
+
+    def add_rr_conflict(self, st, I, a, chosenp, rejectp):
+        self.add_conflict_state(st, I)
+        self.rr_conflicts.append((st, chosenp, rejectp))
+        self.conflicts.append({'type': 'reduce/reduce', 'state': st, 'token': a,
+                               'rule': chosenp.number, 'production': str(chosenp),
+                               'line': chosenp.line, 'rejected_rule': rejectp.number,
+                               'rejected_production': str(rejectp), 'rejected_line': rejectp.line})
+
+    # -----------------------------------------------------------------------------
+    # conflict_report()
+    #
+    # Returns the conflicts of the tables as a dict of plain values, for tools
+    # to read:
+    #
+    #       method          - Table construction method
+    #       states          - Number of states
+    #       shift_reduce    - Number of shift/reduce conflicts
+    #       reduce_reduce   - Number of reduce/reduce conflicts
+    #       conflicts       - List of the conflicts, one per token
+    #       never_reduced   - Rules never reduced because of reduce/reduce conflicts
+    #       conflict_states - Items of the states with conflicts
+    #
+    # Conflicts resolved by precedence declarations are not reported.
+    # -----------------------------------------------------------------------------
+
+    def conflict_report(self):
+        never_reduced = []
+        for state, rule, rejected in self.rr_conflicts:
+            if not rejected.reduced and str(rejected) not in never_reduced:
+                never_reduced.append(str(rejected))
+        return {
+            'method': self.lr_method,
+            'states': len(self.lr_action),
+            'shift_reduce': len(self.sr_conflicts),
+            'reduce_reduce': len(self.rr_conflicts),
+            'conflicts': self.conflicts,
+            'never_reduced': never_reduced,
+            'conflict_states': [{'state': st, 'items': items}
+                                for st, items in sorted(self.conflict_states.items())],
+        }
+
+    # Write conflict_report() as JSON, moved into place like pickle_table()
+    def write_conflicts(self, filename):
+        outdir = os.path.dirname(filename)
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+        tmpname = '%s.%d.tmp' % (filename, os.getpid())
+        with open(tmpname, 'w') as outf:
+            json.dump(self.conflict_report(), outf, indent=1)
+            outf.write('\n')
+        os.replace(tmpname, filename)
+
+    # -----------------------------------------------------------------------------
+    # pickle_table()
+    #
+    # This function pickles the LR parsing tables to a supplied file object.  The
+    # file is written to a temporary name first and then moved into place so that
+    # a concurrently starting process never reads a half-written table.
+    # -----------------------------------------------------------------------------
+
+    def pickle_table(self, filename, signature=''):
+        outdir = os.path.dirname(filename)
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+        tmpname = '%s.%d.tmp' % (filename, os.getpid())
+        with open(tmpname, 'wb') as outf:
+            pickle.dump(__tabversion__, outf, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(signature, outf, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self.lr_action, outf, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self.lr_goto, outf, pickle.HIGHEST_PROTOCOL)
+
+            outp = []
+            for p in self.lr_productions:
+                if p.func:
+                    outp.append((p.str, p.name, p.len, p.func, os.path.basename(p.file), p.line))
+                else:
+                    outp.append((str(p), p.name, len(p), None, None, None))
+            pickle.dump(outp, outf, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, filename)
+
+# -----------------------------------------------------------------------------
+#                          == CachedLRTable ==
+#
+# This class holds LR parsing tables that were previously written out by
+# LRTable.pickle_table().  It provides exactly the attributes the LRParser needs,
+# so a parser can be created without building the grammar at all.
+# -----------------------------------------------------------------------------
+
+class VersionError(YaccError):
+    pass
+
+class CachedLRTable:
+    def __init__(self):
+        self.lr_action = None
+        self.lr_goto = None
+        self.lr_productions = None
+
+    # Read the tables from filename.  Returns the signature of the grammar the
+    # tables were built from.  VersionError is raised for tables written by a
+    # different version of this module
+    def read_pickle(self, filename):
+        with open(filename, 'rb') as in_f:
+            tabversion = pickle.load(in_f)
+            if tabversion != __tabversion__:
+                raise VersionError('yacc table file version is out of date')
+            signature = pickle.load(in_f)
+            self.lr_action = pickle.load(in_f)
+            self.lr_goto = pickle.load(in_f)
+            productions = pickle.load(in_f)
+
+        self.lr_productions = []
+        for p in productions:
+            self.lr_productions.append(MiniProduction(*p))
+
+        return signature
+
+    # Bind all production function names to callable objects in pdict
+    def bind_callables(self, pdict):
+        for p in self.lr_productions:
+            p.bind(pdict)
 
 # -----------------------------------------------------------------------------
 #                            === INTROSPECTION ===
@@ -2270,7 +3205,8 @@ class ParserReflect(object):
 
 def yacc(*, debug=yaccdebug, module=None, start=None,
          check_recursion=True, optimize=False, debugfile=debug_file,
-         debuglog=None, errorlog=None):
+         debuglog=None, errorlog=None, picklefile=None, parsermodule=None,
+         method='LALR', conflictfile=None):
 
     # Reference to the parsing method of the last built parser
     global parse
@@ -2303,6 +3239,31 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     if pinfo.error:
         raise YaccError('Unable to build parser')
 
+    # Check signature against table files (if any).  Tables are only reused
+    # when they were written by this version of yacc for the very same grammar,
+    # in which case validation and table construction are skipped entirely.
+    # Tables cached with another method are rebuilt, as are the tables of a
+    # missing conflict report
+    signature = '%s %s' % (method, pinfo.signature())
+
+    if picklefile and not debug and not (conflictfile and not os.path.exists(conflictfile)):
+        try:
+            lr = CachedLRTable()
+            read_signature = lr.read_pickle(picklefile)
+            if read_signature == signature:
+                lr.bind_callables(pinfo.pdict)
+                parser = LRParser(lr, pinfo.error_func)
+                if parsermodule:
+                    _use_parser_module(parser, parsermodule, signature, errorlog)
+                parse = parser.parse
+                return parser
+        except FileNotFoundError:
+            pass
+        except VersionError as e:
+            errorlog.warning(str(e))
+        except Exception as e:
+            errorlog.warning('There was a problem loading the table file: %r', e)
+
     if debuglog is None:
         if debug:
             try:
@@ -2431,7 +3392,11 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
         raise YaccError('Unable to build parser')
 
     # Run the LRTable on the grammar
-    lr = LRTable(grammar, debuglog)
+    try:
+        lr = LRTable(grammar, debuglog, method)
+    except LALRError as e:
+        errorlog.error(str(e))
+        raise YaccError('Unable to build parser')
 
     if debug:
         num_sr = len(lr.sr_conflicts)
@@ -2474,9 +3439,42 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
                 errorlog.warning('Rule (%s) is never reduced', rejected)
                 warned_never.append(rejected)
 
+    # Write the machine readable conflict report
+    if conflictfile:
+        try:
+            lr.write_conflicts(conflictfile)
+        except IOError as e:
+            errorlog.warning("Couldn't create %r. %s" % (conflictfile, e))
+
+    # Write the table file for the next run
+    if picklefile:
+        try:
+            lr.pickle_table(picklefile, signature)
+        except IOError as e:
+            errorlog.warning("Couldn't create %r. %s" % (picklefile, e))
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
     parser = LRParser(lr, pinfo.error_func)
+    if parsermodule and not debug:
+        _use_parser_module(parser, parsermodule, signature, errorlog)
 
     parse = parser.parse
     return parser
+
+# Make parser use the module in filename, written first if missing, out of
+# date or broken.  Problems are only warned about, the parser then keeps
+# parsedense()
+def _use_parser_module(parser, filename, signature, errorlog):
+    try:
+        try:
+            module = read_parser_module(filename, signature)
+        except Exception:
+            module = None
+        if module is None:
+            write_parser_module(parser, filename, signature)
+            module = read_parser_module(filename, signature)
+        if module is not None:
+            parser.set_generated(module)
+    except Exception as e:
+        errorlog.warning('There was a problem with the parser module %r: %r', filename, e)
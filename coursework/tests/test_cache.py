@@ -0,0 +1,12 @@
+from coursework.cache import CompileCache
+
+
+def test_put_replacing_entry(tmp_path):
+  # Large enough that no eviction recounts the size
+  cache = CompileCache(str(tmp_path), max_bytes=1000)
+  for _ in range(10):
+    cache.put('ab' * 32, 'll', b'x' * 30)
+  assert cache.size == 30
+  cache.put('cd' * 32, 'll', b'y' * 20)
+  assert cache.size == 50
+  assert cache.get('ab' * 32, 'll') == b'x' * 30
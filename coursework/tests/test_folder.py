@@ -0,0 +1,45 @@
+import pytest
+from coursework.compiler import Compiler
+
+# Constant conditions whose kept branch ends in a jump, spliced into the
+# enclosing block by the folder
+RETURN_IN_IF = '''
+int f(int n) { if (1) { return n + 1; } return 0; }
+int main() { return f(4); }
+'''
+
+BREAK_IN_IF = '''
+int main()
+{
+  int n = 0;
+  while (n < 10) { if (1) { break; } n = n + 1; }
+  return n;
+}
+'''
+
+
+@pytest.mark.parametrize('fold', [True, False])
+@pytest.mark.parametrize('src_code, result', [(RETURN_IN_IF, 5), (BREAK_IN_IF, 0)],
+                         ids=['return', 'break'])
+def test_jump_in_folded_branch(tmp_path, src_code, result, fold):
+  path = tmp_path / 'prog.c'
+  path.write_text(src_code)
+  compiler = Compiler(fold=fold)
+  code = compiler.gen_llvm_ir(None, compiler.parse_file(str(path)))
+  assert compiler.run(code) == result
+
+
+# Chars folded to values without a printable literal of their own
+@pytest.mark.parametrize('expr, literal, result', [
+  ("'a' - 'W'", r"'\n'", 10), ("'a' - 'a'", r"'\0'", 0),
+  ("'0' - '\\t'", r"'\''", 39), ("'d' + 'd'", r"'\310'", -56)],
+  ids=['newline', 'nul', 'quote', 'octal'])
+def test_folded_char_literal(tmp_path, expr, literal, result):
+  path = tmp_path / 'prog.c'
+  path.write_text(f'int main() {{ char c = {expr}; return c; }}')
+  compiler = Compiler()
+  ast = compiler.parse_file(str(path))
+  code = compiler.gen_llvm_ir(None, ast)
+  init = ast.ext[0].body.block_items[0].init
+  assert init.value == literal
+  assert compiler.run(code) == result
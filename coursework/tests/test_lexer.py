@@ -0,0 +1,13 @@
+import pytest
+from coursework.components.lexer import Lexer
+
+
+def test_token_before_input():
+  lexer = Lexer(lambda: None, lambda: None)
+  lexer.build()
+  # PLY's error, not a missing attribute of the wrapper
+  with pytest.raises(RuntimeError, match='No input'):
+    lexer.token()
+  lexer.input('int x;')
+  assert [lexer.token().type for _ in range(3)] == ['INT', 'ID', 'SEMI']
+  assert lexer.token() is None
@@ -0,0 +1,111 @@
+import pytest
+from coursework.ply import yacc
+
+
+class TokenLexer(object):
+  ''' Lexer returning the tokens of a list of types, counting them '''
+
+  def __init__(self, types):
+    self.types = types
+    self.count = 0
+
+  def input(self, data):
+    self.count = 0
+
+  def token(self):
+    if self.count == len(self.types):
+      return None
+    tok = yacc.YaccSymbol()
+    tok.type = tok.value = self.types[self.count]
+    tok.lineno = tok.lexpos = self.count
+    self.count += 1
+    return tok
+
+
+class DefaultedGrammar(object):
+  ''' x is reduced in a defaulted state, before reading B when defaulted
+      states are enabled, after it otherwise
+  '''
+  tokens = ['A', 'B']
+
+  def __init__(self):
+    self.read_at_reduce = []
+
+  def p_s(self, p):
+    '''s : x B'''
+
+  def p_x(self, p):
+    '''x : A'''
+    self.read_at_reduce.append(p.lexer.count)
+
+  def p_error(self, p):
+    raise SyntaxError(p)
+
+
+def test_defaulted_states_with_generated_module(tmp_path):
+  grammar = DefaultedGrammar()
+  parser = yacc.yacc(module=grammar, debug=False, errorlog=yacc.NullLogger(),
+                     parsermodule=str(tmp_path / 'parsegen.py'))
+  assert parser.generated is not None
+  lexer = TokenLexer(['A', 'B'])
+
+  parser.parse('', lexer=lexer)
+  parser.disable_defaulted_states()
+  parser.parse('', lexer=lexer)
+  parser.set_defaulted_states()
+  parser.parse('', lexer=lexer)
+  assert grammar.read_at_reduce == [1, 2, 1]
+
+  # Without the dense tables the dictionaries are used, not the module
+  parser.disable_dense_tables()
+  assert parser.generated is None
+  parser.disable_defaulted_states()
+  parser.parse('', lexer=lexer)
+  assert grammar.read_at_reduce[-1] == 2
+
+
+def make_grammar(terminals, rules):
+  grammar = yacc.Grammar(terminals)
+  for name, syms in rules:
+    grammar.add_production(name, syms, line=1)
+  grammar.set_start('S')
+  return grammar
+
+
+# Grammars the original PLY gave spurious lookaheads, from its lookback and
+# includes relations
+NULLABLE_RULES = [('S', ['B']), ('A', ['S', 'A', 'C']), ('A', ['a', 'C', 'b']),
+                  ('B', ['A', 'A']), ('B', []), ('B', ['B', 'S', 'C']),
+                  ('C', ['B']), ('C', ['b']), ('C', ['B', 'b', 'B'])]
+INCLUDES_RULES = [('S', ['A']), ('S', ['A', 'a', 'B']), ('S', ['a', 'c']), ('A', []),
+                  ('B', ['A', 'S']), ('B', ['S', 'c']), ('B', ['C', 'C', 'A']),
+                  ('C', ['c']), ('C', ['C', 'a'])]
+
+
+def test_lalr_no_spurious_end():
+  lr = yacc.LRTable(make_grammar(['a', 'b'], NULLABLE_RULES))
+  state = lr.lr_goto[lr.lr_goto[0]['S']]['S']
+  # The original PLY reduced B -> <empty> on $end too
+  assert lr.lr_action[state] == {'a': 4, 'b': -5}
+
+
+@pytest.mark.parametrize('terminals, rules', [(['a', 'b'], NULLABLE_RULES),
+                                              (['a', 'b', 'c'], INCLUDES_RULES)],
+                         ids=['lookback', 'includes'])
+def test_lalr_lookaheads_exact(terminals, rules):
+  lr = yacc.LRTable(make_grammar(terminals, rules))
+  # The lookaheads of every reduction are those of the canonical LR(1)
+  # states of the same LR(0) state, accepting left out
+  C, transitions = lr.lr0_items()
+  lalr = lr.add_lalr_lookaheads(C, transitions)
+  _, lr1_transitions, lr1 = lr.lr1_items()
+  exact = {}
+  pairs = [(0, 0)]
+  for s, t in pairs:
+    for (st, pnum), bits in lr1.items():
+      if st == t and pnum:
+        exact[(s, pnum)] = exact.get((s, pnum), 0) | bits
+    for x, u in transitions[s].items():
+      if (u, lr1_transitions[t][x]) not in pairs:
+        pairs.append((u, lr1_transitions[t][x]))
+  assert lalr == exact